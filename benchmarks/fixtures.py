@@ -0,0 +1,269 @@
+"""Synthetic invoices and supplier pages for the benchmarks.
+
+Everything is generated from a product number, so the pages served by
+`stub_server.StubSupplierServer` match the products on the invoices.
+Product numbers are drawn from a fixed pool, so the same products appear
+on several invoices as they would in a real inventory.
+"""
+
+from email.message import EmailMessage
+from email.utils import formatdate
+from pathlib import Path
+import random
+from typing import List, Sequence
+
+
+TAYDA_HOST = "www.taydaelectronics.com"
+JAMECO_HOST = "www.jameco.com"
+SUPPLIERS = ("tayda", "jameco")
+N_CATEGORIES = 20
+# Roughly the size of the markup around the parts of a real product page.
+DEFAULT_PAGE_PADDING = 100_000
+# The content of every datasheet.
+DATASHEET = b"%PDF-1.4\n%%EOF\n"
+
+
+def tayda_product_id(number: int) -> str:
+    return f"A-{number:04d}"
+
+
+def jameco_product_id(number: int) -> str:
+    return str(100000 + number)
+
+
+def tayda_product_url(product_id: str) -> str:
+    return f"https://{TAYDA_HOST}/{product_id.lower()}.html"
+
+
+def tayda_category_url(number: int) -> str:
+    return f"https://{TAYDA_HOST}/category-{number % N_CATEGORIES}.html"
+
+
+def jameco_product_url(product_id: str) -> str:
+    return (
+        f"https://{JAMECO_HOST}/webapp/wcs/stores/servlet/ProductDisplay"
+        f"?langId=-1&storeId=10001&productId={product_id}"
+    )
+
+
+def _padding(size: int) -> str:
+    """Markup that isn't read by the scrapers, to make pages a realistic size."""
+    block = '<div class="nav"><ul><li><a href="/x">Link</a></li></ul><p>Text</p></div>'
+    return block * (size // len(block))
+
+
+def tayda_product_page(number: int, padding: int = DEFAULT_PAGE_PADDING) -> bytes:
+    product_id = tayda_product_id(number)
+    return f"""<html><head><title>{product_id}</title>
+<script>require(["jquery"], function ($) {{ $(".breadcrumbs").show(); }});</script>
+</head><body>
+{_padding(padding // 2)}
+<div class="breadcrumbs"></div>
+<script type="text/x-magento-init">{{".breadcrumbs": {{"breadcrumbs": \
+{{"categoryOverride": "{tayda_category_url(number)}"}}}}}}</script>
+<div class="product attribute description"><div class="value">
+<a href="https://{TAYDA_HOST}/datasheets/files/{product_id}.pdf">Datasheet</a>
+</div></div>
+<table id="product-attribute-specs-table"><tbody>
+<tr><th>Manufacturer</th><td data-th="Manufacturer">Maker {number % 7}</td></tr>
+<tr><th>MPN</th><td data-th="MPN">MPN-{number:05d}</td></tr>
+</tbody></table>
+{_padding(padding // 2)}
+</body></html>""".encode()
+
+
+def tayda_category_page(number: int) -> bytes:
+    return f"""<html><body><h1><span data-ui-id="page-title-wrapper">
+Category {number}</span></h1></body></html>""".encode()
+
+
+def jameco_product_page(number: int, padding: int = DEFAULT_PAGE_PADDING) -> bytes:
+    return f"""<html><body>
+{_padding(padding // 2)}
+<h1>Part {number} description</h1>
+<ol class="breadcrumb"><li>Home</li><li>Category {number % N_CATEGORIES}</li>
+<li>Subcategory</li><li>Part {number}</li></ol>
+<ul><li><strong>Manufacturer:</strong><span>Maker {number % 7}</span></li>
+<li><strong>Manufacturer no.:</strong><span>JMPN-{number:05d}</span></li></ul>
+{_padding(padding // 2)}
+</body></html>""".encode()
+
+
+def make_tayda_email(path: Path, numbers: Sequence[int]):
+    """Write a Tayda order confirmation email for the given products."""
+    rows = "\n".join(
+        f"<tr><td><p>Part {n} description</p><p>SKU: {tayda_product_id(n)}</p></td>"
+        f"<td>{1 + n % 50}</td><td>${0.01 * (1 + n % 100):.2f}</td></tr>"
+        for n in numbers
+    )
+    html = f"""<html><body><p>Thanks for shopping at Tayda Electronics</p>
+<table class="email-items"><thead><tr><th>Item</th><th>Qty</th><th>Price</th></tr>
+</thead><tbody>
+{rows}
+</tbody></table></body></html>"""
+    message = EmailMessage()
+    message["From"] = f"Tayda Electronics <sales@{TAYDA_HOST[4:]}>"
+    message["To"] = "me@example.com"
+    message["Subject"] = "Your Tayda Electronics order"
+    message["Date"] = formatdate()
+    message.set_content(html, subtype="html", cte="quoted-printable")
+    path.write_bytes(bytes(message))
+
+
+def _pdf_string(text: str) -> bytes:
+    escaped = text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+    return f"({escaped})".encode("latin-1")
+
+
+def _pdf(objects: List[bytes]) -> bytes:
+    """Assemble numbered pdf objects into a file with a valid xref table."""
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, obj)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\n" % (len(objects) + 1)
+    out += b"startxref\n%d\n%%%%EOF\n" % xref
+    return bytes(out)
+
+
+# The x position of each column of the Jameco invoice table.
+_JAMECO_COLUMNS = [
+    ("Item", 40),
+    ("Mfg Part #", 100),
+    ("Description", 190),
+    ("Qty", 390),
+    ("Unit", 430),
+    ("Unit Price", 470),
+    ("Amount", 530),
+]
+_ROWS_PER_PAGE = 40
+
+
+def make_jameco_pdf(path: Path, numbers: Sequence[int]):
+    """Write a Jameco pdf invoice for the given products.
+
+    The invoice table is laid out as text in columns, and every product
+    links to its product page from the first page, as in real invoices.
+    """
+    pages = [
+        numbers[i : i + _ROWS_PER_PAGE]
+        for i in range(0, max(len(numbers), 1), _ROWS_PER_PAGE)
+    ]
+    # Objects: catalog, page tree, font, then a page and its contents for
+    # each page, then one link annotation per product.
+    first_page = 4
+    first_annot = first_page + 2 * len(pages)
+    objects: List[bytes] = []
+    kids = " ".join(f"{first_page + 2 * i} 0 R" for i in range(len(pages)))
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    for page_number, page in enumerate(pages):
+        lines = []
+        if page_number == 0:
+            lines.append((40, 750, "Jameco Electronics"))
+            lines.append((40, 735, "Invoice"))
+        y = 700
+        lines += [(x, y, header) for header, x in _JAMECO_COLUMNS]
+        for n in page:
+            y -= 14
+            quantity = 1 + n % 50
+            price = 0.01 * (1 + n % 100)
+            values = [
+                jameco_product_id(n),
+                f"JMPN-{n:05d}",
+                f"Part {n}",
+                str(quantity),
+                "EA",
+                f"{price:.2f}",
+                f"{price * quantity:.2f}",
+            ]
+            lines += [(x, y, v) for (_, x), v in zip(_JAMECO_COLUMNS, values)]
+        stream = (
+            b"BT /F1 8 Tf "
+            + b" ".join(
+                b"1 0 0 1 %d %d Tm %s Tj" % (x, y, _pdf_string(text))
+                for x, y, text in lines
+            )
+            + b" ET"
+        )
+        annots = ""
+        if page_number == 0:
+            refs = " ".join(f"{first_annot + i} 0 R" for i in range(len(numbers)))
+            annots = f"/Annots [{refs}] "
+        objects.append(
+            (
+                "<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                f"/Contents {first_page + 2 * page_number + 1} 0 R "
+                f"/Resources << /Font << /F1 3 0 R >> >> {annots}>>"
+            ).encode()
+        )
+        objects.append(
+            b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream)
+        )
+
+    for i, n in enumerate(numbers):
+        y = 686 - 14 * (i % _ROWS_PER_PAGE)
+        objects.append(
+            b"<< /Type /Annot /Subtype /Link /Rect [40 %d 90 %d] "
+            b"/A << /S /URI /URI %s >> >>"
+            % (y, y + 10, _pdf_string(jameco_product_url(jameco_product_id(n))))
+        )
+    path.write_bytes(_pdf(objects))
+
+
+def make_invoices(
+    workdir: Path,
+    suppliers: Sequence[str] = SUPPLIERS,
+    invoices: int = 10,
+    items: int = 20,
+    products: int = 200,
+    seed: int = 0,
+) -> List[Path]:
+    """Write synthetic invoices.
+
+    Parameters
+    ----------
+    workdir : Path
+        The directory to write the invoices to.
+
+    suppliers : sequence of string, optional
+        Which of `SUPPLIERS` to write invoices for.
+
+    invoices : int, optional
+        The number of invoices for each supplier.
+
+    items : int, optional
+        The number of lines on each invoice.
+
+    products : int, optional
+        The number of distinct products the lines are drawn from.
+
+    seed : int, optional
+        Seed for choosing the products of each invoice.
+
+    Returns
+    -------
+    files : list of Path
+        The invoices written.
+
+    """
+    rng = random.Random(seed)
+    workdir.mkdir(parents=True, exist_ok=True)
+    files = []
+    for supplier in suppliers:
+        for i in range(invoices):
+            numbers = rng.sample(range(products), min(items, products))
+            if supplier == "tayda":
+                path = workdir / f"tayda-{i:04d}.eml"
+                make_tayda_email(path, numbers)
+            else:
+                path = workdir / f"jameco-{i:04d}.pdf"
+                make_jameco_pdf(path, numbers)
+            files.append(path)
+    return files
@@ -0,0 +1,157 @@
+"""Compare full and targeted html parsing of supplier pages and Tayda invoices.
+
+Usage::
+
+    python benchmarks/html_parsing.py [<files>] [--supplier tayda|jameco]
+        [--pages N] [--repeat N]
+
+Each file is either a saved product page (`.html`) of the given supplier, or
+a Tayda invoice (`.eml`). Without files, `--pages` synthetic product pages
+of each supplier from `fixtures` are used. For every file and parsing mode,
+prints one JSON object with the best parse time over `--repeat` runs and
+whether the result matches the full `html.parser` parse, which was the only
+mode before. Tayda pages are compared with how they were read before
+targeted parsing, by the script following the breadcrumbs div. Exits with
+status 1 if any result doesn't match.
+"""
+
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Any, Callable, List, Tuple
+
+# Let the script be run from a checkout, without installing inventorie.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bs4 import BeautifulSoup, FeatureNotFound  # type: ignore
+
+from inventorie.invoice import InvoiceDocument, TaydaInventoryReader
+from inventorie.parsing import HTML_PARSERS, configure_html_parsing
+from inventorie.scrape import JamecoScraper, ScrapeResult, TaydaScraper
+
+import fixtures
+
+
+MODES = [(parser, targeted) for parser in HTML_PARSERS for targeted in (False, True)]
+BASELINE = ("html.parser", False)
+
+
+def baseline_tayda_page(
+    scraper: TaydaScraper, url: str, content: bytes
+) -> Tuple[ScrapeResult, str]:
+    """Read a Tayda product page the way it was read before targeted parsing."""
+    soup = BeautifulSoup(content, features="html.parser")
+    specs = scraper._find_specs_table(soup)
+    if specs is None:
+        raise ValueError(f"Unable to find additional information from {url}")
+    result = scraper._scrape_specs_table(specs)
+    result.datasheet_url = scraper._scrape_datasheet(soup)
+    # The category is in the first script after the breadcrumbs div.
+    script = soup.find("div", {"class": "breadcrumbs"})
+    while script.name != "script":
+        script = script.next_sibling
+    script_data = json.loads(script.text)
+    return result, script_data[".breadcrumbs"]["breadcrumbs"]["categoryOverride"]
+
+
+def page_extractor(
+    file: Path, supplier: str, baseline: bool = False
+) -> Callable[[], Any]:
+    """A function extracting everything inventorie reads from `file`."""
+    if file.suffix == ".eml":
+        reader = TaydaInventoryReader()
+        body = InvoiceDocument(file).payload
+        return lambda: reader._parse_inventory_table(
+            reader._get_inventory_table(body)
+        ).to_dict("records")
+    content = file.read_bytes()
+    if supplier == "tayda":
+        tayda = TaydaScraper()
+        if baseline:
+            return lambda: baseline_tayda_page(tayda, file.name, content)
+        return lambda: tayda._parse_product_page(file.name, content)
+    jameco = JamecoScraper()
+    return lambda: jameco._parse_product_page(file.name, content)
+
+
+def write_fixture_pages(directory: Path, pages: int) -> List[Tuple[Path, str]]:
+    """Write synthetic product pages of each supplier, with their supplier."""
+    files = []
+    for number in range(pages):
+        for supplier, page in [
+            ("tayda", fixtures.tayda_product_page(number)),
+            ("jameco", fixtures.jameco_product_page(number)),
+        ]:
+            file = directory / f"{supplier}-{number:04d}.html"
+            file.write_bytes(page)
+            files.append((file, supplier))
+    return files
+
+
+def time_file(file: Path, supplier: str, repeat: int) -> list:
+    results = []
+    expected = None
+    for parser, targeted in [BASELINE] + [m for m in MODES if m != BASELINE]:
+        configure_html_parsing(parser, targeted=targeted)
+        extract = page_extractor(file, supplier, baseline=expected is None)
+        best = float("inf")
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = extract()
+                best = min(best, time.perf_counter() - start)
+        except FeatureNotFound as e:
+            results.append({"file": file.name, "parser": parser, "error": str(e)})
+            continue
+        if expected is None:
+            expected = result
+        results.append(
+            {
+                "file": file.name,
+                "parser": parser,
+                "targeted": targeted,
+                "seconds": best,
+                "matches": result == expected,
+            }
+        )
+    return results
+
+
+def run_script():
+    parser = ArgumentParser()
+    parser.add_argument("files", type=Path, nargs="*", help="pages or invoices")
+    parser.add_argument(
+        "--supplier",
+        choices=["tayda", "jameco"],
+        default="tayda",
+        help="the supplier of the .html product pages",
+    )
+    parser.add_argument(
+        "--pages",
+        type=int,
+        default=5,
+        help="synthetic pages of each supplier to use if no files are given",
+    )
+    parser.add_argument("--repeat", type=int, default=5)
+    flags = parser.parse_args()
+
+    mismatches = 0
+    with tempfile.TemporaryDirectory() as tmpdir:
+        if flags.files:
+            files = [(file, flags.supplier) for file in flags.files]
+        else:
+            files = write_fixture_pages(Path(tmpdir), flags.pages)
+        for file, supplier in files:
+            for result in time_file(file, supplier, flags.repeat):
+                print(json.dumps(result))
+                mismatches += result.get("matches") is False
+    if mismatches:
+        print(f"{mismatches} parses didn't match the baseline", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_script()
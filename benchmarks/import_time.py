@@ -0,0 +1,126 @@
+"""Measure how long inventorie takes to start.
+
+Usage::
+
+    python benchmarks/import_time.py [--runs N] [--target SECONDS]
+        [--output results.json]
+
+Each scenario runs in a fresh interpreter, `--runs` times, and reports the
+median wall time on top of starting a bare interpreter, along with which
+heavy dependencies it loaded. Supplier modules and the libraries they need
+are loaded on first use, so `--help` and folders of a single kind of
+invoice shouldn't pay for the others. Exits with status 1 if starting the
+command line (`--help`) takes longer than `--target`.
+"""
+
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+
+ROOT = Path(__file__).resolve().parent.parent
+# Dependencies worth keeping off the startup path.
+HEAVY_MODULES = ["pandas", "numpy", "requests", "bs4", "lxml", "pdfreader", "tabula"]
+DEFAULT_TARGET = 0.8
+
+SCENARIOS: Dict[str, str] = {
+    "import": "import inventorie.main",
+    "help": (
+        "import sys\n"
+        "from inventorie.main import run_script\n"
+        "sys.argv = ['inventorie', 'process', '--help']\n"
+        "try:\n"
+        "    run_script()\n"
+        "except SystemExit:\n"
+        "    pass\n"
+    ),
+    "tayda_pipeline": (
+        "from inventorie.supplier import SUPPLIER, get_pipeline\n"
+        "get_pipeline(SUPPLIER.TAYDA, '.eml')\n"
+    ),
+    "jameco_pipeline": (
+        "from inventorie.supplier import SUPPLIER, get_pipeline\n"
+        "get_pipeline(SUPPLIER.JAMECO, '.pdf')\n"
+    ),
+}
+
+# Appended to each scenario to report what it loaded.
+_REPORT = (
+    "\nimport json, sys\n"
+    "print(json.dumps([m for m in {modules!r} if m in sys.modules]), file=sys.stderr)\n"
+)
+
+
+def time_script(script: str, runs: int) -> List[float]:
+    """Wall times of running `script` in fresh interpreters."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(
+            [sys.executable, "-c", script],
+            cwd=ROOT,
+            check=True,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def loaded_modules(script: str) -> List[str]:
+    """The `HEAVY_MODULES` that running `script` imports."""
+    result = subprocess.run(
+        [sys.executable, "-c", script + _REPORT.format(modules=HEAVY_MODULES)],
+        cwd=ROOT,
+        check=True,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    return json.loads(result.stderr.strip().splitlines()[-1])
+
+
+def run_script():
+    parser = ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5, help="runs per scenario")
+    parser.add_argument(
+        "--target",
+        type=float,
+        default=DEFAULT_TARGET,
+        help="the most seconds `--help` may take",
+    )
+    parser.add_argument("--output", type=Path, help="file to write results to")
+    flags = parser.parse_args()
+
+    baseline = statistics.median(time_script("pass", flags.runs))
+    results = []
+    for name, script in SCENARIOS.items():
+        seconds = statistics.median(time_script(script, flags.runs)) - baseline
+        results.append(
+            {"scenario": name, "seconds": seconds, "loaded": loaded_modules(script)}
+        )
+        print(json.dumps(results[-1]))
+
+    if flags.output:
+        with open(flags.output, "w") as f:
+            json.dump(
+                {"baseline": baseline, "target": flags.target, "results": results},
+                f,
+                indent=2,
+            )
+    help_seconds = next(r["seconds"] for r in results if r["scenario"] == "help")
+    if help_seconds > flags.target:
+        print(
+            f"Starting took {help_seconds:.2f}s, over the target of {flags.target}s",
+            file=sys.stderr,
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_script()
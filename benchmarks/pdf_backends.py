@@ -0,0 +1,56 @@
+"""Compare the pdf table extraction backends of `JamecoInventoryReader`.
+
+Usage::
+
+    python benchmarks/pdf_backends.py <dir-of-jameco-pdfs> [--backends ...]
+
+Prints one JSON object per backend with the total and per-file wall time.
+"""
+
+from argparse import ArgumentParser
+import json
+from pathlib import Path
+import sys
+import time
+
+# Let the script be run from a checkout, without installing inventorie.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from inventorie.invoice.pdf import PDF_BACKENDS, JamecoInventoryReader
+
+
+def time_backend(backend: str, files: list) -> dict:
+    reader = JamecoInventoryReader(backend=backend)
+    start = time.perf_counter()
+    reader.prefetch(files)
+    rows = 0
+    for file in files:
+        rows += len(reader.read(file))
+    elapsed = time.perf_counter() - start
+    return {
+        "backend": backend,
+        "files": len(files),
+        "rows": rows,
+        "seconds": elapsed,
+        "seconds_per_file": elapsed / len(files) if files else None,
+    }
+
+
+def run_script():
+    parser = ArgumentParser()
+    parser.add_argument("pdfdir", type=Path, help="directory of Jameco invoices")
+    parser.add_argument(
+        "--backends", nargs="+", choices=PDF_BACKENDS, default=list(PDF_BACKENDS)
+    )
+    flags = parser.parse_args()
+    files = sorted(flags.pdfdir.glob("*.pdf"))
+    for backend in flags.backends:
+        try:
+            result = time_backend(backend, files)
+        except ImportError as e:
+            result = {"backend": backend, "error": str(e)}
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    run_script()
@@ -0,0 +1,192 @@
+"""A local HTTP server standing in for the supplier websites.
+
+It serves the pages of `fixtures`: Tayda search redirects, product and
+category pages, Jameco product pages, and datasheets, which can be
+requested from an offset with a range request. `session()`
+returns an `inventorie.session.Session` that sends requests for the
+supplier hosts to the server, so the pipelines run unchanged and offline.
+"""
+
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import random
+import re
+import threading
+import time
+from typing import Optional
+from urllib.parse import parse_qs, urlsplit
+
+from requests.adapters import HTTPAdapter  # type: ignore
+
+from inventorie.session import Session
+
+import fixtures
+
+
+class _StubAdapter(HTTPAdapter):
+    """Sends requests to the stub server, keeping their original urls."""
+
+    def __init__(self, base_url: str, **kwargs):
+        super().__init__(**kwargs)
+        self.base_url = base_url
+
+    def send(self, request, **kwargs):
+        original = request.url
+        parts = urlsplit(original)
+        request.url = f"{self.base_url}/{parts.netloc}{parts.path}"
+        if parts.query:
+            request.url += f"?{parts.query}"
+        try:
+            resp = super().send(request, **kwargs)
+        finally:
+            request.url = original
+        resp.url = original
+        return resp
+
+
+class StubSupplierServer:
+    def __init__(
+        self,
+        latency: float = 0.0,
+        padding: int = fixtures.DEFAULT_PAGE_PADDING,
+        throttle_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        """Serve synthetic supplier pages from a local thread.
+
+        Parameters
+        ----------
+        latency : float, optional
+            Seconds to wait before answering each request, to simulate the
+            network.
+
+        padding : int, optional
+            Bytes of unread markup in each product page.
+
+        throttle_rate : float, optional
+            The fraction of requests answered with "429 Too Many Requests",
+            to simulate a supplier throttling requests.
+
+        seed : int, optional
+            Seed for choosing which requests are throttled.
+
+        """
+        self.latency = latency
+        self.padding = padding
+        self.throttle_rate = throttle_rate
+        self._random = random.Random(seed)
+        # Requests served, by kind of page.
+        self.requests: Counter = Counter()
+        self._lock = threading.Lock()
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        assert self._server is not None, "the server isn't running"
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def do_GET(self):
+                server._handle(self, body=True)
+
+            def do_HEAD(self):
+                server._handle(self, body=False)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def session(self, pool_size: int = 32) -> Session:
+        """A session sending requests for the supplier hosts to this server."""
+        session = Session(pool_size=pool_size)
+        adapter = _StubAdapter(
+            self.base_url, pool_connections=2, pool_maxsize=pool_size
+        )
+        for host in (fixtures.TAYDA_HOST, fixtures.JAMECO_HOST):
+            session.mount(f"https://{host}/", adapter)
+        return session
+
+    def __enter__(self) -> "StubSupplierServer":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _route(self, host: str, path: str, query: dict):
+        """The kind of page, and its status, headers and body."""
+        if host == fixtures.TAYDA_HOST:
+            if path == "/catalogsearch/result/":
+                product_id = query.get("q", [""])[0]
+                location = fixtures.tayda_product_url(product_id)
+                return "tayda_search", 302, {"Location": location}, b""
+            match = re.fullmatch(r"/a-(\d+)\.html", path)
+            if match:
+                page = fixtures.tayda_product_page(int(match[1]), self.padding)
+                return "tayda_product", 200, {}, page
+            match = re.fullmatch(r"/category-(\d+)\.html", path)
+            if match:
+                page = fixtures.tayda_category_page(int(match[1]))
+                return "tayda_category", 200, {}, page
+            if path.startswith("/datasheets/files/"):
+                return "tayda_datasheet", 200, {}, fixtures.DATASHEET
+        if host == fixtures.JAMECO_HOST:
+            if path.endswith("/ProductDisplay"):
+                product_id = query.get("productId", ["0"])[0]
+                number = int(product_id) - 100000
+                page = fixtures.jameco_product_page(number, self.padding)
+                return "jameco_product", 200, {}, page
+            if path.startswith("/Jameco/Products/ProdDS/"):
+                return "jameco_datasheet", 200, {}, fixtures.DATASHEET
+        return "not_found", 404, {}, b""
+
+    def _handle(self, handler: BaseHTTPRequestHandler, body: bool):
+        parts = urlsplit(handler.path)
+        host, _, path = parts.path.lstrip("/").partition("/")
+        kind, status, headers, content = self._route(
+            host, "/" + path, parse_qs(parts.query)
+        )
+        match = re.fullmatch(r"bytes=(\d+)-", handler.headers.get("Range", ""))
+        if match and status == 200 and kind.endswith("_datasheet"):
+            start, size = int(match[1]), len(content)
+            if start >= size:
+                headers = {**headers, "Content-Range": f"bytes */{size}"}
+                status, content = 416, b""
+            else:
+                headers = {
+                    **headers,
+                    "Content-Range": f"bytes {start}-{size - 1}/{size}",
+                }
+                status, content = 206, content[start:]
+        with self._lock:
+            if self._random.random() < self.throttle_rate:
+                kind, status, content = "throttled", 429, b""
+                headers = {"Retry-After": "0"}
+            self.requests[kind] += 1
+        if self.latency:
+            time.sleep(self.latency)
+        handler.send_response(status)
+        for name, value in headers.items():
+            handler.send_header(name, value)
+        handler.send_header("Content-Type", "text/html")
+        handler.send_header("Content-Length", str(len(content)))
+        handler.end_headers()
+        if body:
+            handler.wfile.write(content)
@@ -0,0 +1,227 @@
+"""Measure each stage of processing invoices, offline.
+
+Usage::
+
+    python benchmarks/suite.py [--suppliers tayda jameco] [--invoices N]
+        [--items N] [--products N] [--latency SECONDS] [--throttle-rate RATE]
+        [--output results.json]
+
+Synthetic invoices are written to a temporary directory, and supplier
+pages are served by a local stub server. Each stage is timed separately:
+supplier detection, reading invoices, product lookup, scraping, and
+end-to-end runs of `main()`, per invoice and staged. One JSON object per
+stage is printed with its throughput, latency percentiles and the stub
+requests it made, and all of them are written to `--output` along with the
+run settings, so results can be compared between commits. Stages that fail
+(e.g. reading pdfs without Java) report the error.
+
+Exits with status 1 if either full run requested more Tayda product pages
+than it looked up products, i.e. the scraper didn't reuse the pages
+fetched by the product lookup. Pass `--products` above 256 to check this
+holds for batches larger than the default page store.
+"""
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+import io
+import json
+from pathlib import Path
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+# Let the script be run from a checkout, without installing inventorie.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import pandas as pd  # type: ignore
+
+from inventorie.cache import close_caches, disable_cache
+from inventorie.invoice import InvoiceDocument
+from inventorie.main import main
+from inventorie.session import set_session
+from inventorie.supplier import detect_supplier_from_file, get_pipeline_from_file
+
+from fixtures import SUPPLIERS, make_invoices
+from stub_server import StubSupplierServer
+
+
+def summarize(stage: str, latencies: List[float], items: int, seconds: float) -> dict:
+    """Throughput and latency percentiles of a stage."""
+    latencies = sorted(latencies)
+
+    def percentile(p: float) -> float:
+        return latencies[min(len(latencies) - 1, int(p * len(latencies)))]
+
+    return {
+        "stage": stage,
+        "calls": len(latencies),
+        "items": items,
+        "seconds": seconds,
+        "items_per_second": items / seconds if seconds else None,
+        "latency_mean": statistics.mean(latencies),
+        "latency_p50": percentile(0.5),
+        "latency_p95": percentile(0.95),
+        "latency_max": latencies[-1],
+    }
+
+
+def time_calls(
+    stage: str, calls: Iterable[Callable[[], Tuple[int, Any]]]
+) -> Tuple[dict, list]:
+    """Time each call, which returns the number of items it handled and a result."""
+    latencies = []
+    items = 0
+    results = []
+    start = time.perf_counter()
+    for call in calls:
+        call_start = time.perf_counter()
+        n, result = call()
+        latencies.append(time.perf_counter() - call_start)
+        items += n
+        results.append(result)
+    return summarize(stage, latencies, items, time.perf_counter() - start), results
+
+
+def run_stages(
+    files: List[Path], workdir: Path, server: StubSupplierServer
+) -> List[dict]:
+    results = []
+
+    def _stage(name: str, calls: list) -> list:
+        if not calls:
+            results.append({"stage": name, "skipped": "no input"})
+            return []
+        before = server.requests.copy()
+        try:
+            summary, values = time_calls(name, calls)
+        except Exception as e:
+            results.append({"stage": name, "error": repr(e)})
+            return []
+        summary["requests"] = dict(server.requests - before)
+        results.append(summary)
+        return values
+
+    _stage(
+        "detect",
+        [lambda f=f: (1, detect_supplier_from_file(InvoiceDocument(f))) for f in files],
+    )
+    pipelines = {f: get_pipeline_from_file(InvoiceDocument(f)) for f in files}
+
+    def _read(file: Path):
+        df = pipelines[file].reader.read(InvoiceDocument(file))
+        return len(df), (file, df)
+
+    read = _stage("read", [lambda f=f: _read(f) for f in files])
+
+    # Each enrichment step is timed on its own, over every invoice read.
+    for number, stage in [(0, "lookup"), (1, "scrape")]:
+
+        def _step(file: Path, df: pd.DataFrame):
+            steps = pipelines[file].steps
+            if number >= len(steps):
+                return 0, (file, df)
+            return len(df), (file, steps[number].update_dataframe(df))
+
+        read = _stage(stage, [lambda f=f, df=df: _step(f, df) for f, df in read])
+
+    close_caches()
+    with tempfile.TemporaryDirectory() as outdir:
+        output = Path(outdir) / "output.csv"
+
+        def _main(**kwargs):
+            with redirect_stdout(io.StringIO()):
+                main(workdir, output, **kwargs)
+            return len(pd.read_csv(output)), None
+
+        _stage("main", [_main])
+        _stage("main_staged", [lambda: _main(staged=True)])
+    return results
+
+
+def check_page_reuse(results: List[dict]) -> List[str]:
+    """Problems with how the full runs reused fetched product pages."""
+    problems = []
+    for result in results:
+        if result["stage"] not in ("main", "main_staged"):
+            continue
+        requests = result.get("requests", {})
+        # Each product searched for redirects to its page, which the
+        # scraper should then reuse rather than download again.
+        searched = requests.get("tayda_search", 0)
+        fetched = requests.get("tayda_product", 0)
+        if fetched > searched:
+            problems.append(
+                f"The {result['stage']} run fetched {fetched} Tayda product "
+                f"pages for {searched} searches, instead of reusing the "
+                "lookup's pages"
+            )
+    return problems
+
+
+def run_script():
+    parser = ArgumentParser()
+    parser.add_argument(
+        "--suppliers", nargs="+", choices=SUPPLIERS, default=list(SUPPLIERS)
+    )
+    parser.add_argument("--invoices", type=int, default=10, help="per supplier")
+    parser.add_argument("--items", type=int, default=20, help="lines per invoice")
+    parser.add_argument(
+        "--products", type=int, default=200, help="distinct products to draw from"
+    )
+    parser.add_argument(
+        "--latency", type=float, default=0.0, help="seconds per stub request"
+    )
+    parser.add_argument(
+        "--throttle-rate",
+        type=float,
+        default=0.0,
+        help="fraction of stub requests answered with 429",
+    )
+    parser.add_argument("--output", type=Path, help="file to write results to")
+    flags = parser.parse_args()
+
+    settings: Dict[str, object] = {
+        "suppliers": flags.suppliers,
+        "invoices": flags.invoices,
+        "items": flags.items,
+        "products": flags.products,
+        "latency": flags.latency,
+        "throttle_rate": flags.throttle_rate,
+        "python": platform.python_version(),
+    }
+    disable_cache()
+    with tempfile.TemporaryDirectory() as tmpdir, StubSupplierServer(
+        latency=flags.latency, throttle_rate=flags.throttle_rate
+    ) as server:
+        workdir = Path(tmpdir)
+        files = make_invoices(
+            workdir,
+            suppliers=flags.suppliers,
+            invoices=flags.invoices,
+            items=flags.items,
+            products=flags.products,
+        )
+        set_session(server.session())
+        try:
+            results = run_stages(files, workdir, server)
+        finally:
+            set_session(None)
+        settings["requests"] = dict(server.requests)
+
+    for result in results:
+        print(json.dumps(result))
+    if flags.output:
+        with open(flags.output, "w") as f:
+            json.dump({"settings": settings, "results": results}, f, indent=2)
+    problems = check_page_reuse(results)
+    for problem in problems:
+        print(problem, file=sys.stderr)
+    if problems:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    run_script()
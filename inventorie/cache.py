@@ -0,0 +1,295 @@
+from concurrent.futures import Future
+import json
+import os
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Union
+
+from .instrument import record_cache
+
+
+DEFAULT_CACHE_DIR = (
+    Path(os.environ.get("XDG_CACHE_HOME", Path.home() / ".cache")) / "inventorie"
+)
+DEFAULT_TTL = 30 * 24 * 60 * 60.0
+DEFAULT_MAX_ENTRIES = 50_000
+
+# How many writes between checks of the table size.
+_EVICT_EVERY = 100
+
+
+class Cache:
+    def __init__(
+        self,
+        path: Union[Path, str],
+        table: str = "cache",
+        ttl: Optional[float] = DEFAULT_TTL,
+        max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+        refresh: bool = False,
+    ):
+        """A persistent key-value cache backed by SQLite.
+
+        Values are stored as JSON, so anything `json.dumps` can handle can
+        be cached.
+
+        Parameters
+        ----------
+        path : string or Path
+            The SQLite database file. Parent directories are created.
+
+        table : string, optional, default="cache"
+            The table to store entries in. Several caches may share one
+            database file by using different tables.
+
+        ttl : float, optional
+            Seconds after which an entry is considered stale. If `None`
+            entries never expire.
+
+        max_entries : int, optional
+            Maximum number of entries to keep. The least recently used
+            entries are evicted beyond this. If `None` the cache is unbounded.
+
+        refresh : bool, optional, default=False
+            If `True` never return cached entries, but still store new ones.
+
+        """
+        if not table.isidentifier():
+            raise ValueError(f"Invalid cache table name {table!r}")
+        self.path = Path(path)
+        self.table = table
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.refresh = refresh
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                "key TEXT PRIMARY KEY, "
+                "value TEXT NOT NULL, "
+                "created_at REAL NOT NULL, "
+                "accessed_at REAL NOT NULL)"
+            )
+            self._conn.execute(
+                f"CREATE INDEX IF NOT EXISTS {self.table}_accessed_at "
+                f"ON {self.table} (accessed_at)"
+            )
+        self.evict()
+
+    def get(self, key: str) -> Optional[Any]:
+        """Get the cached value for `key`, or `None` if missing or stale."""
+        if self.refresh:
+            record_cache(self.table, hit=False)
+            return None
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT value, created_at FROM {self.table} WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                record_cache(self.table, hit=False)
+                return None
+            value, created_at = row
+            with self._conn:
+                if self.ttl is not None and now - created_at > self.ttl:
+                    self._conn.execute(
+                        f"DELETE FROM {self.table} WHERE key = ?", (key,)
+                    )
+                    record_cache(self.table, hit=False)
+                    return None
+                self._conn.execute(
+                    f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?",
+                    (now, key),
+                )
+        record_cache(self.table, hit=True)
+        return json.loads(value)
+
+    def set(self, key: str, value: Any):
+        """Store `value` under `key`, replacing any existing entry."""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {self.table} "
+                "(key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value), now, now),
+            )
+            self._writes += 1
+            evict = self._writes % _EVICT_EVERY == 0
+        if evict:
+            self.evict()
+
+    def evict(self):
+        """Drop stale entries, then the least recently used beyond `max_entries`."""
+        with self._lock, self._conn:
+            if self.ttl is not None:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE created_at < ?",
+                    (time.time() - self.ttl,),
+                )
+            if self.max_entries is not None:
+                self._conn.execute(
+                    f"DELETE FROM {self.table} WHERE key IN ("
+                    f"SELECT key FROM {self.table} ORDER BY accessed_at DESC "
+                    "LIMIT -1 OFFSET ?)",
+                    (self.max_entries,),
+                )
+
+    def clear(self):
+        """Remove every entry."""
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM {self.table}")
+
+    def close(self):
+        self.evict()
+        with self._lock:
+            self._conn.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute(
+                f"SELECT COUNT(*) FROM {self.table}"
+            ).fetchone()
+        return count
+
+
+class Memo:
+    def __init__(self, cache: Optional[Cache] = None, name: str = "memo"):
+        """A thread-safe in-memory memo, optionally backed by a `Cache`.
+
+        Concurrent lookups of the same key share a single computation:
+        the first caller computes the value while the others wait for it.
+        Failed computations are not memoized.
+
+        Parameters
+        ----------
+        cache : Cache, optional
+            A persistent cache to read values from and write values to.
+
+        name : string, optional, default="memo"
+            The name hits and misses are recorded under when profiling.
+
+        """
+        self.cache = cache
+        self.name = name
+        self._lock = threading.Lock()
+        self._values: Dict[str, Any] = {}
+        self._pending: Dict[str, Future] = {}
+
+    def get(self, key: str, compute: Callable[[str], Any]) -> Any:
+        """Get the value for `key`, calling `compute(key)` if not yet known."""
+        with self._lock:
+            if key in self._values:
+                record_cache(self.name, hit=True)
+                return self._values[key]
+            future = self._pending.get(key)
+            if future is not None:
+                owner = False
+            else:
+                owner = True
+                future = self._pending[key] = Future()
+        record_cache(self.name, hit=not owner)
+        if not owner:
+            return future.result()
+
+        try:
+            value = self.cache.get(key) if self.cache is not None else None
+            if value is None:
+                value = compute(key)
+                if self.cache is not None:
+                    self.cache.set(key, value)
+        except BaseException as e:
+            with self._lock:
+                del self._pending[key]
+            future.set_exception(e)
+            raise
+        with self._lock:
+            self._values[key] = value
+            del self._pending[key]
+        future.set_result(value)
+        return value
+
+
+_SETTINGS: Optional[Dict[str, Any]] = None
+_CACHES: Dict[str, Cache] = {}
+_MEMOS: Dict[str, Memo] = {}
+_CACHES_LOCK = threading.Lock()
+
+
+def configure_cache(
+    cache_dir: Union[Path, str] = DEFAULT_CACHE_DIR,
+    ttl: Optional[float] = DEFAULT_TTL,
+    max_entries: Optional[int] = DEFAULT_MAX_ENTRIES,
+    refresh: bool = False,
+):
+    """Enable the shared caches used while processing invoices.
+
+    Parameters
+    ----------
+    cache_dir : string or Path, optional
+        Directory to keep the cache database in.
+
+    ttl : float, optional
+        Seconds after which cached entries go stale.
+
+    max_entries : int, optional
+        Maximum number of entries to keep in each cache.
+
+    refresh : bool, optional, default=False
+        Ignore existing entries, re-fetching and overwriting them.
+
+    """
+    global _SETTINGS
+    close_caches()
+    _SETTINGS = {
+        "path": Path(cache_dir) / "cache.sqlite",
+        "ttl": ttl,
+        "max_entries": max_entries,
+        "refresh": refresh,
+    }
+
+
+def disable_cache():
+    """Disable the shared caches."""
+    global _SETTINGS
+    close_caches()
+    _SETTINGS = None
+
+
+def get_cache(name: str) -> Optional[Cache]:
+    """Get the shared cache `name`, or `None` if caching is not configured."""
+    if _SETTINGS is None:
+        return None
+    with _CACHES_LOCK:
+        if name not in _CACHES:
+            _CACHES[name] = Cache(table=name, **_SETTINGS)
+        return _CACHES[name]
+
+
+def get_memo(name: str) -> Memo:
+    """Get the shared memo `name`.
+
+    The memo lives until the caches are closed, and is persisted in the
+    cache of the same name if caching is configured.
+    """
+    cache = get_cache(name)
+    with _CACHES_LOCK:
+        if name not in _MEMOS:
+            _MEMOS[name] = Memo(cache, name=f"memo:{name}")
+        return _MEMOS[name]
+
+
+def close_caches():
+    """Close all open shared caches and forget shared memos."""
+    with _CACHES_LOCK:
+        for cache in _CACHES.values():
+            cache.close()
+        _CACHES.clear()
+        _MEMOS.clear()
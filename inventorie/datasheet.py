@@ -1,14 +1,48 @@
-from typing import Protocol
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Protocol
 
 import pandas as pd  # type: ignore
 import requests  # type: ignore
 
+from .cache import get_cache
+from .pipeline import (
+    ERROR_COLUMN,
+    BatchChainable,
+    gather_bounded,
+    run_in_executor,
+    split_errors,
+    update_batch_step,
+    update_batch_step_async,
+)
+from .scheduler import get_scheduler
+from .session import get_session
+
+
+def check_datasheet(url: str) -> bool:
+    """Whether a datasheet is available at `url`, without downloading it.
+
+    Only the headers are requested. Servers that don't answer HEAD
+    requests are asked for the first byte of the file instead.
+    """
+    resp = get_session().head(url, allow_redirects=True)
+    if resp.status_code == 200:
+        return True
+    if resp.status_code in (404, 410):
+        return False
+    resp = get_session().get(url, headers={"Range": "bytes=0-0"}, stream=True)
+    resp.close()
+    return resp.status_code in (200, 206)
+
 
 class DatasheetLookup(Protocol):
     """Protocol for generating links to datasheets for product."""
 
     supplier: str
 
+    key: str = "product_id"
+    columns: List[str] = ["datasheet_url"]
+
     def lookup(self, product_id: str, validate: bool = False) -> str:
         """Get datasheet for product.
 
@@ -28,19 +62,56 @@ class DatasheetLookup(Protocol):
         """
         ...
 
+    async def lookup_async(self, product_id: str, validate: bool = False) -> str:
+        """Get datasheet for product without blocking the event loop."""
+        return await run_in_executor(self.lookup, product_id, validate)
+
+    def lookup_batch(self, product_ids: pd.Series, validate: bool = False) -> pd.Series:
+        """Get datasheets for many products.
+
+        Parameters
+        ----------
+        product_ids : Series
+            The product IDs for the products to look up datasheets.
+
+        validate : bool, optional, default=False
+            Whether or not to query the found websites to verify that
+            they are active links.
+
+        Returns
+        -------
+        urls : Series
+            Urls to the product datasheets, indexed like `product_ids`.
+            Products whose datasheet couldn't be found or validated are
+            missing.
+        """
+        results = get_scheduler().map(
+            lambda product_id: self.lookup(product_id, validate),
+            product_ids,
+            return_exceptions=True,
+        )
+        urls, _ = split_errors(self, results)
+        return pd.Series(urls, index=product_ids.index, dtype=object)
+
+    def update_batch(self, product_ids: pd.Series) -> pd.DataFrame:
+        return self.lookup_batch(product_ids).to_frame("datasheet_url")
+
+    async def update_batch_async(
+        self, product_ids: pd.Series, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        async with semaphore:
+            return await run_in_executor(self.update_batch, product_ids)
+
     def update_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
-        if "datasheet_url" not in df.columns:
-            df["datasheet_url"] = None
-        for idx, row in df.iterrows():
-            if row["datasheet_url"] is not None:
-                continue
-            datasheet_url = self.lookup(row["product_id"])
-            df.at[idx, "datasheet_url"] = datasheet_url
-        return df
+        return update_batch_step(self, df)
+
+    async def update_dataframe_async(
+        self, df: pd.DataFrame, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        return await update_batch_step_async(self, df, semaphore)
 
     def _validate(self, url: str):
-        resp = requests.get(url)
-        if resp.status_code != 200:
+        if not check_datasheet(url):
             raise ValueError(f"No datasheet available at {url}.")
 
 
@@ -55,3 +126,95 @@ class JamecoDatasheetLookup(DatasheetLookup):
         if validate:
             self._validate(datasheet_url)
         return datasheet_url
+
+    def lookup_batch(self, product_ids: pd.Series, validate: bool = False) -> pd.Series:
+        prefix, suffix = self.DATASHEET_URL.split("{}")
+        datasheet_urls = prefix + product_ids.astype(str) + suffix
+        if validate:
+            results = get_scheduler().map(
+                self._validate, datasheet_urls, return_exceptions=True
+            )
+            _, errors = split_errors(self, results)
+            datasheet_urls = datasheet_urls.where(pd.isna(errors))
+        return datasheet_urls
+
+
+class DatasheetValidator(BatchChainable):
+    """Checks that the datasheet of each row is available.
+
+    Fills `datasheet_status` with "ok", "missing" if the supplier has no
+    file at `datasheet_url`, or "error" if the request failed, and
+    `datasheet_checked_at` with when it was checked. Urls are checked
+    concurrently with `check_datasheet`, so no datasheet is downloaded.
+    Available datasheets are cached, so re-runs don't check them again
+    until the cache entry goes stale.
+    """
+
+    key = "datasheet_url"
+    columns: List[str] = ["datasheet_status", "datasheet_checked_at"]
+
+    def validate(self, url: str) -> Dict[str, str]:
+        """The status of the datasheet at `url`, and when it was checked.
+
+        Parameters
+        ----------
+        url : string
+            The url of the datasheet.
+
+        Returns
+        -------
+        result : dict
+            The `datasheet_status` and `datasheet_checked_at`, an ISO 8601
+            time in UTC.
+
+        """
+        cache = get_cache("datasheet_status")
+        cached: Optional[Dict[str, str]] = None
+        if cache is not None:
+            cached = cache.get(url)
+        if cached is not None:
+            return cached
+        try:
+            status = "ok" if check_datasheet(url) else "missing"
+        except requests.RequestException:
+            status = "error"
+        result = {
+            "datasheet_status": status,
+            "datasheet_checked_at": datetime.now(timezone.utc).isoformat(
+                timespec="seconds"
+            ),
+        }
+        if cache is not None and status == "ok":
+            cache.set(url, result)
+        return result
+
+    async def validate_async(self, url: str) -> Dict[str, str]:
+        return await run_in_executor(self.validate, url)
+
+    def update_batch(self, urls: pd.Series) -> pd.DataFrame:
+        results = get_scheduler().map(self.validate, urls, return_exceptions=True)
+        return self._to_frame(results, urls.index)
+
+    async def update_batch_async(
+        self, urls: pd.Series, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        results = await gather_bounded(
+            semaphore, self.validate_async, urls, return_exceptions=True
+        )
+        return self._to_frame(results, urls.index)
+
+    def update_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        return update_batch_step(self, df)
+
+    async def update_dataframe_async(
+        self, df: pd.DataFrame, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        return await update_batch_step_async(self, df, semaphore)
+
+    def _to_frame(self, results: List[Any], index: pd.Index) -> pd.DataFrame:
+        statuses, errors = split_errors(self, results)
+        df = pd.DataFrame(
+            [status or {} for status in statuses], index=index, columns=self.columns
+        )
+        df[ERROR_COLUMN] = errors
+        return df
@@ -0,0 +1,197 @@
+from bisect import bisect_left
+from collections import defaultdict
+from contextlib import contextmanager
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import urlparse
+
+
+# Upper bounds, in seconds, of the buckets of the request latency histogram.
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, float("inf")]
+
+
+class _HostStats:
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.hedges = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.histogram = [0] * len(LATENCY_BUCKETS)
+
+
+class Profiler:
+    def __init__(self):
+        """Collects timings and counters while invoices are processed.
+
+        Records the time spent in each stage (reading an invoice, each
+        pipeline step), overall and per invoice, the requests made to each
+        host, and the hit rate of each cache. Safe to use from any thread.
+        """
+        self._lock = threading.Lock()
+        self.started_at = time.perf_counter()
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+        self.invoices: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: defaultdict(float)
+        )
+        self.hosts: Dict[str, _HostStats] = defaultdict(_HostStats)
+        self.caches: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0}
+        )
+
+    def record_stage(self, stage: str, seconds: float, invoice: Optional[str] = None):
+        with self._lock:
+            self.stages[stage].append(seconds)
+            if invoice is not None:
+                self.invoices[invoice][stage] += seconds
+
+    def record_request(
+        self,
+        url: str,
+        seconds: float,
+        size: int = 0,
+        error: bool = False,
+        retry: bool = False,
+        hedge: bool = False,
+    ):
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            stats = self.hosts[host]
+            stats.requests += 1
+            stats.errors += error
+            stats.retries += retry
+            stats.hedges += hedge
+            stats.bytes += size
+            stats.seconds += seconds
+            stats.histogram[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def record_cache(self, name: str, hit: bool):
+        with self._lock:
+            self.caches[name]["hits" if hit else "misses"] += 1
+
+    def summary(self) -> Dict[str, Any]:
+        """Everything recorded, as plain data that can be dumped to JSON."""
+        with self._lock:
+            return {
+                "seconds": time.perf_counter() - self.started_at,
+                "stages": {
+                    stage: {
+                        "calls": len(times),
+                        "seconds": sum(times),
+                        "mean": sum(times) / len(times),
+                        "max": max(times),
+                    }
+                    for stage, times in self.stages.items()
+                },
+                "invoices": {
+                    invoice: dict(stages) for invoice, stages in self.invoices.items()
+                },
+                "hosts": {
+                    host: {
+                        "requests": stats.requests,
+                        "errors": stats.errors,
+                        "retries": stats.retries,
+                        "hedges": stats.hedges,
+                        "bytes": stats.bytes,
+                        "seconds": stats.seconds,
+                        "latency_histogram": {
+                            f"<={bound}": count
+                            for bound, count in zip(LATENCY_BUCKETS, stats.histogram)
+                        },
+                    }
+                    for host, stats in self.hosts.items()
+                },
+                "caches": {
+                    name: dict(
+                        counts,
+                        hit_rate=counts["hits"] / (counts["hits"] + counts["misses"]),
+                    )
+                    for name, counts in self.caches.items()
+                },
+            }
+
+    def report(self) -> str:
+        """A human readable summary."""
+        summary = self.summary()
+        lines = [
+            f"Profile ({summary['seconds']:.2f}s)",
+            "",
+            "Stages (summed across threads):",
+        ]
+        for stage, stats in summary["stages"].items():
+            lines.append(
+                f"  {stage:<40} {stats['calls']:>6} calls "
+                f"{stats['seconds']:>9.3f}s total {stats['mean']:>8.3f}s mean "
+                f"{stats['max']:>8.3f}s max"
+            )
+        if summary["invoices"]:
+            lines += ["", "Invoices:"]
+            for invoice, stages in sorted(summary["invoices"].items()):
+                times = ", ".join(f"{s} {t:.3f}s" for s, t in stages.items())
+                lines.append(f"  {invoice}: {times}")
+        if summary["hosts"]:
+            lines += ["", "Requests:"]
+            for host, stats in summary["hosts"].items():
+                lines.append(
+                    f"  {host:<40} {stats['requests']:>6} requests "
+                    f"{stats['errors']:>4} errors {stats['retries']:>4} retries "
+                    f"{stats['hedges']:>4} hedges "
+                    f"{stats['bytes'] / 1e6:>8.2f}MB "
+                    f"{stats['seconds'] / stats['requests']:>7.3f}s mean"
+                )
+                histogram = " ".join(
+                    f"{bound}:{count}"
+                    for bound, count in stats["latency_histogram"].items()
+                    if count
+                )
+                lines.append(f"    latency {histogram}")
+        if summary["caches"]:
+            lines += ["", "Caches:"]
+            for name, stats in summary["caches"].items():
+                lines.append(
+                    f"  {name:<40} {stats['hits']:>6} hits {stats['misses']:>6} "
+                    f"misses {stats['hit_rate']:>6.1%} hit rate"
+                )
+        return "\n".join(lines)
+
+
+_PROFILER: Optional[Profiler] = None
+
+
+def get_profiler() -> Optional[Profiler]:
+    """The active profiler, or `None` if not profiling."""
+    return _PROFILER
+
+
+def set_profiler(profiler: Optional[Profiler]):
+    """Start recording to `profiler`, or stop profiling with `None`."""
+    global _PROFILER
+    _PROFILER = profiler
+
+
+@contextmanager
+def timed(stage: str, invoice: Optional[str] = None) -> Iterator[None]:
+    """Record the time spent in the block as `stage`, if profiling."""
+    profiler = _PROFILER
+    if profiler is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        profiler.record_stage(stage, time.perf_counter() - start, invoice)
+
+
+def record_request(url: str, seconds: float, **kwargs: Any):
+    """Record a request to `url`, if profiling."""
+    if _PROFILER is not None:
+        _PROFILER.record_request(url, seconds, **kwargs)
+
+
+def record_cache(name: str, hit: bool):
+    """Record a lookup in the cache `name`, if profiling."""
+    if _PROFILER is not None:
+        _PROFILER.record_cache(name, hit)
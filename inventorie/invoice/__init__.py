@@ -1,3 +1,19 @@
-from .pdf import JamecoInventoryReader
-from .html import TaydaInventoryReader
+import importlib
+from typing import Any
+
 from .reader import InventoryReader
+from .document import InvoiceDocument, as_document
+
+# Readers are imported on first use, so reading emails doesn't load the pdf
+# libraries and reading pdfs doesn't load the html parser.
+_READER_MODULES = {
+    "JamecoInventoryReader": ".pdf",
+    "TaydaInventoryReader": ".html",
+}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _READER_MODULES:
+        module = importlib.import_module(_READER_MODULES[name], __name__)
+        return getattr(module, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
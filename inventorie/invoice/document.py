@@ -0,0 +1,171 @@
+import email
+from email.message import Message
+from email.parser import BytesHeaderParser
+from io import BytesIO
+import os
+from pathlib import Path
+import threading
+from typing import TYPE_CHECKING, List, Optional, Union
+
+if TYPE_CHECKING:
+    from pdfreader import SimplePDFViewer  # type: ignore
+
+
+class InvoiceDocument:
+    def __init__(self, path: Union[Path, str]):
+        """An invoice file that is read and parsed at most once.
+
+        Supplier detection, table extraction and link extraction all work
+        from the same document, so the file's bytes are only read once and
+        each representation (email message, pdf viewer) is only parsed once.
+        A document can be used anywhere a path is expected.
+
+        Parameters
+        ----------
+        path : string or Path
+            The invoice file.
+
+        """
+        self.path = Path(path)
+        self._lock = threading.RLock()
+        self._data: Optional[bytes] = None
+        self._message: Optional[Message] = None
+        self._viewer: Optional["SimplePDFViewer"] = None
+        self._headers: Optional[Message] = None
+        self._page_strings: List[List[str]] = []
+        self._all_pages_rendered = False
+        self._annotations: Optional[list] = None
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def suffix(self) -> str:
+        return self.path.suffix
+
+    def __getstate__(self) -> dict:
+        # Only the path is sent to other processes, which re-read the file.
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict):
+        InvoiceDocument.__init__(self, state["path"])
+
+    def __fspath__(self) -> str:
+        return str(self.path)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({str(self.path)!r})"
+
+    @property
+    def data(self) -> bytes:
+        """The raw bytes of the file."""
+        with self._lock:
+            if self._data is None:
+                self._data = self.path.read_bytes()
+            return self._data
+
+    def head(self, size: int) -> bytes:
+        """The first `size` bytes of the file, without reading the rest."""
+        with self._lock:
+            if self._data is not None:
+                return self._data[:size]
+        with open(self.path, "rb") as f:
+            return f.read(size)
+
+    def tail(self, size: int) -> bytes:
+        """The last `size` bytes of the file, without reading the rest."""
+        with self._lock:
+            if self._data is not None:
+                return self._data[-size:]
+        with open(self.path, "rb") as f:
+            f.seek(0, os.SEEK_END)
+            f.seek(max(f.tell() - size, 0))
+            return f.read()
+
+    @property
+    def headers(self) -> Message:
+        """The email headers, for `.eml` files, parsed without reading the body."""
+        with self._lock:
+            if self._headers is None:
+                if self._message is not None:
+                    self._headers = self._message
+                else:
+                    # Headers end at the first blank line.
+                    head = self.head(64 * 1024)
+                    self._headers = BytesHeaderParser().parsebytes(head)
+            return self._headers
+
+    @property
+    def message(self) -> Message:
+        """The parsed email, for `.eml` files."""
+        with self._lock:
+            if self._message is None:
+                self._message = email.message_from_bytes(self.data)
+            return self._message
+
+    @property
+    def payload(self) -> bytes:
+        """The decoded body of the email, for `.eml` files."""
+        return self.message.get_payload(decode=True)
+
+    @property
+    def viewer(self) -> "SimplePDFViewer":
+        """The pdf viewer, for `.pdf` files."""
+        # pdfreader is slow to import, so only load it for pdfs.
+        from pdfreader import SimplePDFViewer  # type: ignore
+
+        with self._lock:
+            if self._viewer is None:
+                self._viewer = SimplePDFViewer(BytesIO(self.data))
+            return self._viewer
+
+    def page_strings(self, max_pages: Optional[int] = None) -> List[List[str]]:
+        """The strings drawn on each page of a `.pdf` file.
+
+        Pages are rendered as needed, so asking for only the first pages
+        doesn't render the rest.
+        """
+        from pdfreader.viewer.pdfviewer import PageDoesNotExist  # type: ignore
+
+        with self._lock:
+            viewer = self.viewer
+            while not self._all_pages_rendered and (
+                max_pages is None or len(self._page_strings) < max_pages
+            ):
+                try:
+                    viewer.navigate(len(self._page_strings) + 1)
+                except PageDoesNotExist:
+                    self._all_pages_rendered = True
+                    break
+                viewer.render()
+                self._page_strings.append(list(viewer.canvas.strings))
+            return self._page_strings[:max_pages]
+
+    @property
+    def annotations(self) -> list:
+        """The annotations on the first page of a `.pdf` file."""
+        with self._lock:
+            if self._annotations is None:
+                viewer = self.viewer
+                viewer.navigate(1)
+                self._annotations = list(viewer.annotations or [])
+            return self._annotations
+
+    def close(self):
+        """Release the file contents and everything parsed from them."""
+        with self._lock:
+            self._data = None
+            self._message = None
+            self._headers = None
+            self._viewer = None
+            self._page_strings = []
+            self._all_pages_rendered = False
+            self._annotations = None
+
+
+def as_document(file: Union[Path, str, InvoiceDocument]) -> InvoiceDocument:
+    """Wrap `file` in an `InvoiceDocument`, unless it already is one."""
+    if isinstance(file, InvoiceDocument):
+        return file
+    return InvoiceDocument(file)
@@ -1,12 +1,12 @@
-import email
 from pathlib import Path
 import re
 from typing import Union, Optional, Tuple
 
-from bs4 import BeautifulSoup  # type: ignore
 from bs4.element import Tag  # type: ignore
 import pandas as pd  # type: ignore
 
+from ..parsing import has_class, parse_html
+from .document import InvoiceDocument, as_document
 from .reader import InventoryReader
 
 
@@ -14,7 +14,7 @@ class TaydaInventoryReader(InventoryReader):
 
     supplier = "Tayda Electronics"
 
-    def read(self, file: Union[Path, str]) -> pd.DataFrame:
+    def read(self, file: Union[Path, str, InvoiceDocument]) -> pd.DataFrame:
         body = self._read_email_body(file)
         table = self._get_inventory_table(body)
         if table is None:
@@ -25,15 +25,17 @@ class TaydaInventoryReader(InventoryReader):
         df["amount"] = df["unit_price"] * df["quantity"]
         return df
 
-    def _read_email_body(self, email_file: Union[Path, str]) -> bytes:
+    def _read_email_body(self, email_file: Union[Path, str, InvoiceDocument]) -> bytes:
         """Get the email text from `.eml` file."""
-        with open(email_file, "r") as f:
-            message = email.message_from_file(f)
-        return message.get_payload(decode=True)
+        return as_document(email_file).payload
 
     def _get_inventory_table(self, body: bytes) -> Optional[Tag]:
         """Extract the inventory table from the email text."""
-        soup = BeautifulSoup(body, "html.parser")
+        soup = parse_html(
+            body,
+            only=lambda name, attrs: name == "table"
+            and has_class(attrs, "email-items"),
+        )
         tables = soup.find_all("table")
         for table in tables:
             if table.attrs.get("class") and "email-items" in table.attrs.get("class"):
@@ -1,35 +1,196 @@
+from io import BytesIO
+import json
 from pathlib import Path
 import re
-from typing import Union, Optional
+import shutil
+import tempfile
+import threading
+from typing import TYPE_CHECKING, Dict, Iterable, List, Union, Optional
 
+import numpy as np  # type: ignore
 import pandas as pd  # type: ignore
-from pdfreader import SimplePDFViewer  # type: ignore
-from pdfreader.types.objects import Annot  # type: ignore
-import tabula  # type: ignore
 
+from ..instrument import timed
+from .document import InvoiceDocument, as_document
 from .reader import InventoryReader
 
+if TYPE_CHECKING:
+    from pdfreader.types.objects import Annot  # type: ignore
+
+
+PDF_BACKENDS = ("tabula", "tabula-batch", "pdfplumber")
+
+
+def _table_frame(table: List[list]) -> pd.DataFrame:
+    """The rows of an extracted table, with its first row as the header.
+
+    Empty cells are missing and columns of numbers are converted, the way
+    `tabula.read_pdf` returns its tables.
+    """
+    header, *rows = table
+    df = pd.DataFrame(rows, columns=range(len(header)))
+    df = df.replace({"": np.nan, None: np.nan})
+    for column in df.columns:
+        try:
+            df[column] = pd.to_numeric(df[column])
+        except (TypeError, ValueError):
+            pass
+    df.columns = [np.nan if cell in ("", None) else cell for cell in header]
+    return df
+
 
 class JamecoInventoryReader(InventoryReader):
 
     supplier = "Jameco Electronics"
 
-    def read(self, file: Union[Path, str]) -> pd.DataFrame:
+    def __init__(self, backend: str = "tabula-batch"):
+        """Reads Jameco pdf invoices.
+
+        Parameters
+        ----------
+        backend : string, optional, default="tabula-batch"
+            How to extract tables from the pdf. One of
+
+            - "tabula": run tabula once per invoice.
+            - "tabula-batch": like "tabula", but files passed to `prefetch`
+              are extracted together, paying for Java startup only once.
+            - "pdfplumber": extract tables in Python with pdfplumber,
+              which must be installed separately. Does not require Java.
+
+        """
+        if backend not in PDF_BACKENDS:
+            raise ValueError(f"Unknown pdf backend {backend}")
+        self.backend = backend
+        self._prefetched: Dict[Path, List[pd.DataFrame]] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self) -> dict:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def for_file(
+        self, file: Union[Path, str, InvoiceDocument]
+    ) -> "JamecoInventoryReader":
+        """A copy of the reader holding only what is needed to read `file`.
 
-        df = self._read_pdf_table(file)
+        Used to send the reader to another process without copying the
+        tables prefetched for every other invoice.
+        """
+        reader = JamecoInventoryReader(backend=self.backend)
+        key = Path(file).resolve()
+        with self._lock:
+            if key in self._prefetched:
+                reader._prefetched[key] = self._prefetched.pop(key)
+        return reader
+
+    def read(self, file: Union[Path, str, InvoiceDocument]) -> pd.DataFrame:
+
+        document = as_document(file)
+        with timed(f"pdf tables ({self.backend})"):
+            df = self._read_pdf_table(document)
         if df is None:
             raise ValueError(f"Unable to read table from {file}")
-        links = self._read_product_links(file)
+        with timed("pdf links (pdfreader)"):
+            links = self._read_product_links(document)
         df["product_url"] = df["product_id"].map(links)
         # Tabula can't get complete product descriptions since they
         # are multi-line. Getting description from scraping instead
         df["description"] = None
         return df
 
-    def _read_pdf_table(self, pdf_file: Union[Path, str]) -> Optional[pd.DataFrame]:
+    def prefetch(self, files: Iterable[Union[Path, str, InvoiceDocument]]):
+        """Extract the tables from many invoices at once.
+
+        Only has an effect for the "tabula-batch" backend, where all files
+        are sent through a single tabula process. Later calls to `read`
+        for these files use the prefetched tables.
+
+        Parameters
+        ----------
+        files : iterable of string, Path or InvoiceDocument
+            The invoices that will be read.
+
+        """
+        if self.backend != "tabula-batch":
+            return
+        paths = [Path(f).resolve() for f in files]
+        if not paths:
+            return
+        try:
+            tables = self._read_pdf_tables_batch(paths)
+        except Exception:
+            # Fall back to reading the invoices one at a time, so an error
+            # (e.g. Java not being installed) is reported for each of them
+            # without stopping the others.
+            return
+        with self._lock:
+            self._prefetched.update(tables)
+
+    def _read_pdf_tables_batch(
+        self, pdf_files: List[Path]
+    ) -> Dict[Path, List[pd.DataFrame]]:
+        """Extract all tables from many pdfs with a single tabula process."""
+        import tabula  # type: ignore
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # Copies are numbered so files with the same name don't collide.
+            for i, pdf_file in enumerate(pdf_files):
+                shutil.copyfile(pdf_file, Path(tmpdir) / f"{i}.pdf")
+            tabula.convert_into_by_batch(tmpdir, output_format="json", pages="all")
+            tables = {}
+            for i, pdf_file in enumerate(pdf_files):
+                output = Path(tmpdir) / f"{i}.json"
+                if not output.exists():
+                    continue
+                with open(output) as f:
+                    tables[pdf_file] = [
+                        _table_frame([[cell["text"] for cell in row] for row in table])
+                        for table in (t["data"] for t in json.load(f))
+                        if table
+                    ]
+        return tables
+
+    def _extract_tables(self, pdf_file: InvoiceDocument) -> List[pd.DataFrame]:
+        """Extract every table from the pdf with the configured backend."""
+        if self.backend == "pdfplumber":
+            return self._extract_tables_pdfplumber(pdf_file)
+        # tabula runs in a separate process, so it reads the file itself.
+        with self._lock:
+            dfs = self._prefetched.pop(pdf_file.path.resolve(), None)
+        if dfs is not None:
+            return dfs
+        import tabula  # type: ignore
+
+        return tabula.read_pdf(pdf_file.path, pages="all")
+
+    def _extract_tables_pdfplumber(
+        self, pdf_file: InvoiceDocument
+    ) -> List[pd.DataFrame]:
+        """Extract every table from the pdf using pdfplumber."""
+        try:
+            import pdfplumber  # type: ignore
+        except ImportError:
+            raise ImportError(
+                "The pdfplumber backend requires pdfplumber to be installed."
+            )
+        dfs = []
+        with pdfplumber.open(BytesIO(pdf_file.data)) as pdf:
+            for page in pdf.pages:
+                for table in page.extract_tables():
+                    if len(table) < 2:
+                        continue
+                    dfs.append(_table_frame(table))
+        return dfs
+
+    def _read_pdf_table(self, pdf_file: InvoiceDocument) -> Optional[pd.DataFrame]:
         """Extract the invoice table from the pdf."""
 
-        dfs = tabula.read_pdf(pdf_file, pages="all")
+        dfs = self._extract_tables(pdf_file)
         for df in dfs:
             if "Description" in df:
                 df.dropna(inplace=True)
@@ -48,7 +209,7 @@ class JamecoInventoryReader(InventoryReader):
         else:
             return None
 
-    def _parse_link_annotation(self, annot: Annot) -> str:
+    def _parse_link_annotation(self, annot: "Annot") -> str:
         """Extract url from pdf annotation."""
         link = annot["A"]["URI"].decode("utf-8")
         return link
@@ -60,14 +221,12 @@ class JamecoInventoryReader(InventoryReader):
             return match.groups()[0]
         return None
 
-    def _read_product_links(self, pdf_file: Union[Path, str]) -> dict:
+    def _read_product_links(self, pdf_file: InvoiceDocument) -> dict:
         """Get the product urls for all products in the pdf."""
 
-        with open(pdf_file, "rb") as f:
-            viewer = SimplePDFViewer(f)
-            link_annotations = [
-                a for a in viewer.annotations if a.get("Subtype") == "Link"
-            ]
+        link_annotations = [
+            a for a in pdf_file.annotations if a.get("Subtype") == "Link"
+        ]
 
         links = [self._parse_link_annotation(a) for a in link_annotations]
         return {self._extract_product_id(l): l for l in links}
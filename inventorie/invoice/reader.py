@@ -3,18 +3,21 @@ from typing import Union, Protocol
 
 import pandas as pd  # type: ignore
 
+from .document import InvoiceDocument
+
 
 class InventoryReader(Protocol):
     """Protocol for reading in invoices."""
 
     supplier: str
 
-    def read(self, file: Union[Path, str]) -> pd.DataFrame:
+    def read(self, file: Union[Path, str, InvoiceDocument]) -> pd.DataFrame:
         """Read data from raw invoice file into a dataframe.
 
         Parameters
-        file : string or Path
-            The file of the invoice to read.
+        file : string, Path or InvoiceDocument
+            The file of the invoice to read. Pass an `InvoiceDocument` to
+            reuse what has already been parsed from the file.
 
         Returns
         -------
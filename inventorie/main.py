@@ -1,32 +1,108 @@
-from argparse import ArgumentParser
-from concurrent.futures import ThreadPoolExecutor
+from argparse import ArgumentParser, ArgumentTypeError, Namespace
+import asyncio
+from concurrent.futures import as_completed
+import json
 from pathlib import Path
-from typing import Dict, Optional
+import sys
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 import pandas as pd  # type: ignore
 
-from .supplier import get_pipeline_from_file
-from .pipeline import Pipeline
+from .cache import (
+    DEFAULT_CACHE_DIR,
+    DEFAULT_MAX_ENTRIES,
+    DEFAULT_TTL,
+    configure_cache,
+    close_caches,
+)
+from .datasheet import DatasheetValidator
+from .instrument import Profiler, set_profiler
+from .invoice import InventoryReader, InvoiceDocument
+from .invoice.pdf import PDF_BACKENDS
+from .mirror import DEFAULT_MIRROR_DIR, DatasheetMirror
+from .manifest import Manifest, manifest_path
+from .output import OUTPUT_FORMATS, apply_schema, open_writer, output_columns
+from .processing import ErrorCallback, ResultCallback, StagedScheduler
+from .scheduler import (
+    DEFAULT_HOST_LIMITS,
+    DEFAULT_THREADS,
+    Scheduler,
+    get_scheduler,
+    set_scheduler,
+)
+from .session import (
+    DEFAULT_RETRIES,
+    DEFAULT_TIMEOUT,
+    Session,
+    set_deadline,
+    set_session,
+)
+from .store import DEFAULT_STORE_PATH, InventoryStore, purchase_time
+from .supplier import add_pipeline_step, extra_step_columns, get_pipeline_from_file
+from .watch import Watcher, open_watcher
+from .parsing import HTML_PARSERS, configure_html_parsing
+from .pipeline import ERROR_COLUMN, Pipeline
 
 
-COLUMNS = [
-    "manufacturer_product_id",
-    "manufacturer",
-    "product_id",
-    "supplier",
-    "product_category",
-    "description",
-    "product_url",
-    "datasheet_url",
-    "quantity",
-    "unit",
-    "unit_price",
-    "amount",
-]
+INVOICE_SUFFIXES = (".pdf", ".eml")
+COMMANDS = ("process", "query")
+
+
+def _host_limit(arg: str) -> Tuple[str, int]:
+    host, _, limit = arg.partition("=")
+    if not host or not limit.isdigit():
+        raise ArgumentTypeError(f"expected HOST=N, got {arg!r}")
+    return host, int(limit)
 
 
 def get_args() -> ArgumentParser:
-    parser = ArgumentParser()
+    parser = ArgumentParser(
+        prog="inventorie",
+        epilog=(
+            "Without a command, the arguments are those of 'process', so "
+            "'inventorie workdir' processes workdir."
+        ),
+    )
+    commands = parser.add_subparsers(dest="command", required=True)
+    _add_process_args(
+        commands.add_parser(
+            "process",
+            help="read the invoices in a directory",
+            description="Read invoices and look up the details of their parts.",
+        )
+    )
+    _add_query_args(
+        commands.add_parser(
+            "query",
+            help="look up the stock of parts in the inventory store",
+            description="Look up the stock of parts in the inventory store.",
+        )
+    )
+    return parser
+
+
+def parse_args(argv: Optional[Sequence[str]] = None) -> Namespace:
+    """Parse the command line, running `process` if no command is given.
+
+    Parameters
+    ----------
+    argv : sequence of string, optional
+        The arguments, without the program name. Defaults to `sys.argv`.
+
+    Returns
+    -------
+    flags : Namespace
+        The parsed arguments, with the command in `command`.
+
+    """
+    args = list(sys.argv[1:] if argv is None else argv)
+    if not args or args[0] not in (*COMMANDS, "-h", "--help"):
+        args.insert(0, "process")
+    return get_args().parse_args(args)
+
+
+def _add_process_args(parser: ArgumentParser):
     parser.add_argument(
         "workdir", help="directory containing files to process", type=Path
     )
@@ -37,60 +113,698 @@ def get_args() -> ArgumentParser:
         type=Path,
         required=False,
     )
-    return parser
+    parser.add_argument(
+        "--format",
+        help=(
+            "format of the output file (default: from its suffix, e.g. .jsonl, "
+            ".parquet, .feather or .sqlite, otherwise csv)"
+        ),
+        choices=OUTPUT_FORMATS,
+        required=False,
+    )
+    parser.add_argument(
+        "--store",
+        help=(
+            "add the processed invoices to an inventory store, by default "
+            f"{DEFAULT_STORE_PATH}, and forget invoices no longer in workdir"
+        ),
+        nargs="?",
+        const=DEFAULT_STORE_PATH,
+        type=Path,
+        metavar="PATH",
+    )
+    parser.add_argument(
+        "--incremental",
+        help=(
+            "only process invoices that are new or changed since the last run, "
+            "keeping a manifest next to the output"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--staged",
+        help=(
+            "read all invoices first, then look up and scrape each distinct "
+            "product only once"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--processes",
+        help=(
+            "read invoices in this many processes, enriching them in threads "
+            "as they are read (0 uses every available core)"
+        ),
+        type=int,
+        required=False,
+    )
+    parser.add_argument(
+        "--concurrency",
+        help=(
+            "process all invoices on a single asyncio event loop, "
+            "with at most this many requests in flight (raises --threads "
+            "to match if needed)"
+        ),
+        type=int,
+        required=False,
+    )
+    parser.add_argument(
+        "--threads",
+        help="total number of threads processing invoices and making requests",
+        type=int,
+        default=DEFAULT_THREADS,
+    )
+    parser.add_argument(
+        "--host-limit",
+        help=(
+            "maximum concurrent requests to a host, as HOST=N; may be repeated "
+            f"(default: {', '.join(f'{h}={n}' for h, n in DEFAULT_HOST_LIMITS.items())})"
+        ),
+        type=_host_limit,
+        action="append",
+        default=[],
+    )
+    parser.add_argument(
+        "--retries",
+        help=(
+            "times to retry a request that failed or was throttled, "
+            f"backing off exponentially (default: {DEFAULT_RETRIES})"
+        ),
+        type=int,
+        default=DEFAULT_RETRIES,
+    )
+    parser.add_argument(
+        "--watch",
+        help=(
+            "after processing workdir, keep running and process invoices "
+            "as they're added to it, until interrupted. Invoices already "
+            "written to the output aren't processed again if they're rewritten"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--connect-timeout",
+        help=(
+            "seconds to wait for a supplier to accept a connection "
+            f"(default: {DEFAULT_TIMEOUT[0]:g})"
+        ),
+        type=float,
+        default=DEFAULT_TIMEOUT[0],
+    )
+    parser.add_argument(
+        "--read-timeout",
+        help=(
+            "seconds to wait for a supplier to send data "
+            f"(default: {DEFAULT_TIMEOUT[1]:g})"
+        ),
+        type=float,
+        default=DEFAULT_TIMEOUT[1],
+    )
+    parser.add_argument(
+        "--deadline",
+        help=(
+            "stop making requests SECONDS after starting, writing the rows "
+            "still waiting on them unenriched"
+        ),
+        type=float,
+        metavar="SECONDS",
+        required=False,
+    )
+    parser.add_argument(
+        "--hedge",
+        help=(
+            "send a request again if it takes longer than 95%% of recent "
+            "requests to the same supplier, using whichever answers first"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--pdf-backend",
+        help="how to extract tables from pdf invoices",
+        choices=PDF_BACKENDS,
+        default="tabula-batch",
+    )
+    parser.add_argument(
+        "--html-parser",
+        help=(
+            "how to parse supplier pages and email invoices "
+            "(default: lxml if installed, otherwise html.parser)"
+        ),
+        choices=HTML_PARSERS,
+        required=False,
+    )
+    parser.add_argument(
+        "--full-detect",
+        help=(
+            "fully parse files whose supplier isn't found by the quick checks, "
+            "instead of skipping them"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--validate-datasheets",
+        help=(
+            "check that each datasheet url is available, without downloading "
+            "it, and record the result in datasheet_status"
+        ),
+        action="store_true",
+    )
+    parser.add_argument(
+        "--mirror-datasheets",
+        help=(
+            "download every datasheet once into a local mirror, by default "
+            f"{DEFAULT_MIRROR_DIR}, and record its file in datasheet_path"
+        ),
+        nargs="?",
+        const=DEFAULT_MIRROR_DIR,
+        type=Path,
+        metavar="DIR",
+        required=False,
+    )
+    parser.add_argument(
+        "--profile",
+        help=(
+            "print where the time went, per stage, invoice and host, "
+            "and also write it as JSON to PROFILE if given"
+        ),
+        nargs="?",
+        const="",
+        metavar="PROFILE",
+        required=False,
+    )
+    parser.add_argument(
+        "--cache-dir",
+        help="directory for the persistent scrape cache",
+        type=Path,
+        default=DEFAULT_CACHE_DIR,
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        help="days before cached scrape results are re-fetched",
+        type=float,
+        default=DEFAULT_TTL / (24 * 60 * 60),
+    )
+    parser.add_argument(
+        "--cache-size",
+        help="maximum number of entries kept in the scrape cache",
+        type=int,
+        default=DEFAULT_MAX_ENTRIES,
+    )
+    parser.add_argument(
+        "--no-cache",
+        help="bypass the scrape cache entirely",
+        action="store_true",
+    )
+    parser.add_argument(
+        "--refresh-cache",
+        help="ignore cached results, re-scraping and updating the cache",
+        action="store_true",
+    )
 
 
-def get_file_pipelines(workdir: Path) -> Dict[Path, Pipeline]:
+def _add_query_args(parser: ArgumentParser):
+    parser.add_argument(
+        "part",
+        help="manufacturer or supplier product ID (default: every part)",
+        nargs="?",
+    )
+    parser.add_argument(
+        "--store",
+        help="inventory store to look up",
+        type=Path,
+        default=DEFAULT_STORE_PATH,
+    )
+    parser.add_argument(
+        "--lines",
+        help="also show the invoice lines of each matching part",
+        action="store_true",
+    )
+
+
+def get_invoice_files(workdir: Path) -> List[Path]:
+    return [file for file in workdir.glob("*") if file.suffix in INVOICE_SUFFIXES]
+
+
+def get_file_pipelines(
+    workdir: Path, fallback: bool = False, files: Optional[Iterable[Path]] = None
+) -> Dict[InvoiceDocument, Pipeline]:
     pipelines = {}
-    for file in workdir.glob("*"):
-        if file.suffix not in (".pdf", ".eml"):
-            continue
+    if files is None:
+        files = get_invoice_files(workdir)
+    for file in files:
+        document = InvoiceDocument(file)
         try:
-            pipelines[file] = get_pipeline_from_file(file)
+            pipelines[document] = get_pipeline_from_file(document, fallback=fallback)
         except ValueError:
             print(f"No parser found for {file.name}")
             continue
     return pipelines
 
 
-def main(workdir: Path, output: Optional[Path]):
-    def _process_file(pipeline: Pipeline, file: Path) -> pd.DataFrame:
+def prefetch_invoices(
+    pipelines: Dict[InvoiceDocument, Pipeline], pdf_backend: Optional[str]
+):
+    """Let readers that support it read their invoices in one batch.
+
+    Parameters
+    ----------
+    pipelines : dict of InvoiceDocument to Pipeline
+        The invoices to process, with the pipeline to process them.
+
+    pdf_backend : string, optional
+        The backend for readers of pdf invoices to use.
+
+    """
+    readers: Dict[int, Tuple[InventoryReader, List[InvoiceDocument]]] = {}
+    for file, pipeline in pipelines.items():
+        _, files = readers.setdefault(id(pipeline.reader), (pipeline.reader, []))
+        files.append(file)
+    for reader, files in readers.values():
+        if pdf_backend and hasattr(reader, "backend"):
+            reader.backend = pdf_backend
+        if hasattr(reader, "prefetch"):
+            reader.prefetch(files)
+
+
+def report_error(file: InvoiceDocument, error: Exception):
+    """Report an invoice that couldn't be processed, without stopping the run."""
+    print(f"Failed to process {file.name}: {error!r}")
+
+
+def process_files(
+    pipelines: Dict[InvoiceDocument, Pipeline],
+    on_result: ResultCallback,
+    on_error: ErrorCallback = report_error,
+):
+    """Process invoices in the threads of the shared scheduler.
+
+    Parameters
+    ----------
+    pipelines : dict of InvoiceDocument to Pipeline
+        The invoices to process, with the pipeline to process them.
+
+    on_result : callable
+        Called with each invoice and its rows as soon as it is processed.
+
+    on_error : callable, optional
+        Called with each invoice that fails and the error.
+
+    """
+
+    def _process_file(pipeline: Pipeline, file: InvoiceDocument) -> pd.DataFrame:
+        print(f"Processing {file.name}")
+        try:
+            return pipeline.process(file)
+        finally:
+            file.close()
+
+    scheduler = get_scheduler()
+    futures = {
+        scheduler.submit(_process_file, pipeline, file): file
+        for file, pipeline in pipelines.items()
+    }
+    for future in as_completed(futures):
+        try:
+            df = future.result()
+        except Exception as e:
+            on_error(futures[future], e)
+        else:
+            on_result(futures[future], df)
+
+
+async def process_files_async(
+    pipelines: Dict[InvoiceDocument, Pipeline],
+    concurrency: int,
+    on_result: ResultCallback,
+    on_error: ErrorCallback = report_error,
+):
+    """Process invoices concurrently on the running event loop.
+
+    Parameters
+    ----------
+    pipelines : dict of InvoiceDocument to Pipeline
+        The invoices to process, with the pipeline to process them.
+
+    concurrency : int
+        The maximum number of requests in flight across all invoices. They
+        are sent from the threads of the shared scheduler, so it should
+        have at least this many.
+
+    on_result : callable
+        Called with each invoice and its rows as soon as it is processed.
+
+    on_error : callable, optional
+        Called with each invoice that fails and the error.
+
+    """
+
+    async def _process_file(pipeline: Pipeline, file: InvoiceDocument):
         print(f"Processing {file.name}")
-        return pipeline.process(file)
+        try:
+            df = await pipeline.process_async(file, semaphore)
+        except Exception as e:
+            on_error(file, e)
+        else:
+            on_result(file, df)
+        finally:
+            file.close()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    await asyncio.gather(
+        *(_process_file(pipeline, file) for file, pipeline in pipelines.items())
+    )
+
+
+def process_files_staged(
+    pipelines: Dict[InvoiceDocument, Pipeline],
+    on_result: ResultCallback,
+    on_error: ErrorCallback = report_error,
+):
+    """Process invoices in stages, enriching each distinct product once.
+
+    All invoices are read first. Then, for each pipeline, the products
+    across all of its invoices are deduplicated, enriched, and joined back
+    onto every invoice row. Both stages run in the threads of the shared
+    scheduler.
+
+    Parameters
+    ----------
+    pipelines : dict of InvoiceDocument to Pipeline
+        The invoices to process, with the pipeline to process them.
+
+    on_result : callable
+        Called with each invoice and its rows once its pipeline's products
+        are enriched.
+
+    on_error : callable, optional
+        Called with each invoice that fails and the error. If enriching
+        fails, every invoice of that pipeline fails.
+
+    """
+
+    def _read_file(pipeline: Pipeline, file: InvoiceDocument) -> pd.DataFrame:
+        print(f"Reading {file.name}")
+        try:
+            return pipeline.read(file)
+        finally:
+            file.close()
 
+    def _enrich(pipeline: Pipeline, dfs: List[pd.DataFrame]) -> List[pd.DataFrame]:
+        n_products = pd.concat(dfs)["product_id"].nunique()
+        print(f"Enriching {n_products} products from {len(dfs)} invoices")
+        return pipeline.enrich_unique(dfs)
+
+    scheduler = get_scheduler()
+    reads = {
+        file: scheduler.submit(_read_file, pipeline, file)
+        for file, pipeline in pipelines.items()
+    }
+    groups: Dict[int, Tuple[Pipeline, List[InvoiceDocument], list]] = {}
+    for file, future in reads.items():
+        try:
+            df = future.result()
+        except Exception as e:
+            on_error(file, e)
+            continue
+        pipeline = pipelines[file]
+        _, files, dfs = groups.setdefault(id(pipeline), (pipeline, [], []))
+        files.append(file)
+        dfs.append(df)
+    del reads
+
+    futures = {
+        scheduler.submit(_enrich, pipeline, dfs): files
+        for pipeline, files, dfs in groups.values()
+    }
+    del groups
+    for future in as_completed(futures):
+        files = futures[future]
+        try:
+            dfs = future.result()
+        except Exception as e:
+            for file in files:
+                on_error(file, e)
+            continue
+        for file, df in zip(files, dfs):
+            on_result(file, df)
+
+
+def main(
+    workdir: Path,
+    output: Optional[Path],
+    concurrency: Optional[int] = None,
+    pdf_backend: Optional[str] = None,
+    full_detect: bool = False,
+    incremental: bool = False,
+    staged: bool = False,
+    processes: Optional[int] = None,
+    output_format: Optional[str] = None,
+    store: Optional[InventoryStore] = None,
+    watch: bool = False,
+    deadline: Optional[float] = None,
+):
     print(f"Working in {workdir.resolve()}")
 
-    pipelines = get_file_pipelines(workdir)
-    with ThreadPoolExecutor() as executor:
-        futures = [
-            executor.submit(_process_file, pipeline, file)
-            for file, pipeline in pipelines.items()
-        ]
-        df = pd.concat([future.result() for future in futures])
-    df.reset_index(inplace=True, drop=True)
+    # Started first, so invoices arriving while the others are processed
+    # aren't missed.
+    watcher = open_watcher(workdir, INVOICE_SUFFIXES) if watch else None
+    files = get_invoice_files(workdir)
+    manifest = None
+    if incremental:
+        if output is None:
+            raise ValueError("Incremental processing requires an output file.")
+        manifest = Manifest(manifest_path(output))
+        n_files = len(files)
+        files = manifest.refresh(files)
+        print(f"Skipping {n_files - len(files)} unchanged invoices")
+
+    pipelines = get_file_pipelines(workdir, fallback=full_detect, files=files)
+    prefetch_invoices(pipelines, pdf_backend)
+
+    # The names of the invoices whose rows are in the output.
+    written: Set[str] = set()
+    # Columns of optional steps are only written when the steps are used.
+    columns = output_columns(extra_step_columns())
+    with open_writer(output, output_format, columns) as writer:
+        if manifest is not None:
+            # Unchanged invoices are written first, from their recorded rows.
+            unchanged = set(manifest.entries) - {file.name for file in files}
+            for name in sorted(unchanged):
+                df = manifest.frame_for(name, columns)
+                writer.write(df, invoice=name)
+                written.add(name)
+                # E.g. renamed invoices, or a store used for the first time.
+                document = InvoiceDocument(workdir / name)
+                if store is not None and not store.has_invoice(_store_key(document)):
+                    store.upsert_invoice(
+                        _store_key(document), df, purchase_time(document)
+                    )
+
+        lock = threading.Lock()
+
+        def _write(file: InvoiceDocument, df: pd.DataFrame):
+            df = apply_schema(df, file.name, columns)
+            failed = df[ERROR_COLUMN].notna().sum()
+            if failed:
+                print(f"{failed} rows of {file.name} couldn't be fully enriched")
+            with lock:
+                writer.write(df)
+                written.add(file.name)
+                if manifest is not None:
+                    manifest.update(file.path, df)
+                if store is not None:
+                    store.upsert_invoice(_store_key(file), df, purchase_time(file))
+
+        def _process(pipelines: Dict[InvoiceDocument, Pipeline]):
+            if store is not None:
+                for invoice in store.remove_missing(workdir):
+                    print(f"Removed {Path(invoice).name} from the inventory store")
+            set_deadline(deadline)
+            if staged:
+                process_files_staged(pipelines, _write)
+            elif processes is not None:
+                StagedScheduler(processes=processes).run(
+                    pipelines, on_result=_write, on_error=report_error
+                )
+            elif concurrency:
+                asyncio.run(process_files_async(pipelines, concurrency, _write))
+            else:
+                process_files(pipelines, _write)
+            # Keep the invoices that were processed, even if the run stops.
+            if manifest is not None:
+                manifest.save()
+
+        try:
+            _process(pipelines)
+            if watcher is not None:
+                _watch(watcher, files, written, full_detect, pdf_backend, _process)
+        finally:
+            if manifest is not None:
+                manifest.save()
+            if watcher is not None:
+                watcher.close()
+            set_deadline(None)
     print("Done")
 
-    df = df[COLUMNS]
 
-    if output:
-        df.to_csv(output, index=False)
+def _store_key(document: InvoiceDocument) -> str:
+    """The key of an invoice in the inventory store."""
+    return str(document.path.resolve())
+
+
+def _watch(
+    watcher: Watcher,
+    processed: List[Path],
+    written: Set[str],
+    full_detect: bool,
+    pdf_backend: Optional[str],
+    process: Callable[[Dict[InvoiceDocument, Pipeline]], None],
+):
+    """Process invoices as they arrive, until interrupted.
+
+    Invoices in `written` already have their rows in the output, which can
+    only be appended to, so they are skipped if they are rewritten rather
+    than having their rows written twice. If a batch can't be processed, its
+    invoices are tried one at a time, and those that still fail are reported
+    and skipped while watching carries on.
+    """
+
+    def _signature(file: Path) -> Tuple[int, int]:
+        stat = file.stat()
+        return stat.st_size, stat.st_mtime_ns
+
+    def _process(files: List[Path]) -> int:
+        pipelines = get_file_pipelines(watcher.path, fallback=full_detect, files=files)
+        prefetch_invoices(pipelines, pdf_backend)
+        process(pipelines)
+        return len(pipelines)
+
+    # Arrivals already picked up by the first run are skipped.
+    seen = {file: _signature(file) for file in processed}
+    print(f"Watching {watcher.path.resolve()} for new invoices (Ctrl-C to stop)")
+    try:
+        for batch in watcher.batches():
+            files = []
+            for file in batch:
+                try:
+                    signature = _signature(file)
+                except FileNotFoundError:
+                    continue
+                if seen.get(file) == signature:
+                    continue
+                seen[file] = signature
+                if file.name in written:
+                    print(
+                        f"Skipping {file.name}, which was rewritten after being "
+                        "processed. Re-run inventorie to update its rows"
+                    )
+                else:
+                    files.append(file)
+            if not files:
+                continue
+            try:
+                n_processed = _process(files)
+            except Exception as e:
+                if len(files) == 1:
+                    print(f"Failed to process {files[0].name}: {e!r}")
+                    continue
+                n_processed = 0
+                for file in files:
+                    if file.name in written:
+                        continue
+                    try:
+                        n_processed += _process([file])
+                    except Exception as e:
+                        print(f"Failed to process {file.name}: {e!r}")
+            print(f"Processed {n_processed} new invoices")
+    except KeyboardInterrupt:
+        print("Stopped watching")
+
+
+def query(part: Optional[str], store_path: Path, lines: bool = False):
+    if not store_path.exists():
+        print(f"No inventory store at {store_path}")
         return
+    store = InventoryStore(store_path)
+    try:
+        stock = store.query(part)
+        if stock.empty:
+            print(f"No parts matching {part}" if part else "The inventory is empty")
+            return
+        with pd.option_context("display.max_rows", None, "display.max_columns", None):
+            print(stock)
+            if lines:
+                for name in stock["part"]:
+                    print(f"\n{name}")
+                    print(store.lines(name))
+    finally:
+        store.close()
 
-    pd.set_option(
-        "display.max_rows",
-        None,
-        "display.max_columns",
-        None,
-        "display.max_colwidth",
-        None,
-    )
-    print(df)
 
+def run_script(argv: Optional[Sequence[str]] = None):
+    flags = parse_args(argv)
+    if flags.command == "query":
+        query(flags.part, flags.store, lines=flags.lines)
+        return
 
-def run_script():
-    args = get_args()
-    flags = args.parse_args()
-    main(flags.workdir, flags.output)
+    # One budget of threads for invoices and requests, whichever mode is used.
+    threads = max(flags.threads, flags.concurrency or 0)
+    set_scheduler(
+        Scheduler(
+            threads=threads,
+            host_limits={**DEFAULT_HOST_LIMITS, **dict(flags.host_limit)},
+        )
+    )
+    set_session(
+        Session(
+            pool_size=threads,
+            timeout=(flags.connect_timeout, flags.read_timeout),
+            retries=flags.retries,
+            hedge=flags.hedge,
+        )
+    )
+    configure_html_parsing(flags.html_parser)
+    if flags.validate_datasheets:
+        add_pipeline_step(DatasheetValidator())
+    if flags.mirror_datasheets is not None:
+        add_pipeline_step(DatasheetMirror(flags.mirror_datasheets))
+    if not flags.no_cache:
+        configure_cache(
+            flags.cache_dir,
+            ttl=flags.cache_ttl * 24 * 60 * 60,
+            max_entries=flags.cache_size,
+            refresh=flags.refresh_cache,
+        )
+    store = None if flags.store is None else InventoryStore(flags.store)
+    profiler = Profiler() if flags.profile is not None else None
+    set_profiler(profiler)
+    try:
+        main(
+            flags.workdir,
+            flags.output,
+            concurrency=flags.concurrency,
+            pdf_backend=flags.pdf_backend,
+            full_detect=flags.full_detect,
+            incremental=flags.incremental,
+            staged=flags.staged,
+            processes=flags.processes,
+            output_format=flags.format,
+            store=store,
+            watch=flags.watch,
+            deadline=flags.deadline,
+        )
+    finally:
+        if store is not None:
+            store.close()
+        close_caches()
+        set_scheduler(None)
+        set_profiler(None)
+        set_session(None)
+        if profiler is not None:
+            print(profiler.report())
+            if flags.profile:
+                with open(flags.profile, "w") as f:
+                    json.dump(profiler.summary(), f, indent=2)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Union
+
+import pandas as pd  # type: ignore
+
+from .pipeline import ERROR_COLUMN
+
+
+def file_digest(file: Union[Path, str]) -> str:
+    """The SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(file, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _incomplete(entry: Dict[str, Any]) -> bool:
+    """Whether any rows of an invoice couldn't be fully enriched."""
+    return any(row.get(ERROR_COLUMN) for row in entry["rows"])
+
+
+def manifest_path(output: Union[Path, str]) -> Path:
+    """The manifest kept next to an output file."""
+    output = Path(output)
+    return output.with_name(output.name + ".manifest.json")
+
+
+class Manifest:
+    def __init__(self, path: Union[Path, str]):
+        """A record of the invoices already processed, and their rows.
+
+        Each invoice is recorded by name, with the hash of its contents and
+        the rows it produced, so unchanged invoices don't need processing
+        again.
+
+        Parameters
+        ----------
+        path : string or Path
+            The file the manifest is stored in. It is loaded if it exists.
+
+        """
+        self.path = Path(path)
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._digests: Dict[str, str] = {}
+        if self.path.exists():
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def refresh(self, files: Iterable[Path]) -> List[Path]:
+        """Forget removed invoices and find those that need processing.
+
+        Files are compared by size and modification time first, and only
+        hashed if those changed. Renamed files reuse their previous rows.
+        Invoices with rows that couldn't be fully enriched are processed
+        again, to fill in what failed. Invoices that were never recorded,
+        e.g. because no parser was found for them, are always returned.
+
+        Parameters
+        ----------
+        files : iterable of Path
+            All the invoices currently in the working directory.
+
+        Returns
+        -------
+        files : list of Path
+            The invoices that are new or have changed.
+
+        """
+        by_name = {file.name: file for file in files}
+        by_digest = {entry["sha256"]: entry for entry in self.entries.values()}
+        for name in list(self.entries):
+            if name not in by_name:
+                del self.entries[name]
+
+        changed = []
+        for name, file in by_name.items():
+            stat = file.stat()
+            entry = self.entries.get(name)
+            if (
+                entry is not None
+                and not _incomplete(entry)
+                and entry["size"] == stat.st_size
+                and entry["mtime"] == stat.st_mtime
+            ):
+                continue
+            digest = file_digest(file)
+            previous = entry if entry is not None else by_digest.get(digest)
+            if (
+                previous is not None
+                and previous["sha256"] == digest
+                and not _incomplete(previous)
+            ):
+                self.entries[name] = dict(
+                    previous, size=stat.st_size, mtime=stat.st_mtime
+                )
+                continue
+            self._digests[name] = digest
+            changed.append(file)
+        return changed
+
+    def update(self, file: Path, df: pd.DataFrame):
+        """Record the rows produced by an invoice."""
+        stat = file.stat()
+        digest = self._digests.pop(file.name, None) or file_digest(file)
+        self.entries[file.name] = {
+            "sha256": digest,
+            "size": stat.st_size,
+            "mtime": stat.st_mtime,
+            "rows": json.loads(df.to_json(orient="records")),
+        }
+
+    def frame_for(self, name: str, columns: List[str]) -> pd.DataFrame:
+        """The recorded rows of one invoice."""
+        rows = self.entries[name]["rows"]
+        return pd.DataFrame.from_records(rows, columns=columns)
+
+    def save(self):
+        """Write the manifest, replacing the previous one atomically."""
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
@@ -0,0 +1,179 @@
+import asyncio
+import hashlib
+import os
+from pathlib import Path, PurePosixPath
+from typing import Any, List, Optional, Union
+from urllib.parse import urlparse
+
+import pandas as pd  # type: ignore
+import requests  # type: ignore
+
+from .cache import Memo
+from .instrument import record_cache
+from .pipeline import (
+    ERROR_COLUMN,
+    BatchChainable,
+    gather_bounded,
+    run_in_executor,
+    split_errors,
+    update_batch_step,
+    update_batch_step_async,
+)
+from .scheduler import get_scheduler
+from .session import get_session
+
+
+DEFAULT_MIRROR_DIR = (
+    Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share"))
+    / "inventorie"
+    / "datasheets"
+)
+# Bytes read from a download at a time.
+_CHUNK_SIZE = 64 * 1024
+
+
+def _sha256(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def _range_total(content_range: Optional[str]) -> Optional[int]:
+    """The size of the whole file from a `Content-Range` header, if known."""
+    if content_range is None:
+        return None
+    _, _, total = content_range.rpartition("/")
+    return int(total) if total.strip().isdigit() else None
+
+
+class DatasheetMirror(BatchChainable):
+    key = "datasheet_url"
+    columns: List[str] = ["datasheet_path"]
+
+    def __init__(self, path: Union[Path, str] = DEFAULT_MIRROR_DIR):
+        """A pipeline step keeping a local copy of every datasheet.
+
+        Fills `datasheet_path` with the local file for each `datasheet_url`.
+        Files are stored by the hash of their content under `objects/`, so
+        a datasheet linked from several urls is only stored once, and
+        `urls/` records which file each url was saved as, so urls already
+        mirrored are never downloaded again. Downloads go to `partial/`
+        first and are resumed from where they stopped with a range request.
+        Datasheets that can't be downloaded are left without a path, with
+        the reason in `enrichment_error`.
+
+        Parameters
+        ----------
+        path : string or Path, optional
+            The directory to mirror datasheets in. It is created if needed.
+
+        """
+        self.path = Path(path)
+        for subdir in ("objects", "urls", "partial"):
+            (self.path / subdir).mkdir(parents=True, exist_ok=True)
+        # Concurrent requests for the same url share one download.
+        self._memo = Memo(name="memo:datasheet_mirror")
+
+    def mirror(self, url: str) -> Optional[str]:
+        """The local copy of the datasheet at `url`, downloading it if needed.
+
+        Parameters
+        ----------
+        url : string
+            The url of the datasheet.
+
+        Returns
+        -------
+        path : string or None
+            The path of the local copy, or `None` if it couldn't be downloaded.
+
+        """
+        try:
+            return self._memo.get(url, self._mirror)
+        except requests.RequestException:
+            return None
+
+    async def mirror_async(self, url: str) -> Optional[str]:
+        return await run_in_executor(self.mirror, url)
+
+    def update_batch(self, urls: pd.Series) -> pd.DataFrame:
+        results = get_scheduler().map(self._get, urls, return_exceptions=True)
+        return self._to_frame(results, urls.index)
+
+    async def update_batch_async(
+        self, urls: pd.Series, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        results = await gather_bounded(
+            semaphore,
+            lambda url: run_in_executor(self._get, url),
+            urls,
+            return_exceptions=True,
+        )
+        return self._to_frame(results, urls.index)
+
+    def update_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
+        return update_batch_step(self, df)
+
+    async def update_dataframe_async(
+        self, df: pd.DataFrame, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        return await update_batch_step_async(self, df, semaphore)
+
+    def _get(self, url: str) -> str:
+        """Like `mirror`, raising the error if it can't be downloaded."""
+        return self._memo.get(url, self._mirror)
+
+    def _to_frame(self, results: List[Any], index: pd.Index) -> pd.DataFrame:
+        paths, errors = split_errors(self, results)
+        return pd.DataFrame(
+            {"datasheet_path": paths, ERROR_COLUMN: errors}, index=index
+        )
+
+    def _mirror(self, url: str) -> str:
+        url_key = _sha256(url.encode())
+        entry = self.path / "urls" / url_key
+        if entry.exists():
+            obj = self.path / entry.read_text()
+            if obj.exists():
+                record_cache("datasheet_mirror", hit=True)
+                return str(obj)
+        record_cache("datasheet_mirror", hit=False)
+
+        partial = self.path / "partial" / f"{url_key}.part"
+        self._download(url, partial)
+        digest = hashlib.sha256()
+        with open(partial, "rb") as f:
+            for chunk in iter(lambda: f.read(_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        sha = digest.hexdigest()
+        suffix = PurePosixPath(urlparse(url).path).suffix or ".pdf"
+        relative = Path("objects") / sha[:2] / f"{sha}{suffix}"
+        obj = self.path / relative
+        if obj.exists():
+            partial.unlink()
+        else:
+            obj.parent.mkdir(exist_ok=True)
+            os.replace(partial, obj)
+        tmp = entry.with_suffix(".tmp")
+        tmp.write_text(relative.as_posix())
+        os.replace(tmp, entry)
+        return str(obj)
+
+    def _download(self, url: str, partial: Path):
+        """Download `url` to `partial`, resuming from any bytes already there."""
+        offset = partial.stat().st_size if partial.exists() else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+        resp = get_session().get(url, headers=headers, stream=True)
+        with resp:
+            if resp.status_code == 416:
+                # Either everything was downloaded before the last run
+                # stopped, or the partial file doesn't match the remote one
+                # any more, e.g. because it changed, and is downloaded again.
+                if _range_total(resp.headers.get("Content-Range")) == offset:
+                    return
+                partial.unlink()
+                return self._download(url, partial)
+            resp.raise_for_status()
+            # Servers ignoring the range send the whole file again.
+            mode = "ab" if resp.status_code == 206 else "wb"
+            with open(partial, mode) as f:
+                for chunk in resp.iter_content(_CHUNK_SIZE):
+                    f.write(chunk)
@@ -0,0 +1,405 @@
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Protocol, TextIO
+import warnings
+
+import pandas as pd  # type: ignore
+
+
+# The type of each output column. Low-cardinality columns are categorical,
+# so they are stored once per distinct value rather than once per row.
+SCHEMA = {
+    "manufacturer_product_id": "string",
+    "manufacturer": "category",
+    "product_id": "string",
+    "supplier": "category",
+    "product_category": "category",
+    "description": "string",
+    "product_url": "string",
+    "datasheet_url": "string",
+    "quantity": "Int64",
+    "unit": "category",
+    "unit_price": "float64",
+    "amount": "float64",
+    "enrichment_error": "string",
+    "datasheet_status": "category",
+    "datasheet_checked_at": "string",
+    "datasheet_path": "string",
+}
+# Columns only written when the optional step filling them is used.
+OPTIONAL_COLUMNS = ["datasheet_status", "datasheet_checked_at", "datasheet_path"]
+# The columns always written, in order. Optional columns follow them.
+COLUMNS = [col for col in SCHEMA if col not in OPTIONAL_COLUMNS]
+
+OUTPUT_FORMATS = ("csv", "jsonl", "parquet", "feather", "sqlite")
+FORMAT_SUFFIXES = {
+    ".csv": "csv",
+    ".jsonl": "jsonl",
+    ".ndjson": "jsonl",
+    ".parquet": "parquet",
+    ".feather": "feather",
+    ".sqlite": "sqlite",
+    ".db": "sqlite",
+}
+# The table the sqlite output is written to.
+SQLITE_TABLE = "inventory"
+SQLITE_INDEXES = ["product_id", "manufacturer_product_id"]
+SQLITE_TYPES = {
+    "string": "TEXT",
+    "category": "TEXT",
+    "Int64": "INTEGER",
+    "float64": "REAL",
+}
+# Currency symbols, thousands separators and spaces around amounts, which
+# are dropped before converting them to numbers.
+_NUMBER_DECORATIONS = r"[\s,$€£¥]"
+
+
+def _to_numbers(
+    values: pd.Series, dtype: str, invoice: Optional[str] = None
+) -> pd.Series:
+    """Convert a column of amounts, read as text or numbers, to numbers.
+
+    Amounts such as "$1,234.50" are converted. Values that still aren't
+    numbers, or aren't whole numbers for an "Int64" column, become missing
+    with a warning naming the invoice and column.
+    """
+    if pd.api.types.is_numeric_dtype(values):
+        text = values
+    else:
+        text = values.astype("string").str.replace(_NUMBER_DECORATIONS, "", regex=True)
+    numbers = pd.to_numeric(text, errors="coerce")
+    if dtype == "Int64":
+        numbers = numbers.where(numbers.isna() | (numbers % 1 == 0))
+    lost = text.notna() & (text != "") & numbers.isna()
+    if lost.any():
+        examples = ", ".join(repr(value) for value in values[lost].unique()[:3])
+        warnings.warn(
+            f"{invoice or 'Output'}: {lost.sum()} values of {values.name} "
+            f"aren't {'whole ' if dtype == 'Int64' else ''}numbers and were "
+            f"left empty: {examples}",
+            stacklevel=3,
+        )
+    return numbers
+
+
+def output_columns(extra: Iterable[str] = ()) -> List[str]:
+    """The columns of an output: `COLUMNS`, then the optional ones in `extra`."""
+    extra = set(extra)
+    return COLUMNS + [col for col in OPTIONAL_COLUMNS if col in extra]
+
+
+def apply_schema(
+    df: pd.DataFrame,
+    invoice: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+) -> pd.DataFrame:
+    """Give a frame exactly the columns in `columns`, with the types in `SCHEMA`.
+
+    `columns` defaults to `COLUMNS`. Missing columns are left empty and
+    extra columns are dropped. Numeric columns may hold amounts as text,
+    like "$1,234.50". Values that can't be converted become missing, with a
+    warning naming `invoice` and the column.
+    """
+    columns = COLUMNS if columns is None else columns
+    df = df.reindex(columns=columns)
+    for col in columns:
+        dtype = SCHEMA[col]
+        if dtype in ("Int64", "float64"):
+            df[col] = _to_numbers(df[col], dtype, invoice)
+        elif dtype == "category":
+            # Categories are strings, even when every value is missing.
+            df[col] = df[col].astype("string")
+        df[col] = df[col].astype(dtype)
+    return df
+
+
+def output_format_for(path: Path, output_format: Optional[str] = None) -> str:
+    """The format of an output file, from its suffix unless given."""
+    if output_format is None:
+        output_format = FORMAT_SUFFIXES.get(path.suffix, "csv")
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"Unknown output format {output_format}")
+    return output_format
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow  # type: ignore
+    except ImportError:
+        raise ImportError("Parquet and feather output require pyarrow to be installed.")
+    return pyarrow
+
+
+def _arrow_schema(columns: List[str]):
+    pa = _import_pyarrow()
+    types = {
+        "string": pa.string(),
+        "category": pa.dictionary(pa.int32(), pa.string()),
+        "Int64": pa.int64(),
+        "float64": pa.float64(),
+    }
+    return pa.schema([(col, types[SCHEMA[col]]) for col in columns])
+
+
+class OutputWriter(Protocol):
+    """Writes the rows of each invoice as soon as it is processed.
+
+    Rows are appended to the output and then dropped, so memory doesn't
+    grow with the number of invoices, and an interrupted run leaves the
+    rows of every finished invoice behind. Every write has the writer's
+    `columns`, `COLUMNS` unless other columns are given, with the types in
+    `SCHEMA`. Writers are safe to use from several threads.
+    """
+
+    columns: List[str]
+    _lock: threading.Lock
+
+    def write(self, df: pd.DataFrame, invoice: Optional[str] = None):
+        """Append the rows of one invoice.
+
+        Parameters
+        ----------
+        df : DataFrame
+            The processed invoice. Missing columns are left empty and
+            extra columns are dropped.
+
+        invoice : string, optional
+            The name of the invoice, for warnings about values that don't
+            fit the schema.
+
+        """
+        df = apply_schema(df, invoice, self.columns)
+        with self._lock:
+            self._write(df)
+
+    def _write(self, df: pd.DataFrame):
+        ...
+
+    def close(self):
+        ...
+
+    def __enter__(self) -> "OutputWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CsvWriter(OutputWriter):
+    def __init__(self, path: Path, columns: Optional[List[str]] = None):
+        self.path = path
+        self.columns = columns or COLUMNS
+        self._lock = threading.Lock()
+        self._file: TextIO = open(path, "w", newline="")
+        # The header is written up front, so even an empty output has it.
+        pd.DataFrame(columns=self.columns).to_csv(self._file, index=False)
+        self._file.flush()
+
+    def _write(self, df: pd.DataFrame):
+        df.to_csv(self._file, header=False, index=False)
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class JsonLinesWriter(OutputWriter):
+    def __init__(self, path: Path, columns: Optional[List[str]] = None):
+        self.path = path
+        self.columns = columns or COLUMNS
+        self._lock = threading.Lock()
+        self._file: TextIO = open(path, "w")
+
+    def _write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        self._file.write(df.to_json(orient="records", lines=True).rstrip("\n"))
+        self._file.write("\n")
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class ParquetWriter(OutputWriter):
+    def __init__(self, path: Path, columns: Optional[List[str]] = None):
+        _import_pyarrow()
+        import pyarrow.parquet as pq  # type: ignore
+
+        self.path = path
+        self.columns = columns or COLUMNS
+        self._lock = threading.Lock()
+        self._schema = _arrow_schema(self.columns)
+        # Each write is a row group, so finished invoices are kept on disk.
+        self._writer = pq.ParquetWriter(path, self._schema)
+
+    def _write(self, df: pd.DataFrame):
+        pa = _import_pyarrow()
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+class FeatherWriter(OutputWriter):
+    def __init__(self, path: Path, columns: Optional[List[str]] = None):
+        pa = _import_pyarrow()
+        self.path = path
+        self.columns = columns or COLUMNS
+        self._lock = threading.Lock()
+        # Feather files can't replace a dictionary once it's written, so
+        # categories are stored as plain strings and each write is streamed
+        # as a record batch. `read_output` turns them back into categories.
+        self._schema = pa.schema(
+            (field.name, pa.string()) if SCHEMA[field.name] == "category" else field
+            for field in _arrow_schema(self.columns)
+        )
+        compression = "lz4" if pa.Codec.is_available("lz4") else None
+        self._writer = pa.ipc.new_file(
+            path, self._schema, options=pa.ipc.IpcWriteOptions(compression=compression)
+        )
+
+    def _write(self, df: pd.DataFrame):
+        pa = _import_pyarrow()
+        df = df.astype(
+            {col: "string" for col in df.columns if SCHEMA[col] == "category"}
+        )
+        table = pa.Table.from_pandas(df, schema=self._schema, preserve_index=False)
+        self._writer.write_table(table)
+
+    def close(self):
+        self._writer.close()
+
+
+class SqliteWriter(OutputWriter):
+    def __init__(self, path: Path, columns: Optional[List[str]] = None):
+        self.path = path
+        self.columns = columns or COLUMNS
+        # Writes come from whichever thread finished an invoice.
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        definitions = ", ".join(
+            f"{col} {SQLITE_TYPES[SCHEMA[col]]}" for col in self.columns
+        )
+        with self._conn:
+            self._conn.execute(f"DROP TABLE IF EXISTS {SQLITE_TABLE}")
+            self._conn.execute(f"CREATE TABLE {SQLITE_TABLE} ({definitions})")
+            for col in SQLITE_INDEXES:
+                self._conn.execute(
+                    f"CREATE INDEX {SQLITE_TABLE}_{col} ON {SQLITE_TABLE} ({col})"
+                )
+
+    def _write(self, df: pd.DataFrame):
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False)
+        placeholders = ", ".join("?" * len(self.columns))
+        with self._conn:
+            self._conn.executemany(
+                f"INSERT INTO {SQLITE_TABLE} VALUES ({placeholders})", rows
+            )
+
+    def close(self):
+        self._conn.close()
+
+
+class ConsoleWriter(OutputWriter):
+    def __init__(self, columns: Optional[List[str]] = None):
+        self.columns = columns or COLUMNS
+        self._lock = threading.Lock()
+        self._rows = 0
+
+    def _write(self, df: pd.DataFrame):
+        if df.empty:
+            return
+        # Number rows across invoices, as if they were one table.
+        df = df.set_axis(range(self._rows, self._rows + len(df)), axis=0)
+        self._rows += len(df)
+        with pd.option_context(
+            "display.max_rows",
+            None,
+            "display.max_columns",
+            None,
+            "display.max_colwidth",
+            None,
+        ):
+            print(df)
+
+    def close(self):
+        pass
+
+
+def open_writer(
+    output: Optional[Path],
+    output_format: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+) -> OutputWriter:
+    """Open a writer for the output of a run.
+
+    Parameters
+    ----------
+    output : Path, optional
+        The file to write. If `None`, rows are printed instead.
+
+    output_format : string, optional
+        One of `OUTPUT_FORMATS`. Defaults to the format matching the
+        suffix of `output`, or "csv".
+
+    columns : list of string, optional
+        The columns to write, e.g. from `output_columns`. Defaults to
+        `COLUMNS`.
+
+    Returns
+    -------
+    writer : OutputWriter
+        The writer.
+
+    """
+    if output is None:
+        return ConsoleWriter(columns)
+    return WRITERS[output_format_for(output, output_format)](output, columns)
+
+
+def read_output(path: Path, output_format: Optional[str] = None) -> pd.DataFrame:
+    """Load the output of a run, with the types in `SCHEMA`.
+
+    Optional columns are only loaded if the output has them.
+
+    Parameters
+    ----------
+    path : Path
+        The output file.
+
+    output_format : string, optional
+        One of `OUTPUT_FORMATS`. Defaults to the format matching the
+        suffix of `path`, or "csv".
+
+    Returns
+    -------
+    df : DataFrame
+        The rows of every invoice.
+
+    """
+    output_format = output_format_for(path, output_format)
+    if output_format == "csv":
+        df = pd.read_csv(path, dtype=SCHEMA)
+    elif output_format == "jsonl":
+        df = pd.read_json(path, lines=True, dtype=False)
+    elif output_format == "parquet":
+        df = pd.read_parquet(path)
+    elif output_format == "feather":
+        df = pd.read_feather(path)
+    else:
+        with sqlite3.connect(path) as conn:
+            df = pd.read_sql_query(f"SELECT * FROM {SQLITE_TABLE}", conn)
+    return apply_schema(df, columns=output_columns(df.columns))
+
+
+WRITERS: Dict[str, Callable[[Path, Optional[List[str]]], OutputWriter]] = {
+    "csv": CsvWriter,
+    "jsonl": JsonLinesWriter,
+    "parquet": ParquetWriter,
+    "feather": FeatherWriter,
+    "sqlite": SqliteWriter,
+}
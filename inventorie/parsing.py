@@ -0,0 +1,122 @@
+from functools import lru_cache
+import threading
+from typing import TYPE_CHECKING, Callable, Dict, Optional, Union
+
+from .instrument import timed
+
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup  # type: ignore
+
+
+HTML_PARSERS = ("lxml", "html.parser")
+
+_HTML_PARSER: Optional[str] = None
+_TARGETED = True
+_PARSING_LOCK = threading.Lock()
+
+
+def _default_html_parser() -> str:
+    try:
+        import lxml  # type: ignore # noqa: F401
+    except ImportError:
+        return "html.parser"
+    return "lxml"
+
+
+def configure_html_parsing(parser: Optional[str] = None, targeted: bool = True):
+    """Choose how supplier pages and invoice emails are parsed.
+
+    Parameters
+    ----------
+    parser : string, optional
+        The BeautifulSoup parser, one of `HTML_PARSERS`. Defaults to the
+        C-backed "lxml" if it is installed, otherwise "html.parser".
+
+    targeted : bool, optional, default=True
+        Whether to only build the parts of each page that are read,
+        instead of the whole document.
+
+    """
+    global _HTML_PARSER, _TARGETED
+    if parser is not None and parser not in HTML_PARSERS:
+        raise ValueError(f"Unknown html parser {parser}")
+    with _PARSING_LOCK:
+        _HTML_PARSER = parser
+        _TARGETED = targeted
+
+
+def get_html_parser() -> str:
+    """The BeautifulSoup parser in use."""
+    global _HTML_PARSER
+    with _PARSING_LOCK:
+        if _HTML_PARSER is None:
+            _HTML_PARSER = _default_html_parser()
+        return _HTML_PARSER
+
+
+def has_class(attrs: Dict[str, Union[str, list]], name: str) -> bool:
+    """Whether a tag's attributes include the class `name`.
+
+    The class attribute is still a string while the document is being
+    parsed, and a list once it has been parsed.
+    """
+    classes = attrs.get("class") or []
+    if isinstance(classes, str):
+        classes = classes.split()
+    return name in classes
+
+
+@lru_cache(maxsize=None)
+def _tag_filter_class() -> type:
+    """The `_TagFilter` class, defined once bs4 is first needed."""
+    from bs4 import SoupStrainer  # type: ignore
+
+    class _TagFilter(SoupStrainer):
+        """A `SoupStrainer` that keeps the top-level tags `accept` returns true for."""
+
+        def __init__(self, accept: Callable[[str, dict], bool]):
+            super().__init__()
+            self.accept = accept
+
+        # Used while parsing by beautifulsoup4 < 4.13.
+        def search_tag(self, markup_name=None, markup_attrs={}):
+            return self.accept(markup_name, markup_attrs or {})
+
+        # Used while parsing by beautifulsoup4 >= 4.13.
+        def allow_tag_creation(self, nsprefix, name, attrs) -> bool:
+            return self.accept(name, attrs or {})
+
+        def allow_string_creation(self, string) -> bool:
+            return False
+
+    return _TagFilter
+
+
+def parse_html(
+    markup: Union[bytes, str], only: Optional[Callable[[str, dict], bool]] = None
+) -> "BeautifulSoup":
+    """Parse an html document.
+
+    Parameters
+    ----------
+    markup : bytes or string
+        The document.
+
+    only : callable, optional
+        Called with the name and attributes of each top-level tag. Only the
+        tags it accepts, and everything inside them, are built when
+        parsing is targeted.
+
+    Returns
+    -------
+    soup : BeautifulSoup
+        The parsed document.
+
+    """
+    from bs4 import BeautifulSoup  # type: ignore
+
+    parse_only = None
+    if only is not None and _TARGETED:
+        parse_only = _tag_filter_class()(only)
+    with timed("html parsing"):
+        return BeautifulSoup(markup, features=get_html_parser(), parse_only=parse_only)
@@ -1,9 +1,17 @@
-from typing import Protocol, Union
+import asyncio
+from typing import Any, Callable, Iterable, List, Optional, Protocol, Tuple, Union
 from pathlib import Path
 
 import pandas as pd  # type: ignore
 
+from .instrument import timed
+from .invoice.document import InvoiceDocument
 from .invoice.reader import InventoryReader
+from .scheduler import get_scheduler
+
+
+# Why a row couldn't be fully enriched, e.g. a product page that failed to load.
+ERROR_COLUMN = "enrichment_error"
 
 
 class Chainable(Protocol):
@@ -11,6 +19,186 @@ class Chainable(Protocol):
         ...
 
 
+class AsyncChainable(Chainable, Protocol):
+    async def update_dataframe_async(
+        self, df: pd.DataFrame, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        ...
+
+
+class BatchChainable(Chainable, Protocol):
+    """A step that looks up results for many rows at once.
+
+    The step reads the `key` column and fills the `columns` columns. It is
+    only given the distinct keys of rows missing any of its `columns`, and
+    only missing cells are filled with its results.
+    """
+
+    key: str
+    columns: List[str]
+
+    def update_batch(self, keys: pd.Series) -> pd.DataFrame:
+        """Look up results for many keys.
+
+        Parameters
+        ----------
+        keys : Series
+            The distinct keys to look up.
+
+        Returns
+        -------
+        results : DataFrame
+            The `columns` for each key, indexed like `keys`. Keys that
+            failed are left missing, with the reason in `ERROR_COLUMN`.
+
+        """
+        ...
+
+
+def fill_missing(df: pd.DataFrame, results: pd.DataFrame) -> pd.DataFrame:
+    """Fill the missing cells of `df` from `results`, aligned on the index.
+
+    Columns of `results` not in `df` are added.
+    """
+    for col in results.columns:
+        if col in df.columns:
+            df[col] = df[col].where(df[col].notna(), results[col])
+        else:
+            df[col] = results[col]
+    return df
+
+
+def split_errors(
+    step: Chainable, results: List[Any]
+) -> Tuple[List[Any], List[Optional[str]]]:
+    """Separate the failures of a step from its results.
+
+    Parameters
+    ----------
+    step : Chainable
+        The step, named in the errors.
+
+    results : list
+        Results for each key, with exceptions for keys that failed, as
+        returned by `Scheduler.map` or `gather_bounded` with
+        `return_exceptions`.
+
+    Returns
+    -------
+    results : list
+        The results, with `None` for keys that failed.
+
+    errors : list of string or None
+        A description of each failure, or `None` for keys that succeeded.
+
+    """
+    values: List[Any] = []
+    errors: List[Optional[str]] = []
+    for result in results:
+        if isinstance(result, Exception):
+            values.append(None)
+            errors.append(f"{type(step).__name__}: {result!r}")
+        else:
+            values.append(result)
+            errors.append(None)
+    return values, errors
+
+
+def _missing_keys(
+    step: BatchChainable, df: pd.DataFrame
+) -> Tuple[pd.Series, pd.Series]:
+    """The keys of rows missing any of the step's columns, and the distinct keys.
+
+    Rows without a key are left for the step's columns to stay missing.
+    """
+    for col in step.columns:
+        if col not in df.columns:
+            df[col] = None
+    missing = df[step.columns].isna().any(axis=1)
+    keys = df.loc[missing, step.key].dropna()
+    return keys, keys.drop_duplicates()
+
+
+def _join_results(
+    df: pd.DataFrame, keys: pd.Series, unique: pd.Series, results: pd.DataFrame
+) -> pd.DataFrame:
+    """Spread the results for each distinct key onto every row with that key."""
+    results = results.set_axis(unique.to_numpy(), axis=0)
+    results = results.reindex(keys.to_numpy()).set_axis(keys.index, axis=0)
+    if ERROR_COLUMN in results.columns:
+        errors = results.pop(ERROR_COLUMN).reindex(df.index)
+        if ERROR_COLUMN in df.columns:
+            # Keep the errors of earlier steps.
+            old = df[ERROR_COLUMN]
+            both = old.notna() & errors.notna()
+            errors = errors.where(~both, old + "; " + errors).fillna(old)
+        df[ERROR_COLUMN] = errors
+    return fill_missing(df, results)
+
+
+def update_batch_step(step: BatchChainable, df: pd.DataFrame) -> pd.DataFrame:
+    """Run a `BatchChainable` step on the rows of `df` that need it."""
+    keys, unique = _missing_keys(step, df)
+    if unique.empty:
+        return df
+    return _join_results(df, keys, unique, step.update_batch(unique))
+
+
+async def update_batch_step_async(
+    step: BatchChainable, df: pd.DataFrame, semaphore: asyncio.Semaphore
+) -> pd.DataFrame:
+    """Like `update_batch_step`, for steps with an `update_batch_async`."""
+    keys, unique = _missing_keys(step, df)
+    if unique.empty:
+        return df
+    results = await step.update_batch_async(unique, semaphore)  # type: ignore
+    return _join_results(df, keys, unique, results)
+
+
+async def run_in_executor(func: Callable, *args: Any) -> Any:
+    """Run a blocking call in the shared scheduler's threads."""
+    return await asyncio.wrap_future(get_scheduler().submit(func, *args))
+
+
+async def gather_bounded(
+    semaphore: asyncio.Semaphore,
+    func: Callable,
+    values: Iterable,
+    return_exceptions: bool = False,
+) -> List[Any]:
+    """Await `func(value)` for all `values`, at most `semaphore` at a time.
+
+    Parameters
+    ----------
+    semaphore : Semaphore
+        Bounds the number of calls in flight, shared across all callers.
+
+    func : coroutine function
+        The coroutine function to call on each value.
+
+    values : iterable
+        The values to call `func` on.
+
+    return_exceptions : bool, optional, default=False
+        Give the exception of a call that fails as its result, instead of
+        raising it.
+
+    Returns
+    -------
+    results : list
+        The results, in the same order as `values`.
+
+    """
+
+    async def _bounded(value):
+        async with semaphore:
+            return await func(value)
+
+    return await asyncio.gather(
+        *(_bounded(value) for value in values), return_exceptions=return_exceptions
+    )
+
+
 class Pipeline:
     def __init__(self, reader: InventoryReader, *steps: Chainable):
         """Represents a sequence of scraping and file parsing steps.
@@ -28,7 +216,7 @@ class Pipeline:
         self.reader = reader
         self.steps = steps
 
-    def process(self, file: Union[Path, str]) -> pd.DataFrame:
+    def process(self, file: Union[Path, str, InvoiceDocument]) -> pd.DataFrame:
         """Read and process an invoice.
 
         The pipeline reads in an invoice file as a dataframe and sequentially
@@ -36,16 +224,125 @@ class Pipeline:
 
         Parameters
         ----------
-        file : string or Path
+        file : string, Path or InvoiceDocument
+            The invoice to run the pipeline on.
+
+        Returns
+        -------
+        df : DataFrame
+            The dataframe obtained by applying the various transformations.
+
+        """
+        return self.enrich(self.read(file), invoice=Path(file).name)
+
+    def read(self, file: Union[Path, str, InvoiceDocument]) -> pd.DataFrame:
+        """Read an invoice with the pipeline's `reader`."""
+        with timed(f"{type(self.reader).__name__}.read", Path(file).name):
+            return self.reader.read(file)
+
+    def enrich(self, df: pd.DataFrame, invoice: Optional[str] = None) -> pd.DataFrame:
+        """Apply the pipeline's `steps` to an invoice that has been read.
+
+        Parameters
+        ----------
+        df : DataFrame
+            The raw invoice, as read by the pipeline's `reader`.
+
+        invoice : string, optional
+            The name of the invoice, to attribute the time spent to it
+            when profiling.
+
+        Returns
+        -------
+        df : DataFrame
+            The dataframe obtained by applying the various transformations.
+
+        """
+        for step in self.steps:
+            with timed(_stage_name(step), invoice):
+                if hasattr(step, "update_batch"):
+                    df = update_batch_step(step, df)  # type: ignore
+                else:
+                    df = step.update_dataframe(df)
+        return df
+
+    def enrich_unique(
+        self, dfs: List[pd.DataFrame], key: str = "product_id"
+    ) -> List[pd.DataFrame]:
+        """Enrich several invoices, processing each distinct product only once.
+
+        The first row for each product is enriched, and the results fill in
+        the missing fields of every row for that product. Fields already
+        present on a row, such as its quantity and price, are kept.
+
+        Parameters
+        ----------
+        dfs : list of DataFrame
+            Raw invoices, as read by the pipeline's `reader`.
+
+        key : string, optional, default="product_id"
+            The column identifying a product.
+
+        Returns
+        -------
+        dfs : list of DataFrame
+            The enriched invoices, in the same order as `dfs`.
+
+        """
+        if not dfs:
+            return []
+        combined = pd.concat(dfs, ignore_index=True)
+        unique = combined.drop_duplicates(key).reset_index(drop=True)
+        enriched = self.enrich(unique).set_index(key)
+        for col in enriched.columns:
+            values = combined[key].map(enriched[col])
+            if col in combined.columns:
+                values = combined[col].where(combined[col].notna(), values)
+            combined[col] = values
+
+        results = []
+        start = 0
+        for df in dfs:
+            results.append(
+                combined.iloc[start : start + len(df)].reset_index(drop=True)
+            )
+            start += len(df)
+        return results
+
+    async def process_async(
+        self, file: Union[Path, str, InvoiceDocument], semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        """Read and process an invoice on the running event loop.
+
+        Steps following the `AsyncChainable` protocol run their requests
+        concurrently, bounded by `semaphore`. Blocking work, such as reading
+        the invoice and steps without an async variant, runs in the loop's
+        default executor.
+
+        Parameters
+        ----------
+        file : string, Path or InvoiceDocument
             The invoice to run the pipeline on.
 
+        semaphore : Semaphore
+            Bounds the number of concurrent requests. Share one semaphore
+            between pipelines to bound requests across invoices.
+
         Returns
         -------
         df : DataFrame
             The dataframe obtained by applying the various transformations.
 
         """
-        df = self.reader.read(file)
+        df = await run_in_executor(self.read, file)
         for step in self.steps:
-            df = step.update_dataframe(df)
+            with timed(_stage_name(step), Path(file).name):
+                if hasattr(step, "update_dataframe_async"):
+                    df = await step.update_dataframe_async(df, semaphore)
+                else:
+                    df = await run_in_executor(step.update_dataframe, df)
         return df
+
+
+def _stage_name(step: Chainable) -> str:
+    return f"{type(step).__name__}.update_dataframe"
@@ -0,0 +1,137 @@
+from concurrent.futures import Future, ProcessPoolExecutor
+import functools
+import os
+import threading
+from typing import Callable, Dict, List, Optional
+
+import pandas as pd  # type: ignore
+
+from .invoice import InventoryReader, InvoiceDocument
+from .pipeline import Pipeline
+from .scheduler import get_scheduler
+
+
+# Called with each invoice and its rows once it is processed.
+ResultCallback = Callable[[InvoiceDocument, pd.DataFrame], None]
+# Called with each invoice that couldn't be processed and the error.
+ErrorCallback = Callable[[InvoiceDocument, Exception], None]
+
+
+def _read_invoice(reader: InventoryReader, document: InvoiceDocument) -> pd.DataFrame:
+    """Read an invoice in a worker process."""
+    return reader.read(document)
+
+
+class StagedScheduler:
+    def __init__(
+        self,
+        processes: Optional[int] = None,
+        queue_size: Optional[int] = None,
+    ):
+        """Reads invoices in a process pool and enriches them in threads.
+
+        Reading invoices is CPU bound, so it runs in separate processes
+        to avoid contending for the GIL. Enriching them is I/O bound, so it
+        runs in the threads of the shared `Scheduler`. Reading stops getting
+        ahead of enrichment once `queue_size` invoices are waiting.
+
+        Parameters
+        ----------
+        processes : int, optional
+            The number of processes reading invoices. Defaults to the number
+            of available cores.
+
+        queue_size : int, optional
+            The maximum number of invoices being read or waiting to be
+            enriched. Defaults to twice the number of scheduler threads.
+
+        """
+        self.processes = processes or _available_cores()
+        self.queue_size = queue_size
+
+    def run(
+        self,
+        pipelines: Dict[InvoiceDocument, Pipeline],
+        on_result: Optional[ResultCallback] = None,
+        on_error: Optional[ErrorCallback] = None,
+    ) -> List[Optional[pd.DataFrame]]:
+        """Process invoices.
+
+        Parameters
+        ----------
+        pipelines : dict of InvoiceDocument to Pipeline
+            The invoices to process, with the pipeline to process them.
+
+        on_result : callable, optional
+            Called from an enrichment thread with each invoice and its rows
+            as soon as it is enriched. The rows are then not kept.
+
+        on_error : callable, optional
+            Called with each invoice that fails and the error, while the
+            other invoices carry on. By default the first error stops the
+            run and is raised.
+
+        Returns
+        -------
+        dfs : list of DataFrame
+            The processed invoices, in the order of `pipelines`. Invoices
+            passed to `on_result` or `on_error` are `None`.
+
+        """
+        scheduler = get_scheduler()
+        queue_size = self.queue_size or 2 * scheduler.threads
+        items = list(pipelines.items())
+        results: List[Optional[pd.DataFrame]] = [None] * len(items)
+        errors: List[BaseException] = []
+        # Each invoice holds a slot from being submitted for reading until it
+        # is enriched, so no more than `queue_size` are ever waiting.
+        slots = threading.Semaphore(queue_size)
+
+        def _enrich(i: int, read: Future):
+            document, pipeline = items[i]
+            try:
+                print(f"Enriching {document.name}")
+                df = pipeline.enrich(read.result(), invoice=document.name)
+                if on_result is None:
+                    results[i] = df
+                else:
+                    on_result(document, df)
+            except Exception as e:
+                if on_error is None:
+                    errors.append(e)
+                else:
+                    on_error(document, e)
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                document.close()
+                slots.release()
+
+        def _on_read(i: int, read: Future):
+            scheduler.submit(_enrich, i, read)
+
+        with ProcessPoolExecutor(self.processes) as processes:
+            for i, (document, pipeline) in enumerate(items):
+                slots.acquire()
+                if errors:
+                    slots.release()
+                    break
+                print(f"Reading {document.name}")
+                reader = pipeline.reader
+                if hasattr(reader, "for_file"):
+                    reader = reader.for_file(document)
+                read = processes.submit(_read_invoice, reader, document)
+                read.add_done_callback(functools.partial(_on_read, i))
+            # Wait for every submitted invoice to be enriched.
+            for _ in range(queue_size):
+                slots.acquire()
+
+        if errors:
+            raise errors[0]
+        return results
+
+
+def _available_cores() -> int:
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
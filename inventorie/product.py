@@ -1,7 +1,19 @@
-from typing import Protocol
+import asyncio
+import functools
+from typing import Any, List, Optional, Protocol
 
 import pandas as pd  # type: ignore
-import requests  # type: ignore
+
+from .pipeline import (
+    ERROR_COLUMN,
+    gather_bounded,
+    run_in_executor,
+    split_errors,
+    update_batch_step,
+    update_batch_step_async,
+)
+from .scheduler import get_scheduler
+from .session import PAGE_STORE, PageReservation, get_session
 
 
 class ProductLookup(Protocol):
@@ -9,6 +21,9 @@ class ProductLookup(Protocol):
 
     supplier: str
 
+    key: str = "product_id"
+    columns: List[str] = ["product_url"]
+
     def lookup(self, product_id: str) -> str:
         """Get webpage for product.
 
@@ -24,6 +39,10 @@ class ProductLookup(Protocol):
         """
         ...
 
+    async def lookup_async(self, product_id: str) -> str:
+        """Get webpage for product without blocking the event loop."""
+        return await run_in_executor(self.lookup, product_id)
+
     def update_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Finds urls for each product in a dataframe.
 
@@ -40,31 +59,69 @@ class ProductLookup(Protocol):
             Dataframe with column for 'product_url'.
 
         """
-        ...
+        return update_batch_step(self, df)
+
+    async def update_dataframe_async(
+        self, df: pd.DataFrame, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        return await update_batch_step_async(self, df, semaphore)
 
+    def update_batch(self, product_ids: pd.Series) -> pd.DataFrame:
+        results = get_scheduler().map(self.lookup, product_ids, return_exceptions=True)
+        return self._to_frame(results, product_ids.index)
 
-class TaydaProductLookup:
+    async def update_batch_async(
+        self, product_ids: pd.Series, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        results = await gather_bounded(
+            semaphore, self.lookup_async, product_ids, return_exceptions=True
+        )
+        return self._to_frame(results, product_ids.index)
+
+    def _to_frame(self, results: List[Any], index: pd.Index) -> pd.DataFrame:
+        urls, errors = split_errors(self, results)
+        return pd.DataFrame({"product_url": urls, ERROR_COLUMN: errors}, index=index)
+
+
+class TaydaProductLookup(ProductLookup):
 
     supplier = "Tayda Electronics"
 
     SEARCH_URL = "https://www.taydaelectronics.com/catalogsearch/result/?q={}"
 
-    def lookup(self, product_id: str) -> str:
+    def lookup(
+        self, product_id: str, reservation: Optional[PageReservation] = None
+    ) -> str:
         query_url = self.SEARCH_URL.format(product_id)
-        resp = requests.get(query_url)
+        resp = get_session().get(query_url)
         if resp.status_code != 200:
             raise ValueError(f"Unable to find webpage for {product_id}")
         # Should redirect if single product found.
         if not resp.history:
             raise ValueError(f"Found multiple results for {product_id}.")
+        # Keep the product page so the scraper doesn't download it again.
+        PAGE_STORE.put(resp.url, resp.content, reservation)
         return resp.url
 
-    def update_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
-        if "product_url" not in df.columns:
-            df["product_url"] = None
-        for idx, row in df.iterrows():
-            if row["product_url"] is not None:
-                continue
-            product_url = self.lookup(row["product_id"])
-            df.at[idx, "product_url"] = product_url
-        return df
+    def update_batch(self, product_ids: pd.Series) -> pd.DataFrame:
+        # Room is kept for every page of the batch until it is scraped.
+        with PAGE_STORE.reserve(len(product_ids)) as reservation:
+            results = get_scheduler().map(
+                functools.partial(self.lookup, reservation=reservation),
+                product_ids,
+                return_exceptions=True,
+            )
+        return self._to_frame(results, product_ids.index)
+
+    async def update_batch_async(
+        self, product_ids: pd.Series, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        with PAGE_STORE.reserve(len(product_ids)) as reservation:
+            lookup = functools.partial(self.lookup, reservation=reservation)
+            results = await gather_bounded(
+                semaphore,
+                lambda product_id: run_in_executor(lookup, product_id),
+                product_ids,
+                return_exceptions=True,
+            )
+        return self._to_frame(results, product_ids.index)
@@ -0,0 +1,164 @@
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+import threading
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+from urllib.parse import urlparse
+
+
+# The total number of threads making requests.
+DEFAULT_THREADS = 32
+# The maximum number of concurrent requests to each supplier.
+DEFAULT_HOST_LIMITS = {"jameco.com": 8, "taydaelectronics.com": 8}
+
+
+class Scheduler:
+    def __init__(
+        self,
+        threads: int = DEFAULT_THREADS,
+        host_limits: Optional[Dict[str, int]] = None,
+    ):
+        """A shared thread pool with a global budget and per-host limits.
+
+        Invoices and the pipeline steps processing them submit their work
+        here instead of creating their own thread pools, so the number of
+        threads stays bounded no matter how many invoices are processed at
+        once.
+
+        Parameters
+        ----------
+        threads : int, optional
+            The total number of worker threads.
+
+        host_limits : dict of string to int, optional
+            The maximum number of concurrent requests to each host. A limit
+            for a domain also applies to its subdomains. Defaults to
+            `DEFAULT_HOST_LIMITS`.
+
+        """
+        self.threads = threads
+        self.host_limits = dict(
+            DEFAULT_HOST_LIMITS if host_limits is None else host_limits
+        )
+        self._executor = ThreadPoolExecutor(threads)
+        self._semaphores = {
+            host: threading.BoundedSemaphore(limit)
+            for host, limit in self.host_limits.items()
+        }
+        self._local = threading.local()
+        # Calls submitted and not yet finished, running or waiting.
+        self._unfinished = 0
+        self._lock = threading.Lock()
+
+    def submit(self, func: Callable, *args: Any) -> Future:
+        """Schedule `func(*args)` to run in the shared pool."""
+        with self._lock:
+            self._unfinished += 1
+        return self._submit(func, *args)
+
+    def try_submit(self, func: Callable, *args: Any) -> Optional[Future]:
+        """Schedule `func(*args)` only if a thread is free to run it now.
+
+        For work that can just as well be skipped or done by the caller,
+        such as a second copy of a slow request, so it never waits behind
+        other work or needs threads beyond the budget.
+
+        Returns
+        -------
+        future : Future or None
+            The scheduled call, or `None` if every thread is busy.
+
+        """
+        with self._lock:
+            if self._unfinished >= self.threads:
+                return None
+            self._unfinished += 1
+        return self._submit(func, *args)
+
+    def map(
+        self, func: Callable, values: Iterable, return_exceptions: bool = False
+    ) -> List[Any]:
+        """Call `func` on every value in the shared pool, and wait for the results.
+
+        If called from one of the pool's own threads, e.g. by a pipeline
+        step processing an invoice, the thread runs the calls no other
+        thread has started yet itself instead of waiting for them, so that
+        nested work can't exhaust the pool and deadlock. With
+        `return_exceptions`, a call that fails gives its exception as its
+        result instead of raising it, so the other results aren't lost.
+        """
+        if return_exceptions:
+            func = _returning_exceptions(func)
+        futures = [(self.submit(func, value), value) for value in values]
+        if not getattr(self._local, "is_worker", False):
+            return [future.result() for future, _ in futures]
+        return [
+            func(value) if future.cancel() else future.result()
+            for future, value in futures
+        ]
+
+    @contextmanager
+    def host_slot(self, url: str) -> Iterator[None]:
+        """Hold one of the concurrent request slots for the host of `url`."""
+        semaphore = self._semaphore_for(url)
+        if semaphore is None:
+            yield
+            return
+        with semaphore:
+            yield
+
+    def shutdown(self):
+        self._executor.shutdown()
+
+    def _semaphore_for(self, url: str) -> Optional[threading.BoundedSemaphore]:
+        host = urlparse(url).hostname or ""
+        for domain, semaphore in self._semaphores.items():
+            if host == domain or host.endswith("." + domain):
+                return semaphore
+        return None
+
+    def _submit(self, func: Callable, *args: Any) -> Future:
+        """Submit a call already counted in `_unfinished`."""
+        future = self._executor.submit(self._run_as_worker, func, *args)
+        # Also called if the future is cancelled before it runs.
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future):
+        with self._lock:
+            self._unfinished -= 1
+
+    def _run_as_worker(self, func: Callable, *args: Any) -> Any:
+        self._local.is_worker = True
+        return func(*args)
+
+
+def _returning_exceptions(func: Callable) -> Callable:
+    def _call(*args: Any) -> Any:
+        try:
+            return func(*args)
+        except Exception as e:
+            return e
+
+    return _call
+
+
+_SCHEDULER: Optional[Scheduler] = None
+_SCHEDULER_LOCK = threading.Lock()
+
+
+def get_scheduler() -> Scheduler:
+    """Get the scheduler shared by all pipeline steps."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is None:
+            _SCHEDULER = Scheduler()
+        return _SCHEDULER
+
+
+def set_scheduler(scheduler: Optional[Scheduler]):
+    """Replace the shared scheduler. Passing `None` resets to the default."""
+    global _SCHEDULER
+    with _SCHEDULER_LOCK:
+        if _SCHEDULER is not None and _SCHEDULER is not scheduler:
+            _SCHEDULER.shutdown()
+        _SCHEDULER = scheduler
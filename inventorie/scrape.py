@@ -1,12 +1,28 @@
-from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
+import asyncio
+from dataclasses import asdict, dataclass
 import json
-from typing import Protocol, Optional
+from typing import List, Protocol, Optional, Tuple, Union
 
 from bs4 import BeautifulSoup  # type: ignore
 from bs4.element import Tag  # type: ignore
 import pandas as pd  # type: ignore
-import requests  # type: ignore
+
+from .cache import get_cache, get_memo
+from .parsing import has_class, parse_html
+from .pipeline import (
+    ERROR_COLUMN,
+    gather_bounded,
+    run_in_executor,
+    split_errors,
+    update_batch_step,
+    update_batch_step_async,
+)
+from .scheduler import get_scheduler
+from .session import PAGE_STORE, get_session
+
+
+# The type of the scripts holding the JSON that initializes page widgets.
+MAGENTO_INIT_SCRIPT = "text/x-magento-init"
 
 
 @dataclass
@@ -22,6 +38,9 @@ class ScrapeResult:
 class Scraper(Protocol):
     """Represents a supplier-specific web scraper."""
 
+    key: str = "product_url"
+    columns: List[str] = list(ScrapeResult.__dataclass_fields__.keys())
+
     def scrape(self, url: str) -> ScrapeResult:
         """Scrapes product information from provided url.
 
@@ -38,6 +57,36 @@ class Scraper(Protocol):
         """
         ...
 
+    def cached_scrape(self, url: str) -> ScrapeResult:
+        """Scrapes product information, using the scrape cache if configured.
+
+        Parameters
+        ----------
+        url : string
+            The url for the particular product.
+
+        Returns
+        -------
+        result : ScrapeResult
+            The cached data if available, otherwise the freshly scraped data.
+
+        """
+        cache = get_cache("scrape")
+        if cache is None:
+            return self.scrape(url)
+        cached = cache.get(url)
+        if cached is not None:
+            # Drop any page kept for this url, since it won't be read.
+            PAGE_STORE.pop(url)
+            return ScrapeResult(**cached)
+        result = self.scrape(url)
+        cache.set(url, asdict(result))
+        return result
+
+    async def scrape_async(self, url: str) -> ScrapeResult:
+        """Scrapes product information without blocking the event loop."""
+        return await run_in_executor(self.cached_scrape, url)
+
     def update_dataframe(self, df: pd.DataFrame) -> pd.DataFrame:
         """Updates a data frame of products to include scraped data for each product.
 
@@ -53,23 +102,40 @@ class Scraper(Protocol):
             by scraped results for each product.
 
         """
-        for new_col in ScrapeResult.__dataclass_fields__.keys():
-            if new_col not in df.columns:
-                df[new_col] = None
-
-        with ThreadPoolExecutor() as executor:
-            futures = {
-                idx: executor.submit(self.scrape, row["product_url"])
-                for idx, row in df.iterrows()
-            }
-            scrape_results = {idx: t.result() for idx, t in futures.items()}
-
-        for idx, result in scrape_results.items():
-            for col, val in result.__dict__.items():
-                if df.at[idx, col] is not None:
-                    continue
-                df.at[idx, col] = val
+        return update_batch_step(self, df)
+
+    async def update_dataframe_async(
+        self, df: pd.DataFrame, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        """Like `update_dataframe`, but scrapes on the running event loop.
+
+        At most `semaphore` pages are scraped at a time.
+        """
+        return await update_batch_step_async(self, df, semaphore)
+
+    def update_batch(self, urls: pd.Series) -> pd.DataFrame:
+        results = get_scheduler().map(self.cached_scrape, urls, return_exceptions=True)
+        return self._to_frame(results, urls.index)
 
+    async def update_batch_async(
+        self, urls: pd.Series, semaphore: asyncio.Semaphore
+    ) -> pd.DataFrame:
+        results = await gather_bounded(
+            semaphore, self.scrape_async, urls, return_exceptions=True
+        )
+        return self._to_frame(results, urls.index)
+
+    def _to_frame(
+        self, results: List[Union[ScrapeResult, Exception]], index: pd.Index
+    ) -> pd.DataFrame:
+        """One row of scraped fields per result, empty for pages that failed."""
+        scraped, errors = split_errors(self, results)
+        df = pd.DataFrame(
+            [asdict(result) if result is not None else {} for result in scraped],
+            index=index,
+            columns=self.columns,
+        )
+        df[ERROR_COLUMN] = errors
         return df
 
 
@@ -77,18 +143,42 @@ class TaydaScraper(Scraper):
     """A `Scraper` for Tayda Electronics."""
 
     def scrape(self, url: str) -> ScrapeResult:
-        resp = requests.get(url)
-        if resp.status_code != 200:
-            raise ValueError(f"Unable to find webpage {url}")
-        soup = BeautifulSoup(resp.content, features="html.parser")
+        result, category_url = self._parse_product_page(
+            url, self._fetch_product_page(url)
+        )
+        result.product_category = get_memo("tayda_category").get(
+            category_url, self._scrape_product_category
+        )
+        return result
+
+    def _parse_product_page(self, url: str, content: bytes) -> Tuple[ScrapeResult, str]:
+        """Scrape a product page, returning the url of its category page."""
+        soup = parse_html(content, only=self._is_product_part)
         specs = self._find_specs_table(soup)
         if specs is None:
             raise ValueError(f"Unable to find additional information from {url}")
         result = self._scrape_specs_table(specs)
-        category_url = self._find_product_category_url(soup)
-        result.product_category = self._scrape_product_category(category_url)
         result.datasheet_url = self._scrape_datasheet(soup)
-        return result
+        return result, self._find_product_category_url(soup)
+
+    @staticmethod
+    def _is_product_part(name: str, attrs: dict) -> bool:
+        """Whether a tag is one of the parts of a product page that are read."""
+        return (
+            (name == "table" and attrs.get("id") == "product-attribute-specs-table")
+            or (name == "script" and attrs.get("type") == MAGENTO_INIT_SCRIPT)
+            or (name == "div" and has_class(attrs, "description"))
+        )
+
+    def _fetch_product_page(self, url: str) -> bytes:
+        """Get the product page, reusing it if the product lookup fetched it."""
+        content = PAGE_STORE.pop(url)
+        if content is not None:
+            return content
+        resp = get_session().get(url)
+        if resp.status_code != 200:
+            raise ValueError(f"Unable to find webpage {url}")
+        return resp.content
 
     def _find_specs_table(self, soup: BeautifulSoup) -> Optional[Tag]:
         """Find the product specifications table."""
@@ -114,18 +204,27 @@ class TaydaScraper(Scraper):
         return result
 
     def _find_product_category_url(self, soup: BeautifulSoup) -> str:
-        # The data is in the first "script" tag after the "bradcrumbs" div
-        script = soup.find("div", {"class", "breadcrumbs"})
-        while script.name != "script":
-            script = script.next_sibling
-        script_data = json.loads(script.text)
-        return script_data[".breadcrumbs"]["breadcrumbs"]["categoryOverride"]
+        # The data is in the JSON script that initializes the "breadcrumbs"
+        # div. Other scripts may mention the div too, e.g. inline javascript.
+        for script in soup.find_all("script", {"type": MAGENTO_INIT_SCRIPT}):
+            if ".breadcrumbs" not in script.text:
+                continue
+            try:
+                script_data = json.loads(script.text)
+            except json.JSONDecodeError:
+                continue
+            if ".breadcrumbs" in script_data:
+                return script_data[".breadcrumbs"]["breadcrumbs"]["categoryOverride"]
+        raise ValueError("Unable to find product category")
 
     def _scrape_product_category(self, url: str) -> str:
-        resp = requests.get(url)
+        resp = get_session().get(url)
         if resp.status_code != 200:
             raise ValueError
-        soup = BeautifulSoup(resp.content, features="html.parser")
+        soup = parse_html(
+            resp.content,
+            only=lambda name, attrs: attrs.get("data-ui-id") == "page-title-wrapper",
+        )
         title = soup.find("span", {"data-ui-id": "page-title-wrapper"})
         return title.text.strip()
 
@@ -144,15 +243,23 @@ class JamecoScraper(Scraper):
     """A `Scraper` for Jameco Electronics."""
 
     def scrape(self, url: str) -> ScrapeResult:
-        resp = requests.get(url)
+        resp = get_session().get(url)
         if resp.status_code != 200:
             raise ValueError(f"Unable to find webpage {url}")
-        soup = BeautifulSoup(resp.content, features="html.parser")
+        return self._parse_product_page(url, resp.content)
+
+    def _parse_product_page(self, url: str, content: bytes) -> ScrapeResult:
+        soup = parse_html(content, only=self._is_product_part)
         result = self._scrape_specs_table(soup)
         result.product_category = self._scrape_product_category(soup)
         result.description = self._scrape_product_description(soup)
         return result
 
+    @staticmethod
+    def _is_product_part(name: str, attrs: dict) -> bool:
+        """Whether a tag is one of the parts of a product page that are read."""
+        return name in ("li", "h1") or (name == "ol" and has_class(attrs, "breadcrumb"))
+
     def _scrape_specs_table(self, soup: BeautifulSoup) -> ScrapeResult:
         result = ScrapeResult(supplier="Jameco Electronics")
         items = soup.find_all("li")
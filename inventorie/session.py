@@ -0,0 +1,560 @@
+from collections import OrderedDict, defaultdict, deque
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Future,
+    TimeoutError as FutureTimeoutError,
+    wait,
+)
+from email.utils import parsedate_to_datetime
+import functools
+import random
+import threading
+import time
+from typing import Deque, Dict, List, Optional, Set, Tuple, Union
+from urllib.parse import urlparse
+
+import requests  # type: ignore
+from requests.adapters import HTTPAdapter  # type: ignore
+
+from .instrument import record_request
+from .scheduler import get_scheduler
+
+
+# Connect and read timeouts, in seconds.
+DEFAULT_TIMEOUT: Tuple[float, float] = (5.0, 30.0)
+# Matches the largest default `ThreadPoolExecutor` size.
+DEFAULT_POOL_SIZE = 32
+# Number of per-host connection pools to keep alive.
+DEFAULT_POOL_HOSTS = 8
+# Number of fetched pages kept for later steps to reuse.
+DEFAULT_MAX_PAGES = 256
+# Number of times a failed request is retried.
+DEFAULT_RETRIES = 3
+# Seconds before the first retry, doubling for each one after.
+DEFAULT_BACKOFF = 0.5
+# The longest wait before a retry, in seconds, even if asked to wait longer.
+DEFAULT_MAX_BACKOFF = 60.0
+# Consecutive failures after which requests to a host are stopped.
+DEFAULT_FAILURE_THRESHOLD = 10
+# Seconds before requests to a host are tried again after it failed.
+DEFAULT_RESET_AFTER = 30.0
+
+# Recent request latencies kept per host, for deciding when to hedge.
+DEFAULT_LATENCY_WINDOW = 200
+# Latencies needed for a host before its requests are hedged.
+DEFAULT_MIN_LATENCIES = 20
+# The latency quantile after which a hedged request is sent.
+DEFAULT_HEDGE_QUANTILE = 0.95
+
+# Responses that mean the request might succeed if tried again later.
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+# Methods that are safe to send again.
+RETRY_METHODS = frozenset(["GET", "HEAD", "OPTIONS"])
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """A request wasn't sent because its host has been failing."""
+
+
+class DeadlineExceeded(requests.Timeout):
+    """A request wasn't sent because the run's deadline has passed."""
+
+
+_DEADLINE: Optional[float] = None
+
+
+def set_deadline(seconds: Optional[float]):
+    """Stop making requests `seconds` from now, or never with `None`.
+
+    Once the deadline passes, requests fail with `DeadlineExceeded` instead
+    of being sent, so the rows still waiting on them are left unenriched,
+    and requests in flight time out by the deadline.
+    """
+    global _DEADLINE
+    _DEADLINE = None if seconds is None else time.monotonic() + seconds
+
+
+def time_left() -> Optional[float]:
+    """Seconds until the deadline, or `None` if there isn't one."""
+    deadline = _DEADLINE
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def _within_deadline(
+    timeout: Union[float, Tuple[float, float], None]
+) -> Union[float, Tuple[float, float], None]:
+    """`timeout`, shortened so a request can't outlast the deadline."""
+    left = time_left()
+    if left is None:
+        return timeout
+    if left <= 0:
+        raise DeadlineExceeded("The deadline for requests has passed.")
+    if timeout is None:
+        return left
+    if isinstance(timeout, tuple):
+        return (min(timeout[0], left), min(timeout[1], left))
+    return min(timeout, left)
+
+
+class LatencyTracker:
+    def __init__(
+        self,
+        window: int = DEFAULT_LATENCY_WINDOW,
+        min_samples: int = DEFAULT_MIN_LATENCIES,
+    ):
+        """The latencies of recent requests to each host.
+
+        Parameters
+        ----------
+        window : int, optional
+            The number of recent requests to keep per host.
+
+        min_samples : int, optional
+            The number of requests to a host needed to estimate quantiles.
+
+        """
+        self.window = window
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+        self._latencies: Dict[str, Deque[float]] = defaultdict(
+            lambda: deque(maxlen=self.window)
+        )
+
+    def record(self, url: str, seconds: float):
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            self._latencies[host].append(seconds)
+
+    def quantile(self, url: str, q: float) -> Optional[float]:
+        """The `q` quantile of recent latencies to the host of `url`, if known."""
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            latencies = sorted(self._latencies.get(host, ()))
+        if len(latencies) < self.min_samples:
+            return None
+        return latencies[min(len(latencies) - 1, int(q * len(latencies)))]
+
+
+def _close_response(future: Future):
+    """Close the response of a hedged request that lost the race."""
+    if future.exception() is None:
+        future.result().close()
+
+
+class CircuitBreaker:
+    def __init__(
+        self,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        reset_after: float = DEFAULT_RESET_AFTER,
+    ):
+        """Stops requests to hosts that keep failing.
+
+        After `failure_threshold` consecutive failed requests to a host, the
+        circuit for the host opens and requests to it fail immediately with
+        `CircuitOpenError`, instead of each waiting out its retries. After
+        `reset_after` seconds one request is let through: if it succeeds
+        the circuit closes, otherwise it stays open for another period.
+
+        Parameters
+        ----------
+        failure_threshold : int, optional
+            Consecutive failures before the circuit opens.
+
+        reset_after : float, optional
+            Seconds before a request is tried on an open circuit.
+
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures: Dict[str, int] = {}
+        self._opened_at: Dict[str, float] = {}
+
+    def before_request(self, url: str):
+        """Raise `CircuitOpenError` if requests to the host of `url` are stopped."""
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return
+            now = time.monotonic()
+            if now - opened_at < self.reset_after:
+                raise CircuitOpenError(f"Requests to {host} are failing.")
+            # Let this request through, but hold back the rest until it's done.
+            self._opened_at[host] = now
+
+    def record(self, url: str, ok: bool):
+        """Record whether a request to the host of `url` succeeded."""
+        host = urlparse(url).hostname or ""
+        with self._lock:
+            if ok:
+                self._failures.pop(host, None)
+                self._opened_at.pop(host, None)
+                return
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._failures[host] >= self.failure_threshold:
+                self._opened_at[host] = time.monotonic()
+
+
+def retry_after(resp: requests.Response) -> Optional[float]:
+    """The seconds a server asked to wait with its `Retry-After` header, if any."""
+    value = resp.headers.get("Retry-After")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class Session(requests.Session):
+    def __init__(
+        self,
+        pool_size: int = DEFAULT_POOL_SIZE,
+        timeout: Union[float, Tuple[float, float], None] = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        circuit_breaker: Optional[CircuitBreaker] = None,
+        hedge: bool = False,
+    ):
+        """An HTTP session with keep-alive connection pools and default timeouts.
+
+        Requests respect the per-host concurrency limits of the shared
+        `Scheduler`. Requests that fail to connect or are answered with
+        one of `RETRY_STATUSES` are retried, if their method is safe to
+        repeat, after an exponentially growing, randomly jittered wait, or
+        as long as the server asks with `Retry-After`. The last response
+        is returned if every retry fails. Hosts that keep failing are cut
+        off by a `CircuitBreaker`. No request is sent, or waits, past the
+        deadline set with `set_deadline`.
+
+        With `hedge`, a request that is safe to repeat and is taking longer
+        than `DEFAULT_HEDGE_QUANTILE` of recent requests to its host is sent
+        a second time, and whichever response arrives first is used. This
+        cuts the tail latency from slow connections at the cost of a few
+        extra requests. Hedged requests only use threads of the shared
+        `Scheduler` that are free, so they don't add to its budget.
+
+        Parameters
+        ----------
+        pool_size : int, optional
+            The number of connections kept alive per host. This should be
+            at least the number of threads making requests concurrently.
+
+        timeout : float or (float, float), optional
+            The default timeout, or (connect, read) timeouts, in seconds
+            for requests that don't specify one.
+
+        retries : int, optional
+            The number of times a failed request is retried.
+
+        backoff : float, optional
+            Seconds to wait at most before the first retry, doubling with
+            each retry after.
+
+        circuit_breaker : CircuitBreaker, optional
+            Tracks failing hosts. Defaults to a `CircuitBreaker` with the
+            default settings.
+
+        hedge : bool, optional, default=False
+            Whether to hedge slow requests.
+
+        """
+        super().__init__()
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.circuit_breaker = (
+            CircuitBreaker() if circuit_breaker is None else circuit_breaker
+        )
+        self.hedge = hedge
+        self.latencies = LatencyTracker()
+        self.headers["Accept-Encoding"] = "gzip, deflate"
+        adapter = HTTPAdapter(
+            pool_connections=DEFAULT_POOL_HOSTS, pool_maxsize=pool_size
+        )
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def request(self, method, url, **kwargs):
+        timeout = kwargs.pop("timeout", self.timeout)
+        repeatable = method.upper() in RETRY_METHODS
+        retries = self.retries if repeatable else 0
+        for attempt in range(retries + 1):
+            kwargs["timeout"] = _within_deadline(timeout)
+            self.circuit_breaker.before_request(url)
+            send = self._send_hedged if self.hedge and repeatable else self._send
+            try:
+                resp = send(method, url, retry=attempt > 0, **kwargs)
+            except DeadlineExceeded:
+                raise
+            except requests.RequestException:
+                self.circuit_breaker.record(url, ok=False)
+                if attempt == retries:
+                    raise
+                wait = None
+            else:
+                failed = resp.status_code in RETRY_STATUSES
+                self.circuit_breaker.record(url, ok=not failed)
+                if not failed or attempt == retries:
+                    return resp
+                wait = retry_after(resp)
+                resp.close()
+            if wait is None:
+                wait = random.uniform(0, self.backoff * 2 ** attempt)
+            left = time_left()
+            if left is not None and left < wait:
+                raise DeadlineExceeded("The deadline for requests has passed.")
+            time.sleep(min(wait, DEFAULT_MAX_BACKOFF))
+
+    def _send_hedged(self, method, url, retry: bool = False, **kwargs):
+        """Send a request, and again if the first is slower than usual.
+
+        Both requests run in the shared scheduler's threads, while the
+        caller waits for the first answer. If no thread is free, the
+        request is sent without hedging, so hedging never needs threads
+        beyond the scheduler's budget.
+        """
+        delay = self.latencies.quantile(url, DEFAULT_HEDGE_QUANTILE)
+        if delay is None:
+            return self._send(method, url, retry=retry, **kwargs)
+        scheduler = get_scheduler()
+        sending = threading.Event()
+        primary = scheduler.try_submit(
+            functools.partial(
+                self._send, method, url, retry=retry, sending=sending, **kwargs
+            )
+        )
+        if primary is None:
+            return self._send(method, url, retry=retry, **kwargs)
+        # Time from when the request is sent, not from when it waits for a
+        # free slot to the host.
+        while not sending.wait(0.1):
+            if primary.done():
+                return primary.result()
+        try:
+            return primary.result(timeout=delay)
+        except FutureTimeoutError:
+            pass
+        hedged = scheduler.try_submit(
+            functools.partial(
+                self._send, method, url, retry=retry, hedge=True, **kwargs
+            )
+        )
+        if hedged is None:
+            return primary.result()
+        pending = {primary, hedged}
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    for other in pending:
+                        other.add_done_callback(_close_response)
+                    return future.result()
+        # Both failed.
+        return primary.result()
+
+    def _send(
+        self,
+        method,
+        url,
+        retry: bool = False,
+        hedge: bool = False,
+        sending: Optional[threading.Event] = None,
+        **kwargs,
+    ):
+        with get_scheduler().host_slot(url):
+            if sending is not None:
+                sending.set()
+            start = time.perf_counter()
+            try:
+                resp = super().request(method, url, **kwargs)
+            except requests.RequestException:
+                record_request(
+                    url,
+                    time.perf_counter() - start,
+                    error=True,
+                    retry=retry,
+                    hedge=hedge,
+                )
+                raise
+        # Streamed bodies haven't been downloaded yet, so aren't counted.
+        size = 0 if kwargs.get("stream") else len(resp.content)
+        seconds = time.perf_counter() - start
+        if resp.status_code < 400:
+            self.latencies.record(url, seconds)
+        record_request(
+            url,
+            seconds,
+            size=size,
+            error=resp.status_code >= 400,
+            retry=retry,
+            hedge=hedge,
+        )
+        return resp
+
+
+class PageReservation:
+    def __init__(self, store: "PageStore", pages: int):
+        """Room kept in a `PageStore` for the pages of one batch.
+
+        Made with `PageStore.reserve`. Pages put with the reservation are
+        never dropped to make room for others. While the reservation is
+        open it holds room for `pages` pages, less those already taken.
+        Once closed it only holds room for its pages that haven't been
+        taken, and none once they all have.
+        """
+        self.pages = pages
+        self.open = True
+        # Pages put with this reservation and not yet taken.
+        self.kept = 0
+        self.taken = 0
+        self._store = store
+
+    @property
+    def room(self) -> int:
+        return max(self.pages - self.taken, self.kept) if self.open else self.kept
+
+    def close(self):
+        self._store._close(self)
+
+    def __enter__(self) -> "PageReservation":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class PageStore:
+    def __init__(self, max_pages: int = DEFAULT_MAX_PAGES):
+        """A bounded, thread-safe store of fetched page bodies keyed by url.
+
+        Lets a step hand a page it has already downloaded to a later step,
+        instead of the later step requesting it again. A page put several
+        times, e.g. by invoices being processed at the same time that share
+        a product, is kept until it has been taken as many times. The oldest
+        pages are dropped beyond `max_pages`, plus the room held by open
+        reservations.
+
+        Parameters
+        ----------
+        max_pages : int, optional
+            The maximum number of pages to keep, besides reserved pages.
+
+        """
+        self.max_pages = max_pages
+        self._pages: "OrderedDict[str, bytes]" = OrderedDict()
+        # The reservation of each time a page was put and not yet taken.
+        self._puts: Dict[str, List[Optional[PageReservation]]] = {}
+        self._reservations: Set[PageReservation] = set()
+        self._lock = threading.Lock()
+
+    def reserve(self, pages: int) -> PageReservation:
+        """Make room for the pages of a batch, until they are taken.
+
+        A step fetching the pages of a whole batch reserves room for the
+        batch, so the first pages aren't dropped before the next step takes
+        them, however large the batch. The reservation should be closed once
+        the batch has been fetched, giving back the room of the pages that
+        weren't put.
+
+        Parameters
+        ----------
+        pages : int
+            The most pages the batch will put.
+
+        Returns
+        -------
+        reservation : PageReservation
+            The reservation to put the batch's pages with.
+
+        """
+        reservation = PageReservation(self, pages)
+        with self._lock:
+            self._reservations.add(reservation)
+        return reservation
+
+    def put(
+        self, url: str, content: bytes, reservation: Optional[PageReservation] = None
+    ):
+        """Keep the body of the page at `url` until it is taken."""
+        with self._lock:
+            self._pages[url] = content
+            self._pages.move_to_end(url)
+            self._puts.setdefault(url, []).append(reservation)
+            if reservation is not None:
+                reservation.kept += 1
+            limit = self.max_pages + sum(r.room for r in self._reservations)
+            if len(self._pages) > limit:
+                self._evict(len(self._pages) - limit)
+
+    def pop(self, url: str) -> Optional[bytes]:
+        """Take the body of the page at `url`, or `None` if it isn't kept.
+
+        Steps that don't need a kept page, e.g. because their result for
+        `url` is cached, should still take it so it doesn't use up room.
+        """
+        with self._lock:
+            content = self._pages.get(url)
+            if content is None:
+                return None
+            puts = self._puts[url]
+            reservation = puts.pop(0)
+            if not puts:
+                del self._pages[url], self._puts[url]
+            if reservation is not None:
+                reservation.kept -= 1
+                reservation.taken += 1
+                if not reservation.open and not reservation.kept:
+                    self._reservations.discard(reservation)
+            return content
+
+    def _close(self, reservation: PageReservation):
+        with self._lock:
+            reservation.open = False
+            if not reservation.kept:
+                self._reservations.discard(reservation)
+
+    def _evict(self, n: int):
+        """Drop the `n` oldest pages that weren't put with a reservation."""
+        unreserved: List[str] = []
+        for url in self._pages:
+            if len(unreserved) == n:
+                break
+            if not any(self._puts[url]):
+                unreserved.append(url)
+        for url in unreserved:
+            del self._pages[url], self._puts[url]
+
+
+PAGE_STORE = PageStore()
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    """Get the HTTP session shared by all lookups and scrapers."""
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = Session()
+        return _SESSION
+
+
+def set_session(session: Optional[requests.Session]):
+    """Replace the shared HTTP session.
+
+    Any `requests.Session` may be used, e.g. one with adapters mounted to
+    serve requests from a local server. Passing `None` resets to a default
+    `Session` on next use.
+    """
+    global _SESSION
+    with _SESSION_LOCK:
+        if _SESSION is not None and _SESSION is not session:
+            _SESSION.close()
+        _SESSION = session
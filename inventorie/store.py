@@ -0,0 +1,270 @@
+from email.utils import parsedate_to_datetime
+import os
+from pathlib import Path
+import sqlite3
+import threading
+from typing import Iterable, List, Optional, Union
+
+import pandas as pd  # type: ignore
+
+from .invoice import InvoiceDocument
+from .output import SCHEMA, SQLITE_TYPES, apply_schema
+
+
+DEFAULT_STORE_PATH = (
+    Path(os.environ.get("XDG_DATA_HOME", Path.home() / ".local" / "share"))
+    / "inventorie"
+    / "inventory.sqlite"
+)
+
+STOCK_COLUMNS = [
+    "part",
+    "manufacturer_product_id",
+    "product_id",
+    "manufacturer",
+    "description",
+    "total_quantity",
+    "average_unit_price",
+    "last_purchase",
+]
+
+
+def purchase_time(document: InvoiceDocument) -> float:
+    """When an invoice was issued.
+
+    This is the date of an email invoice, or otherwise the time the file
+    was last modified, in seconds since the epoch.
+    """
+    if document.suffix == ".eml":
+        date = document.headers.get("Date")
+        if date:
+            try:
+                return parsedate_to_datetime(date).timestamp()
+            except (TypeError, ValueError):
+                pass
+    return document.path.stat().st_mtime
+
+
+class InventoryStore:
+    def __init__(self, path: Union[Path, str] = DEFAULT_STORE_PATH):
+        """A persistent record of every invoice line, and the stock of each part.
+
+        Lines are keyed by the path of their invoice and line number, so
+        re-processing an invoice replaces its lines, and invoices with the
+        same name in different directories are kept apart. The `stock` table
+        holds, for each part, the total quantity bought, the average unit
+        price paid and the time of the last purchase. It is updated for just
+        the parts of each invoice as it is stored. A part is identified by
+        its manufacturer product ID, or by its supplier product ID if that
+        is unknown.
+
+        Parameters
+        ----------
+        path : string or Path, optional
+            The SQLite database file. Parent directories are created.
+
+        """
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            str(self.path), check_same_thread=False, timeout=30
+        )
+        columns = ", ".join(
+            f"{col} {SQLITE_TYPES[dtype]}" for col, dtype in SCHEMA.items()
+        )
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS lines ("
+                "invoice TEXT NOT NULL, "
+                "line INTEGER NOT NULL, "
+                "part TEXT, "
+                "purchased_at REAL, "
+                f"{columns}, "
+                "PRIMARY KEY (invoice, line))"
+            )
+            # Stores made before a column was added to the schema get it now.
+            existing = {
+                row[1] for row in self._conn.execute("PRAGMA table_info(lines)")
+            }
+            for col, dtype in SCHEMA.items():
+                if col not in existing:
+                    self._conn.execute(
+                        f"ALTER TABLE lines ADD COLUMN {col} {SQLITE_TYPES[dtype]}"
+                    )
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS stock ("
+                "part TEXT PRIMARY KEY, "
+                "manufacturer_product_id TEXT, "
+                "product_id TEXT, "
+                "manufacturer TEXT, "
+                "description TEXT, "
+                "total_quantity INTEGER, "
+                "average_unit_price REAL, "
+                "last_purchase REAL)"
+            )
+            for table, col in [
+                ("lines", "part"),
+                ("lines", "product_id"),
+                ("lines", "manufacturer_product_id"),
+                ("stock", "product_id"),
+                ("stock", "manufacturer_product_id"),
+            ]:
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS {table}_{col} ON {table} ({col})"
+                )
+
+    def upsert_invoice(self, invoice: str, df: pd.DataFrame, purchased_at: float):
+        """Store the lines of an invoice, replacing any stored before.
+
+        Parameters
+        ----------
+        invoice : string
+            The resolved path of the invoice file.
+
+        df : DataFrame
+            The processed invoice, one row per line.
+
+        purchased_at : float
+            When the invoice was issued, in seconds since the epoch.
+
+        """
+        # Every column is stored, including those of optional steps.
+        df = apply_schema(df, invoice, list(SCHEMA))
+        parts = df["manufacturer_product_id"].fillna(df["product_id"])
+        values = df.astype(object).where(df.notna(), None)
+        rows = [
+            (invoice, line, part, purchased_at, *row)
+            for line, part, row in zip(
+                range(len(df)),
+                parts.astype(object).where(parts.notna(), None),
+                values.itertuples(index=False),
+            )
+        ]
+        columns = ", ".join(["invoice", "line", "part", "purchased_at", *SCHEMA])
+        placeholders = ", ".join("?" * (4 + len(SCHEMA)))
+        with self._lock, self._conn:
+            old_parts = self._parts_of(invoice)
+            self._conn.execute(
+                "DELETE FROM lines WHERE invoice = ? AND line >= ?", (invoice, len(df))
+            )
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO lines ({columns}) VALUES ({placeholders})",
+                rows,
+            )
+            self._update_stock(old_parts | {row[2] for row in rows})
+
+    def remove_invoice(self, invoice: str):
+        """Forget the lines of an invoice."""
+        with self._lock, self._conn:
+            parts = self._parts_of(invoice)
+            self._conn.execute("DELETE FROM lines WHERE invoice = ?", (invoice,))
+            self._update_stock(parts)
+
+    def has_invoice(self, invoice: str) -> bool:
+        """Whether the lines of an invoice are stored."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT 1 FROM lines WHERE invoice = ? LIMIT 1", (invoice,)
+            ).fetchone()
+        return row is not None
+
+    def remove_missing(self, directory: Union[Path, str]) -> List[str]:
+        """Forget the invoices stored from `directory` that are no longer in it.
+
+        Invoices that were deleted or renamed no longer count towards the
+        stock. A renamed invoice is stored again under its new name once it
+        is processed.
+
+        Parameters
+        ----------
+        directory : string or Path
+            The directory the invoices were read from.
+
+        Returns
+        -------
+        invoices : list of string
+            The invoices that were forgotten.
+
+        """
+        directory = Path(directory).resolve()
+        with self._lock:
+            invoices = [
+                invoice
+                for (invoice,) in self._conn.execute(
+                    "SELECT DISTINCT invoice FROM lines"
+                )
+            ]
+        missing = [
+            invoice
+            for invoice in invoices
+            if Path(invoice).parent == directory and not Path(invoice).exists()
+        ]
+        for invoice in missing:
+            self.remove_invoice(invoice)
+        return missing
+
+    def query(self, term: Optional[str] = None) -> pd.DataFrame:
+        """Look up the stock of parts.
+
+        Parameters
+        ----------
+        term : string, optional
+            A manufacturer or supplier product ID. If `None`, the stock of
+            every part is returned.
+
+        Returns
+        -------
+        stock : DataFrame
+            The matching parts, with columns `STOCK_COLUMNS`.
+
+        """
+        sql = f"SELECT {', '.join(STOCK_COLUMNS)} FROM stock"
+        params: tuple = ()
+        if term is not None:
+            sql += (
+                " WHERE part = ? OR part IN ("
+                "SELECT part FROM lines "
+                "WHERE product_id = ? OR manufacturer_product_id = ?)"
+            )
+            params = (term, term, term)
+        with self._lock:
+            df = pd.read_sql_query(sql + " ORDER BY part", self._conn, params=params)
+        df["last_purchase"] = pd.to_datetime(df["last_purchase"], unit="s")
+        return df
+
+    def lines(self, part: str) -> pd.DataFrame:
+        """The stored invoice lines of a part, most recent first."""
+        with self._lock:
+            df = pd.read_sql_query(
+                "SELECT * FROM lines WHERE part = ? ORDER BY purchased_at DESC",
+                self._conn,
+                params=(part,),
+            )
+        df["purchased_at"] = pd.to_datetime(df["purchased_at"], unit="s")
+        return df
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _parts_of(self, invoice: str) -> set:
+        rows = self._conn.execute(
+            "SELECT DISTINCT part FROM lines WHERE invoice = ?", (invoice,)
+        )
+        return {part for (part,) in rows}
+
+    def _update_stock(self, parts: Iterable[Optional[str]]):
+        """Recompute the stock of `parts` from their lines."""
+        keys = [(part,) for part in parts if part is not None]
+        self._conn.executemany("DELETE FROM stock WHERE part = ?", keys)
+        # The other columns are taken from the most recent purchase.
+        self._conn.executemany(
+            "INSERT INTO stock "
+            "SELECT part, manufacturer_product_id, product_id, manufacturer, "
+            "description, SUM(quantity), "
+            "SUM(unit_price * quantity) / SUM(quantity), MAX(purchased_at) "
+            "FROM lines WHERE part = ? GROUP BY part",
+            keys,
+        )
@@ -1,16 +1,11 @@
 from dataclasses import dataclass
-import email
 from enum import Enum
 from pathlib import Path
-from typing import Union, Optional, Dict, List, Tuple
+import threading
+from typing import Callable, Union, Optional, Dict, List, Tuple
 
-from pdfreader import SimplePDFViewer  # type: ignore
-
-from .invoice import InventoryReader, JamecoInventoryReader, TaydaInventoryReader
-from .pipeline import Pipeline
-from .datasheet import JamecoDatasheetLookup
-from .product import TaydaProductLookup
-from .scrape import TaydaScraper, JamecoScraper
+from .invoice import InventoryReader, InvoiceDocument, as_document
+from .pipeline import Chainable, Pipeline
 
 
 class SUPPLIER(Enum):
@@ -23,29 +18,180 @@ SUPPLIER_FILE_TYPES: Dict[SUPPLIER, List[str]] = {
     SUPPLIER.JAMECO: [".pdf"],
 }
 
-READERS: Dict[Tuple[SUPPLIER, str], InventoryReader] = {
-    (SUPPLIER.TAYDA, ".eml"): TaydaInventoryReader(),
-    (SUPPLIER.JAMECO, ".pdf"): JamecoInventoryReader(),
+# Byte strings that only appear in a supplier's invoices.
+SUPPLIER_SIGNATURES: Dict[SUPPLIER, List[bytes]] = {
+    SUPPLIER.TAYDA: [b"Tayda Electronics", b"taydaelectronics.com"],
+    SUPPLIER.JAMECO: [b"Jameco Electronics", b"jameco.com"],
 }
 
-PIPELINES: Dict[Tuple[SUPPLIER, str], Pipeline] = {
-    (SUPPLIER.TAYDA, ".eml"): Pipeline(
-        TaydaInventoryReader(),
-        TaydaProductLookup(),
-        TaydaScraper(),
-    ),
-    (SUPPLIER.JAMECO, ".pdf"): Pipeline(
-        JamecoInventoryReader(), JamecoDatasheetLookup(), JamecoScraper()
-    ),
+# How much of the start and end of a file to scan for signatures.
+SNIFF_SIZE = 64 * 1024
+
+
+# Each supplier's modules are only imported when its pipeline is first
+# needed, so e.g. a folder of emails never loads the pdf libraries.
+def _tayda_email_pipeline() -> Pipeline:
+    from .invoice.html import TaydaInventoryReader
+    from .product import TaydaProductLookup
+    from .scrape import TaydaScraper
+
+    return Pipeline(TaydaInventoryReader(), TaydaProductLookup(), TaydaScraper())
+
+
+def _jameco_pdf_pipeline() -> Pipeline:
+    from .invoice.pdf import JamecoInventoryReader
+    from .datasheet import JamecoDatasheetLookup
+    from .scrape import JamecoScraper
+
+    return Pipeline(JamecoInventoryReader(), JamecoDatasheetLookup(), JamecoScraper())
+
+
+PIPELINE_FACTORIES: Dict[Tuple[SUPPLIER, str], Callable[[], Pipeline]] = {
+    (SUPPLIER.TAYDA, ".eml"): _tayda_email_pipeline,
+    (SUPPLIER.JAMECO, ".pdf"): _jameco_pdf_pipeline,
 }
 
+_PIPELINES: Dict[Tuple[SUPPLIER, str], Pipeline] = {}
+_EXTRA_STEPS: List[Chainable] = []
+_PIPELINES_LOCK = threading.Lock()
+
+
+def get_pipeline(supplier: SUPPLIER, file_type: str) -> Pipeline:
+    """The pipeline for a supplier's invoices of a file type.
+
+    Pipelines are built on first use and shared after that.
+
+    Parameters
+    ----------
+    supplier : SUPPLIER
+        The supplier of the invoices.
+
+    file_type : string
+        The suffix of the invoice files, e.g. ".pdf".
+
+    Returns
+    -------
+    pipeline : Pipeline
+        The pipeline for processing the invoices.
+
+    """
+    key = (supplier, file_type)
+    with _PIPELINES_LOCK:
+        if key not in _PIPELINES:
+            pipeline = PIPELINE_FACTORIES[key]()
+            pipeline.steps = (*pipeline.steps, *_EXTRA_STEPS)
+            _PIPELINES[key] = pipeline
+        return _PIPELINES[key]
+
+
+def add_pipeline_step(step: Chainable):
+    """Run `step` after the steps of every supplier's pipeline.
+
+    Used for optional steps that work the same for all suppliers, such as
+    `DatasheetValidator`.
+    """
+    with _PIPELINES_LOCK:
+        _EXTRA_STEPS.append(step)
+        for pipeline in _PIPELINES.values():
+            pipeline.steps = (*pipeline.steps, step)
+
+
+def extra_step_columns() -> List[str]:
+    """The columns filled by the steps added with `add_pipeline_step`."""
+    with _PIPELINES_LOCK:
+        return [col for step in _EXTRA_STEPS for col in getattr(step, "columns", [])]
+
+
+def _suppliers_for(file_type: str) -> List[SUPPLIER]:
+    return [
+        supplier
+        for supplier, file_types in SUPPLIER_FILE_TYPES.items()
+        if file_type in file_types
+    ]
+
+
+def detect_supplier_from_bytes(
+    file: Union[str, Path, InvoiceDocument]
+) -> Optional[SUPPLIER]:
+    """Get the product supplier by scanning the raw bytes of an invoice.
 
-def detect_supplier_from_pdf(pdf_file: Union[str, Path]) -> Optional[SUPPLIER]:
+    Only the start and end of the file are read, which is where pdf
+    metadata, link annotations and email headers usually are. Compressed
+    or encoded content is not decoded, so this may miss.
+
+    Parameters
+    ----------
+    file : Path or InvoiceDocument
+        The file for the invoice.
+
+    Returns
+    -------
+    supplier : SUPPLIER
+
+    """
+    document = as_document(file)
+    raw = document.head(SNIFF_SIZE) + document.tail(SNIFF_SIZE)
+    for supplier in _suppliers_for(document.suffix):
+        if any(signature in raw for signature in SUPPLIER_SIGNATURES[supplier]):
+            return supplier
+    return None
+
+
+def detect_supplier_from_email_headers(
+    email_file: Union[str, Path, InvoiceDocument]
+) -> Optional[SUPPLIER]:
+    """Get the product supplier from the `From` and `Subject` of an email.
+
+    Parameters
+    ----------
+    file : Path or InvoiceDocument
+        The file for the invoice.
+
+    Returns
+    -------
+    supplier : SUPPLIER
+
+    """
+    headers = as_document(email_file).headers
+    text = " ".join(str(headers.get(field, "")) for field in ("From", "Subject"))
+    for supplier in _suppliers_for(".eml"):
+        if any(
+            signature.decode() in text for signature in SUPPLIER_SIGNATURES[supplier]
+        ):
+            return supplier
+    return None
+
+
+def detect_supplier_from_pdf_first_page(
+    pdf_file: Union[str, Path, InvoiceDocument]
+) -> Optional[SUPPLIER]:
+    """Get the product supplier from the text of the first page of a pdf.
+
+    Parameters
+    ----------
+    file : Path or InvoiceDocument
+        The file for the invoice.
+
+    Returns
+    -------
+    supplier : SUPPLIER
+
+    """
+    for strings in as_document(pdf_file).page_strings(max_pages=1):
+        for supplier in _suppliers_for(".pdf"):
+            if supplier.value in strings:
+                return supplier
+    return None
+
+
+def detect_supplier_from_pdf(
+    pdf_file: Union[str, Path, InvoiceDocument],
+) -> Optional[SUPPLIER]:
     """Automatically get the product supplier from a pdf.
 
     Parameters
     ----------
-    file : Path
+    file : Path or InvoiceDocument
         The file for the invoice.
 
     Returns
@@ -53,25 +199,25 @@ def detect_supplier_from_pdf(pdf_file: Union[str, Path]) -> Optional[SUPPLIER]:
     supplier : SUPPLIER
 
     """
-    with open(pdf_file, "rb") as f:
-        viewer = SimplePDFViewer(f)
-        for canvas in viewer:
-            for supplier, file_types in SUPPLIER_FILE_TYPES.items():
-                if ".pdf" not in file_types:
-                    continue
-                if supplier.value in canvas.strings:
-                    return supplier
+    for strings in as_document(pdf_file).page_strings():
+        for supplier, file_types in SUPPLIER_FILE_TYPES.items():
+            if ".pdf" not in file_types:
+                continue
+            if supplier.value in strings:
+                return supplier
     return None
 
 
-def detect_supplier_from_email(email_file: Union[str, Path]) -> Optional[SUPPLIER]:
+def detect_supplier_from_email(
+    email_file: Union[str, Path, InvoiceDocument],
+) -> Optional[SUPPLIER]:
     """Automatically get the product supplier from an email.
 
     The email is assumed to be in `.eml` format.
 
     Parameters
     ----------
-    file : Path
+    file : Path or InvoiceDocument
         The file for the invoice.
 
     Returns
@@ -79,9 +225,7 @@ def detect_supplier_from_email(email_file: Union[str, Path]) -> Optional[SUPPLIE
     supplier : SUPPLIER
 
     """
-    with open(email_file, "r") as f:
-        message = email.message_from_file(f)
-    payload = message.get_payload(decode=True).decode("utf-8")
+    payload = as_document(email_file).payload.decode("utf-8")
     for supplier, file_types in SUPPLIER_FILE_TYPES.items():
         if ".eml" not in file_types:
             continue
@@ -90,33 +234,64 @@ def detect_supplier_from_email(email_file: Union[str, Path]) -> Optional[SUPPLIE
     return None
 
 
-def detect_supplier_from_file(file: Path) -> Optional[SUPPLIER]:
+Detector = Callable[[InvoiceDocument], Optional[SUPPLIER]]
+
+# Detectors for each file type, cheapest first.
+DETECTORS: Dict[str, List[Detector]] = {
+    ".pdf": [detect_supplier_from_bytes, detect_supplier_from_pdf_first_page],
+    ".eml": [detect_supplier_from_email_headers, detect_supplier_from_bytes],
+}
+
+# Detectors that fully parse the file, tried if all `DETECTORS` fail.
+FALLBACK_DETECTORS: Dict[str, List[Detector]] = {
+    ".pdf": [detect_supplier_from_pdf],
+    ".eml": [detect_supplier_from_email],
+}
+
+
+def detect_supplier_from_file(
+    file: Union[Path, InvoiceDocument], fallback: bool = False
+) -> Optional[SUPPLIER]:
     """Automatically get the product supplier from an invoice.
 
+    The detectors in `DETECTORS` are tried in order, stopping at the first
+    one that finds a supplier.
+
     Parameters
     ----------
-    file : Path
+    file : Path or InvoiceDocument
         The file for the invoice.
 
+    fallback : bool, optional, default=False
+        Whether to fully parse the file with `FALLBACK_DETECTORS` if the
+        cheap detectors fail. Otherwise files which aren't invoices are
+        rejected without being parsed.
+
     Returns
     -------
     supplier : SUPPLIER
 
     """
-    PARSERS = {".pdf": detect_supplier_from_pdf, ".eml": detect_supplier_from_email}
     file_type = file.suffix
     if file_type not in set(ft for v in SUPPLIER_FILE_TYPES.values() for ft in v):
         raise ValueError(f"Cannot parse from file of type {file_type}")
-    parser = PARSERS[file_type]
-    return parser(file)
+    document = as_document(file)
+    detectors = DETECTORS.get(file_type, [])
+    if fallback:
+        detectors = detectors + FALLBACK_DETECTORS.get(file_type, [])
+    for detector in detectors:
+        supplier = detector(document)
+        if supplier is not None:
+            return supplier
+    return None
 
 
-def get_reader_from_file(file: Path) -> InventoryReader:
+def get_reader_from_file(file: Union[Path, InvoiceDocument]) -> InventoryReader:
     """Automatically get the reader for a file type.
 
     Parameters
     ----------
-    file : Path
+    file : Path or InvoiceDocument
         The invoice to get the data reader for.
 
     Returns
@@ -128,24 +303,32 @@ def get_reader_from_file(file: Path) -> InventoryReader:
     supplier = detect_supplier_from_file(file)
     if supplier is None:
         raise ValueError(f"Unable to detect supplier from {file}.")
-    return READERS[(supplier, file.suffix)]
+    return get_pipeline(supplier, file.suffix).reader
 
 
-def get_pipeline_from_file(file: Path) -> Pipeline:
+def get_pipeline_from_file(
+    file: Union[Path, InvoiceDocument], fallback: bool = False
+) -> Pipeline:
     """Automatically get the processing pipeline for a file.
 
+    Pass an `InvoiceDocument` and then process that same document with the
+    returned pipeline, so the invoice is only read and parsed once.
+
     Parameters
     ----------
-    file : Path
+    file : Path or InvoiceDocument
         The invoice to get the processing pipeline for.
 
+    fallback : bool, optional, default=False
+        Whether to fully parse the file if the cheap supplier detectors fail.
+
     Returns
     -------
     pipeline : Pipeline
         The pipeline for parsing the invoice.
 
     """
-    supplier = detect_supplier_from_file(file)
+    supplier = detect_supplier_from_file(file, fallback=fallback)
     if supplier is None:
         raise ValueError(f"Unable to detect supplier from {file}.")
-    return PIPELINES[(supplier, file.suffix)]
+    return get_pipeline(supplier, file.suffix)
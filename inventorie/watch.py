@@ -0,0 +1,221 @@
+import ctypes
+import ctypes.util
+import os
+from pathlib import Path
+import select
+import struct
+import time
+from typing import Dict, Iterator, List, Optional, Protocol, Sequence, Set, Tuple
+
+
+# Seconds between scans of the directory when polling.
+DEFAULT_POLL_INTERVAL = 1.0
+# Seconds without new files before a batch of arrivals is processed.
+DEFAULT_SETTLE = 0.5
+
+# From <sys/inotify.h>.
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_Q_OVERFLOW = 0x00004000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+# wd, mask, cookie and the length of the name that follows.
+_EVENT = struct.Struct("iIII")
+
+
+class Watcher(Protocol):
+    """Reports files that arrive in, or are rewritten in, a directory."""
+
+    path: Path
+    suffixes: Sequence[str]
+
+    def poll(self, timeout: Optional[float] = None) -> Set[Path]:
+        """Wait for files to arrive.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            The longest to wait, in seconds. If `None`, wait until a file
+            arrives.
+
+        Returns
+        -------
+        files : set of Path
+            Files with one of `suffixes` written since the last call. Empty
+            if none arrived before the timeout.
+
+        """
+        ...
+
+    def close(self):
+        ...
+
+    def batches(self, settle: float = DEFAULT_SETTLE) -> Iterator[List[Path]]:
+        """Yield files as they arrive, forever.
+
+        Files arriving close together are yielded together, once no more
+        have arrived for `settle` seconds, so a folder of invoices copied
+        in at once is processed as one batch.
+        """
+        while True:
+            files = self.poll()
+            while True:
+                more = self.poll(settle)
+                if not more:
+                    break
+                files |= more
+            yield sorted(files)
+
+    def __enter__(self) -> "Watcher":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _is_invoice(self, path: Path) -> bool:
+        return path.suffix in self.suffixes and path.is_file()
+
+
+class InotifyWatcher(Watcher):
+    def __init__(self, path: Path, suffixes: Sequence[str]):
+        """A `Watcher` using the Linux inotify API.
+
+        Files are reported when they are closed after writing or moved into
+        the directory, so half-written files are never seen.
+
+        Raises
+        ------
+        OSError
+            If inotify isn't available on this system.
+
+        """
+        self.path = Path(path)
+        self.suffixes = suffixes
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+            init, add_watch = libc.inotify_init1, libc.inotify_add_watch
+        except (OSError, AttributeError) as e:
+            raise OSError("inotify isn't available") from e
+        self._fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = _IN_CLOSE_WRITE | _IN_MOVED_TO
+        if add_watch(self._fd, os.fsencode(self.path), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"Unable to watch {self.path}")
+
+    def poll(self, timeout: Optional[float] = None) -> Set[Path]:
+        readable, _, _ = select.select([self._fd], [], [], timeout)
+        if not readable:
+            return set()
+        data = os.read(self._fd, 64 * 1024)
+        files = set()
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & _IN_Q_OVERFLOW:
+                # Events were lost, so anything in the directory may be new.
+                files |= {path for path in self.path.iterdir()}
+            elif name:
+                files.add(self.path / os.fsdecode(name))
+        return {path for path in files if self._is_invoice(path)}
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingWatcher(Watcher):
+    def __init__(
+        self,
+        path: Path,
+        suffixes: Sequence[str],
+        interval: float = DEFAULT_POLL_INTERVAL,
+    ):
+        """A `Watcher` that scans the directory every `interval` seconds.
+
+        Works everywhere. A file is reported once its size and modification
+        time are the same on two scans in a row, so files still being
+        written are left until they're complete. Files already in the
+        directory are not reported.
+        """
+        self.path = Path(path)
+        self.suffixes = suffixes
+        self.interval = interval
+        self._known = self._scan()
+        self._pending: Dict[Path, Tuple[int, int]] = {}
+
+    def poll(self, timeout: Optional[float] = None) -> Set[Path]:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            files = self._check()
+            if files:
+                return files
+            if deadline is not None and time.monotonic() >= deadline:
+                return set()
+            wait = self.interval
+            if deadline is not None:
+                wait = max(0.0, min(wait, deadline - time.monotonic()))
+            time.sleep(wait)
+
+    def close(self):
+        pass
+
+    def _scan(self) -> Dict[Path, Tuple[int, int]]:
+        signatures = {}
+        for path in self.path.iterdir():
+            if path.suffix in self.suffixes:
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                signatures[path] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def _check(self) -> Set[Path]:
+        scan = self._scan()
+        files = set()
+        for path, signature in scan.items():
+            if self._known.get(path) == signature:
+                continue
+            if self._pending.get(path) == signature and self._is_invoice(path):
+                files.add(path)
+                self._known[path] = signature
+            else:
+                self._pending[path] = signature
+        self._pending = {path: s for path, s in self._pending.items() if path in scan}
+        for path in list(self._known):
+            if path not in scan:
+                del self._known[path]
+        return files
+
+
+def open_watcher(
+    path: Path, suffixes: Sequence[str], interval: float = DEFAULT_POLL_INTERVAL
+) -> Watcher:
+    """Watch a directory with inotify, or by polling if it isn't available.
+
+    Parameters
+    ----------
+    path : Path
+        The directory to watch.
+
+    suffixes : sequence of string
+        The suffixes of the files to report.
+
+    interval : float, optional
+        Seconds between scans, if polling.
+
+    Returns
+    -------
+    watcher : Watcher
+        The watcher, which should be closed when done.
+
+    """
+    try:
+        return InotifyWatcher(path, suffixes)
+    except OSError:
+        return PollingWatcher(path, suffixes, interval)
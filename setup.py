@@ -22,6 +22,6 @@ setup(
     long_description=LONG_DESCRIPTION,
     python_requires=">=3.7",
     install_requires=REQUIREMENTS,
-    packages=find_packages(),
+    packages=find_packages(exclude=["tests", "tests.*"]),
     entry_points={"console_scripts": ["inventorie=inventorie.main:run_script"]},
 )
@@ -0,0 +1,24 @@
+from pathlib import Path
+import sys
+
+import pytest  # type: ignore
+
+from inventorie.cache import disable_cache
+from inventorie.session import set_session
+
+# The synthetic invoices and stub supplier server of the benchmarks.
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "benchmarks"))
+
+from stub_server import StubSupplierServer  # noqa: E402
+
+
+@pytest.fixture
+def server():
+    """A stub supplier server, which every request is sent to."""
+    disable_cache()
+    with StubSupplierServer(padding=0) as server:
+        set_session(server.session())
+        try:
+            yield server
+        finally:
+            set_session(None)
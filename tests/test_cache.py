@@ -0,0 +1,131 @@
+from concurrent.futures import ThreadPoolExecutor
+import threading
+
+import pytest  # type: ignore
+
+from inventorie import cache
+from inventorie.cache import Cache, Memo
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_entries_expire_after_ttl(tmp_path, clock):
+    store = Cache(tmp_path / "cache.sqlite", ttl=60)
+    store.set("a", {"title": "Resistors"})
+    clock.now += 59
+    assert store.get("a") == {"title": "Resistors"}
+    clock.now += 2
+    assert store.get("a") is None
+    assert len(store) == 0
+
+
+def test_stale_entries_are_evicted_without_being_read(tmp_path, clock):
+    store = Cache(tmp_path / "cache.sqlite", ttl=60)
+    store.set("a", 1)
+    clock.now += 30
+    store.set("b", 2)
+    clock.now += 31
+    store.evict()
+    assert len(store) == 1
+    assert store.get("b") == 2
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    store = Cache(tmp_path / "cache.sqlite", max_entries=2)
+    for key in "abc":
+        store.set(key, key)
+        clock.now += 1
+    # Reading "a" makes "b" the least recently used.
+    assert store.get("a") == "a"
+    store.evict()
+    assert len(store) == 2
+    assert store.get("b") is None
+    assert [store.get(key) for key in "ac"] == ["a", "c"]
+
+
+def test_limits_apply_when_the_cache_is_reopened(tmp_path, clock):
+    path = tmp_path / "cache.sqlite"
+    store = Cache(path, ttl=None, max_entries=None)
+    for key in "abcd":
+        store.set(key, key)
+        clock.now += 1
+    store.close()
+    assert len(Cache(path, ttl=None, max_entries=3)) == 3
+    clock.now += 100
+    assert len(Cache(path, ttl=10, max_entries=None)) == 0
+
+
+def test_refresh_ignores_but_overwrites_entries(tmp_path, clock):
+    path = tmp_path / "cache.sqlite"
+    Cache(path).set("a", 1)
+    store = Cache(path, refresh=True)
+    assert store.get("a") is None
+    store.set("a", 2)
+    assert Cache(path).get("a") == 2
+
+
+def test_concurrent_lookups_share_one_computation():
+    memo = Memo()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def compute(key):
+        calls.append(key)
+        started.set()
+        release.wait(5)
+        return key.upper()
+
+    with ThreadPoolExecutor(4) as pool:
+        first = pool.submit(memo.get, "a", compute)
+        started.wait(5)
+        others = [pool.submit(memo.get, "a", compute) for _ in range(3)]
+        release.set()
+        results = [f.result(5) for f in [first, *others]]
+    assert results == ["A"] * 4
+    assert calls == ["a"]
+    assert memo.get("a", compute) == "A"
+    assert calls == ["a"]
+
+
+def test_failed_computations_are_shared_but_not_memoized():
+    memo = Memo()
+    started = threading.Event()
+    release = threading.Event()
+
+    def fail(key):
+        started.set()
+        release.wait(5)
+        raise ValueError(key)
+
+    with ThreadPoolExecutor(2) as pool:
+        first = pool.submit(memo.get, "a", fail)
+        started.wait(5)
+        waiting = pool.submit(memo.get, "a", fail)
+        release.set()
+        for future in (first, waiting):
+            with pytest.raises(ValueError):
+                future.result(5)
+    assert memo.get("a", str.upper) == "A"
+
+
+def test_memo_reads_and_writes_its_cache(tmp_path):
+    store = Cache(tmp_path / "cache.sqlite")
+    store.set("a", "cached")
+    memo = Memo(store)
+    assert memo.get("a", str.upper) == "cached"
+    assert memo.get("b", str.upper) == "B"
+    assert store.get("b") == "B"
@@ -0,0 +1,50 @@
+import asyncio
+
+import pandas as pd  # type: ignore
+
+from inventorie import datasheet
+from inventorie.datasheet import DatasheetValidator, JamecoDatasheetLookup
+from inventorie.pipeline import ERROR_COLUMN
+
+
+def _check_datasheet(url: str) -> bool:
+    if url.startswith("ftp"):
+        raise ValueError(f"Unsupported scheme in {url}")
+    return "missing" not in url
+
+
+def _urls() -> pd.DataFrame:
+    return pd.DataFrame(
+        {"datasheet_url": ["http://a.pdf", "ftp://b.pdf", "http://missing.pdf", None]}
+    )
+
+
+def test_validator_records_failed_checks_per_row(monkeypatch):
+    monkeypatch.setattr(datasheet, "check_datasheet", _check_datasheet)
+    df = DatasheetValidator().update_dataframe(_urls())
+    assert df.loc[[0, 2], "datasheet_status"].tolist() == ["ok", "missing"]
+    assert pd.isna(df.loc[1, "datasheet_status"])
+    assert pd.isna(df.loc[[0, 2, 3], ERROR_COLUMN]).all()
+    assert "Unsupported scheme" in df.loc[1, ERROR_COLUMN]
+
+
+def test_validator_records_failed_checks_per_row_async(monkeypatch):
+    monkeypatch.setattr(datasheet, "check_datasheet", _check_datasheet)
+    df = asyncio.run(
+        DatasheetValidator().update_dataframe_async(_urls(), asyncio.Semaphore(2))
+    )
+    assert df.loc[[0, 2], "datasheet_status"].tolist() == ["ok", "missing"]
+    assert pd.isna(df.loc[1, "datasheet_status"])
+    assert "Unsupported scheme" in df.loc[1, ERROR_COLUMN]
+
+
+def test_lookup_leaves_datasheets_that_fail_validation_missing(monkeypatch):
+    monkeypatch.setattr(
+        datasheet, "check_datasheet", lambda url: not url.endswith("2.pdf")
+    )
+    urls = JamecoDatasheetLookup().lookup_batch(
+        pd.Series(["1", "2"], index=[3, 4]), validate=True
+    )
+    assert urls.index.tolist() == [3, 4]
+    assert urls[3].endswith("1.pdf")
+    assert pd.isna(urls[4])
@@ -0,0 +1,116 @@
+from pathlib import Path
+
+from fixtures import make_invoices
+
+import pandas as pd  # type: ignore
+
+from inventorie.main import _watch, parse_args, run_script
+from inventorie.output import COLUMNS
+from inventorie.store import InventoryStore
+
+
+def _lines(**values) -> pd.DataFrame:
+    df = pd.DataFrame({col: [None] for col in COLUMNS})
+    for col, value in values.items():
+        df[col] = [value]
+    return df
+
+
+def test_process_is_the_default_command():
+    flags = parse_args(["invoices", "-o", "out.csv"])
+    assert flags.command == "process"
+    assert flags.workdir == Path("invoices")
+    assert flags.output == Path("out.csv")
+
+    flags = parse_args(["-o", "out.csv", "invoices"])
+    assert flags.command == "process"
+    assert flags.workdir == Path("invoices")
+
+
+def test_a_workdir_named_query_can_be_processed():
+    flags = parse_args(["process", "query"])
+    assert flags.command == "process"
+    assert flags.workdir == Path("query")
+
+
+def test_store_is_opt_in():
+    assert parse_args(["invoices"]).store is None
+    assert parse_args(["invoices", "--store", "s.sqlite"]).store == Path("s.sqlite")
+
+
+def test_run_without_a_command(tmp_path, capsys):
+    workdir = tmp_path / "invoices"
+    workdir.mkdir()
+    output = tmp_path / "out.csv"
+    run_script([str(workdir), "-o", str(output), "--no-cache"])
+    assert output.exists()
+    assert capsys.readouterr().out.splitlines()[-1] == "Done"
+
+
+def test_query(tmp_path, capsys):
+    path = tmp_path / "inventory.sqlite"
+    store = InventoryStore(path)
+    store.upsert_invoice(
+        str(tmp_path / "a.eml"),
+        _lines(manufacturer_product_id="2N3904", quantity=10, unit_price=0.1),
+        purchased_at=0.0,
+    )
+    store.close()
+
+    run_script(["query", "2N3904", "--store", str(path)])
+    out = capsys.readouterr().out
+    assert "2N3904" in out
+    assert "10" in out
+
+    run_script(["query", "BC547", "--store", str(path)])
+    assert capsys.readouterr().out.strip() == "No parts matching BC547"
+
+
+class _Batches:
+    """A watcher that reports the given batches of files, then stops."""
+
+    def __init__(self, path, *batches):
+        self.path = path
+        self._batches = batches
+
+    def batches(self):
+        yield from self._batches
+        raise KeyboardInterrupt
+
+
+def test_watch_skips_invoices_that_fail(tmp_path, capsys):
+    good, bad, other = make_invoices(tmp_path, suppliers=["tayda"], invoices=3)
+    calls = []
+
+    def process(pipelines):
+        names = sorted(document.name for document in pipelines)
+        calls.append(names)
+        if bad.name in names:
+            raise ValueError("corrupt invoice")
+
+    watcher = _Batches(tmp_path, [good, bad], [other])
+    _watch(watcher, [], set(), False, None, process)
+    assert calls == [
+        sorted([good.name, bad.name]),
+        [good.name],
+        [bad.name],
+        [other.name],
+    ]
+    out = capsys.readouterr().out
+    assert f"Failed to process {bad.name}: ValueError('corrupt invoice')" in out
+    assert out.count("Processed 1 new invoices") == 2
+
+
+def test_watch_skips_invoices_already_processed(tmp_path, capsys):
+    first, second = make_invoices(tmp_path, suppliers=["tayda"], invoices=2)
+    calls = []
+    watcher = _Batches(tmp_path, [first], [first, second])
+    _watch(watcher, [first], {first.name}, False, None, calls.append)
+    assert [sorted(d.name for d in pipelines) for pipelines in calls] == [[second.name]]
+    assert "Skipping" not in capsys.readouterr().out
+
+    # Rewritten after its rows were written, it still isn't written twice.
+    calls.clear()
+    _watch(_Batches(tmp_path, [first]), [], {first.name}, False, None, calls.append)
+    assert calls == []
+    assert f"Skipping {first.name}" in capsys.readouterr().out
@@ -0,0 +1,66 @@
+import os
+
+import pandas as pd  # type: ignore
+
+from inventorie.manifest import Manifest
+from inventorie.pipeline import ERROR_COLUMN
+
+COLUMNS = ["product_id", "quantity", ERROR_COLUMN]
+
+
+def _rows(*product_ids, error=None):
+    return pd.DataFrame(
+        {"product_id": list(product_ids), "quantity": 1, ERROR_COLUMN: error}
+    )
+
+
+def _processed(tmp_path, contents):
+    """A saved manifest of invoices written with `contents`, by name."""
+    manifest = Manifest(tmp_path / "manifest.json")
+    files = []
+    for name, data in contents.items():
+        file = tmp_path / name
+        file.write_text(data)
+        files.append(file)
+    for file in manifest.refresh(files):
+        manifest.update(file, _rows(file.stem))
+    manifest.save()
+    return Manifest(manifest.path), files
+
+
+def test_unchanged_invoices_are_skipped(tmp_path):
+    manifest, files = _processed(tmp_path, {"a.eml": "a", "b.eml": "b"})
+    assert manifest.refresh(files) == []
+    assert manifest.frame_for("b.eml", COLUMNS)["product_id"].tolist() == ["b"]
+
+
+def test_renamed_invoices_reuse_their_rows(tmp_path):
+    manifest, (a, b) = _processed(tmp_path, {"a.eml": "a", "b.eml": "b"})
+    renamed = a.rename(tmp_path / "renamed.eml")
+    assert manifest.refresh([renamed, b]) == []
+    assert set(manifest.entries) == {"renamed.eml", "b.eml"}
+    assert manifest.frame_for("renamed.eml", COLUMNS)["product_id"].tolist() == ["a"]
+
+
+def test_changed_invoices_are_processed_again(tmp_path):
+    manifest, (a, b) = _processed(tmp_path, {"a.eml": "a", "b.eml": "b"})
+    a.write_text("changed")
+    assert manifest.refresh([a, b]) == [a]
+
+
+def test_touched_but_identical_invoices_are_skipped(tmp_path):
+    manifest, (a,) = _processed(tmp_path, {"a.eml": "a"})
+    stat = a.stat()
+    os.utime(a, (stat.st_atime, stat.st_mtime + 10))
+    assert manifest.refresh([a]) == []
+    assert manifest.entries["a.eml"]["mtime"] == a.stat().st_mtime
+
+
+def test_invoices_with_failed_rows_are_processed_again(tmp_path):
+    manifest, (a, b) = _processed(tmp_path, {"a.eml": "a", "b.eml": "b"})
+    manifest.update(a, _rows("a", error="lookup: timed out"))
+    assert manifest.refresh([a, b]) == [a]
+    # A copy of an incomplete invoice doesn't reuse its rows either.
+    copy = tmp_path / "copy.eml"
+    copy.write_text("a")
+    assert manifest.refresh([a, b, copy]) == [a, copy]
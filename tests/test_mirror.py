@@ -0,0 +1,49 @@
+from pathlib import Path
+
+from fixtures import DATASHEET, JAMECO_HOST, TAYDA_HOST
+import pandas as pd  # type: ignore
+
+from inventorie.mirror import DatasheetMirror, _sha256
+from inventorie.pipeline import ERROR_COLUMN
+
+URL = f"https://{TAYDA_HOST}/datasheets/files/A-0001.pdf"
+
+
+def _partial(mirror: DatasheetMirror, url: str) -> Path:
+    return mirror.path / "partial" / f"{_sha256(url.encode())}.part"
+
+
+def test_datasheets_are_mirrored_once(server, tmp_path):
+    mirror = DatasheetMirror(tmp_path)
+    path = mirror.mirror(URL)
+    assert Path(path).read_bytes() == DATASHEET
+    assert DatasheetMirror(tmp_path).mirror(URL) == path
+    assert server.requests["tayda_datasheet"] == 1
+
+
+def test_interrupted_downloads_are_resumed(server, tmp_path):
+    mirror = DatasheetMirror(tmp_path)
+    _partial(mirror, URL).write_bytes(DATASHEET[:4])
+    assert Path(mirror.mirror(URL)).read_bytes() == DATASHEET
+
+
+def test_complete_partial_download_is_kept(server, tmp_path):
+    mirror = DatasheetMirror(tmp_path)
+    _partial(mirror, URL).write_bytes(DATASHEET)
+    assert Path(mirror.mirror(URL)).read_bytes() == DATASHEET
+
+
+def test_partial_download_larger_than_the_file_is_downloaded_again(server, tmp_path):
+    mirror = DatasheetMirror(tmp_path)
+    _partial(mirror, URL).write_bytes(DATASHEET + b"stale")
+    assert Path(mirror.mirror(URL)).read_bytes() == DATASHEET
+
+
+def test_failed_downloads_are_recorded_per_row(server, tmp_path):
+    missing = f"https://{JAMECO_HOST}/missing.pdf"
+    df = pd.DataFrame({"datasheet_url": [URL, missing]})
+    df = DatasheetMirror(tmp_path).update_dataframe(df)
+    assert Path(df.loc[0, "datasheet_path"]).read_bytes() == DATASHEET
+    assert pd.isna(df.loc[0, ERROR_COLUMN])
+    assert pd.isna(df.loc[1, "datasheet_path"])
+    assert "404" in df.loc[1, ERROR_COLUMN]
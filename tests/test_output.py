@@ -0,0 +1,95 @@
+import pandas as pd  # type: ignore
+import pytest  # type: ignore
+
+from inventorie.output import (
+    COLUMNS,
+    OUTPUT_FORMATS,
+    apply_schema,
+    open_writer,
+    output_columns,
+    read_output,
+)
+
+# The columns of outputs written before any were added, in order.
+BASELINE_COLUMNS = [
+    "manufacturer_product_id",
+    "manufacturer",
+    "product_id",
+    "supplier",
+    "product_category",
+    "description",
+    "product_url",
+    "datasheet_url",
+    "quantity",
+    "unit",
+    "unit_price",
+    "amount",
+]
+
+
+def _invoice() -> pd.DataFrame:
+    return pd.DataFrame(
+        {
+            "product_id": ["A-1", "A-2"],
+            "supplier": ["Tayda Electronics"] * 2,
+            "quantity": ["10", "1,000"],
+            "unit_price": ["$0.10", "0.02"],
+            "datasheet_status": ["ok", "missing"],
+        }
+    )
+
+
+def test_new_columns_follow_the_baseline_columns():
+    assert COLUMNS[: len(BASELINE_COLUMNS)] == BASELINE_COLUMNS
+    assert output_columns() == COLUMNS
+    columns = output_columns(["datasheet_status", "datasheet_checked_at"])
+    assert columns[: len(COLUMNS)] == COLUMNS
+    assert columns[len(COLUMNS) :] == ["datasheet_status", "datasheet_checked_at"]
+
+
+def test_amounts_written_as_text_are_converted():
+    df = apply_schema(_invoice(), "a.eml")
+    assert df["quantity"].tolist() == [10, 1000]
+    assert df["unit_price"].tolist() == [0.1, 0.02]
+
+
+def test_values_that_arent_numbers_are_dropped_with_a_warning():
+    df = _invoice().assign(quantity=["10", "2.5"])
+    with pytest.warns(UserWarning, match="a.eml: 1 values of quantity"):
+        df = apply_schema(df, "a.eml")
+    assert df["quantity"].isna().tolist() == [False, True]
+
+
+@pytest.mark.parametrize("output_format", OUTPUT_FORMATS)
+@pytest.mark.parametrize("extra", [[], ["datasheet_status"]])
+def test_outputs_are_read_back_with_their_columns(tmp_path, output_format, extra):
+    if output_format in ("parquet", "feather"):
+        pytest.importorskip("pyarrow")
+    path = tmp_path / "output"
+    columns = output_columns(extra)
+    with open_writer(path, output_format, columns) as writer:
+        writer.write(_invoice())
+        writer.write(_invoice().iloc[:1])
+    df = read_output(path, output_format)
+    assert df.columns.tolist() == columns
+    assert df["product_id"].tolist() == ["A-1", "A-2", "A-1"]
+    assert df["quantity"].tolist() == [10, 1000, 10]
+    if extra:
+        assert df["datasheet_status"].tolist() == ["ok", "missing", "ok"]
+
+
+def test_feather_rows_are_written_as_invoices_finish(tmp_path):
+    pytest.importorskip("pyarrow")
+    path = tmp_path / "output.feather"
+    with open_writer(path) as writer:
+        sizes = [path.stat().st_size]
+        for supplier in ["Tayda Electronics", "Jameco Electronics"]:
+            writer.write(_invoice().assign(supplier=supplier))
+            sizes.append(path.stat().st_size)
+        assert sizes == sorted(set(sizes))
+    df = read_output(path)
+    assert df["supplier"].dtype == "category"
+    assert (
+        df["supplier"].tolist()
+        == ["Tayda Electronics"] * 2 + ["Jameco Electronics"] * 2
+    )
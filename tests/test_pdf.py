@@ -0,0 +1,30 @@
+import warnings
+
+import numpy as np  # type: ignore
+import pandas as pd  # type: ignore
+
+from inventorie.invoice.pdf import _table_frame
+
+
+def test_table_frame_converts_columns_of_numbers():
+    table = [
+        ["Qty", "Part", "", "Price"],
+        ["2", "LM358", None, "0.35"],
+        ["10", "1N4148", "", "1.2"],
+    ]
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        df = _table_frame(table)
+    assert df.columns[:2].tolist() == ["Qty", "Part"]
+    assert pd.isna(df.columns[2]) and df.columns[3] == "Price"
+    assert df["Qty"].tolist() == [2, 10]
+    assert df["Price"].tolist() == [0.35, 1.2]
+    assert df["Part"].tolist() == ["LM358", "1N4148"]
+    assert df.iloc[:, 2].isna().all()
+
+
+def test_table_frame_keeps_columns_with_any_text():
+    df = _table_frame([["Qty", "Part"], ["2", "555"], ["TOTAL", "7805"]])
+    assert df["Qty"].tolist() == ["2", "TOTAL"]
+    assert df["Part"].tolist() == [555, 7805]
+    assert df["Part"].dtype == np.int64
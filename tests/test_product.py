@@ -0,0 +1,24 @@
+from fixtures import make_invoices
+
+from inventorie.main import main
+from inventorie.session import DEFAULT_MAX_PAGES
+
+
+def _requests(server, tmp_path, **kwargs):
+    workdir = tmp_path / "invoices"
+    make_invoices(workdir, suppliers=["tayda"], **kwargs)
+    main(workdir, tmp_path / "out.csv")
+    return server.requests["tayda_search"], server.requests["tayda_product"]
+
+
+def test_product_pages_are_downloaded_once_per_lookup(server, tmp_path):
+    # Invoices processed at the same time share most of their products.
+    searched, fetched = _requests(server, tmp_path, invoices=8, items=10, products=12)
+    # Each search redirects to the product page, which the scraper reuses.
+    assert fetched == searched
+
+
+def test_product_pages_are_reused_in_batches_larger_than_the_store(server, tmp_path):
+    n = DEFAULT_MAX_PAGES + 50
+    searched, fetched = _requests(server, tmp_path, invoices=1, items=n, products=n)
+    assert fetched == searched
@@ -0,0 +1,50 @@
+import threading
+
+from inventorie.scheduler import Scheduler
+
+
+def test_map_returns_results_in_order():
+    scheduler = Scheduler(threads=2)
+    try:
+        assert scheduler.map(lambda x: x * 2, range(10)) == list(range(0, 20, 2))
+    finally:
+        scheduler.shutdown()
+
+
+def test_map_returns_exceptions():
+    def _check(x):
+        if x == 1:
+            raise ValueError(x)
+        return x
+
+    scheduler = Scheduler(threads=2)
+    try:
+        results = scheduler.map(_check, range(3), return_exceptions=True)
+    finally:
+        scheduler.shutdown()
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], ValueError)
+
+
+def test_nested_map_does_not_deadlock():
+    scheduler = Scheduler(threads=1)
+    try:
+        inner = lambda x: scheduler.map(lambda y: x + y, range(3))  # noqa: E731
+        assert scheduler.map(inner, range(2)) == [[0, 1, 2], [1, 2, 3]]
+    finally:
+        scheduler.shutdown()
+
+
+def test_try_submit_only_uses_free_threads():
+    scheduler = Scheduler(threads=1)
+    release = threading.Event()
+    try:
+        busy = scheduler.submit(release.wait)
+        assert scheduler.try_submit(lambda: None) is None
+        release.set()
+        busy.result()
+        future = scheduler.try_submit(lambda: 1)
+        assert future is not None and future.result() == 1
+    finally:
+        release.set()
+        scheduler.shutdown()
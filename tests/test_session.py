@@ -0,0 +1,172 @@
+import threading
+
+import pytest  # type: ignore
+
+from fixtures import DATASHEET, TAYDA_HOST
+from stub_server import StubSupplierServer
+
+from inventorie.scheduler import Scheduler, get_scheduler, set_scheduler
+from inventorie import session as session_module
+from inventorie.session import (
+    DEFAULT_MIN_LATENCIES,
+    CircuitBreaker,
+    CircuitOpenError,
+    PageStore,
+)
+
+DATASHEET_URL = f"https://{TAYDA_HOST}/datasheets/files/A-0001.pdf"
+
+
+def test_page_put_twice_is_kept_until_taken_twice():
+    store = PageStore()
+    store.put("a", b"1")
+    store.put("a", b"1")
+    assert store.pop("a") == b"1"
+    assert store.pop("a") == b"1"
+    assert store.pop("a") is None
+
+
+def test_oldest_pages_are_dropped():
+    store = PageStore(max_pages=2)
+    for url in "abc":
+        store.put(url, url.encode())
+    assert store.pop("a") is None
+    assert store.pop("b") == b"b"
+    assert store.pop("c") == b"c"
+
+
+def test_reserved_pages_are_kept_beyond_max_pages():
+    store = PageStore(max_pages=2)
+    with store.reserve(5) as reservation:
+        for url in "abcde":
+            store.put(url, url.encode(), reservation)
+    store.put("x", b"x")
+    store.put("y", b"y")
+    store.put("z", b"z")
+    assert [store.pop(url) for url in "abcde"] == [b"a", b"b", b"c", b"d", b"e"]
+    assert store.pop("x") is None
+    assert store.pop("z") == b"z"
+
+
+def test_taking_pages_keeps_the_room_of_other_batches():
+    store = PageStore(max_pages=0)
+    first = store.reserve(2)
+    second = store.reserve(2)
+    store.put("a", b"a", first)
+    # The store is briefly empty, but the second batch still holds its room.
+    assert store.pop("a") == b"a"
+    store.put("b", b"b", second)
+    store.put("c", b"c", second)
+    first.close()
+    second.close()
+    assert store.pop("b") == b"b"
+    assert store.pop("c") == b"c"
+
+
+def test_closing_a_reservation_gives_back_unused_room():
+    store = PageStore(max_pages=1)
+    with store.reserve(3) as reservation:
+        store.put("a", b"a", reservation)
+    store.put("x", b"x")
+    store.put("y", b"y")
+    assert store.pop("a") == b"a"
+    assert store.pop("x") is None
+    assert store.pop("y") == b"y"
+
+
+def _pool_threads():
+    return [t for t in threading.enumerate() if "ThreadPoolExecutor" in t.name]
+
+
+def _hedging_session(server, scheduler_threads):
+    set_scheduler(Scheduler(threads=scheduler_threads))
+    session = server.session()
+    session.hedge = True
+    # Recent requests were much faster than the stub server answers.
+    for _ in range(DEFAULT_MIN_LATENCIES):
+        session.latencies.record(DATASHEET_URL, 0.001)
+    return session
+
+
+def test_slow_requests_are_hedged_in_the_scheduler():
+    with StubSupplierServer(latency=0.2, padding=0) as server:
+        session = _hedging_session(server, scheduler_threads=2)
+        try:
+            assert session.get(DATASHEET_URL).content == DATASHEET
+            # Only the scheduler's threads were used to send them.
+            assert len(_pool_threads()) <= 2
+        finally:
+            session.close()
+            set_scheduler(None)
+        assert server.requests["tayda_datasheet"] == 2
+
+
+def test_requests_are_not_hedged_without_a_free_thread():
+    with StubSupplierServer(latency=0.2, padding=0) as server:
+        session = _hedging_session(server, scheduler_threads=1)
+        release = threading.Event()
+        try:
+            get_scheduler().submit(release.wait)
+            assert session.get(DATASHEET_URL).content == DATASHEET
+        finally:
+            release.set()
+            session.close()
+            set_scheduler(None)
+        assert server.requests["tayda_datasheet"] == 1
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+def test_circuit_opens_after_consecutive_failures(monkeypatch):
+    monkeypatch.setattr(session_module, "time", Clock())
+    breaker = CircuitBreaker(failure_threshold=3, reset_after=60)
+    url = f"https://{TAYDA_HOST}/a"
+    for ok in [False, False, True, False, False]:
+        breaker.record(url, ok)
+        breaker.before_request(url)
+    breaker.record(url, ok=False)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(url)
+    # Other hosts are unaffected.
+    breaker.before_request("https://www.jameco.com/a")
+
+
+def test_open_circuit_lets_one_request_through_after_reset(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(session_module, "time", clock)
+    breaker = CircuitBreaker(failure_threshold=1, reset_after=60)
+    url = f"https://{TAYDA_HOST}/a"
+    breaker.record(url, ok=False)
+    clock.now += 61
+    breaker.before_request(url)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(url)
+    # The trial request failed, so the circuit stays open for another period.
+    breaker.record(url, ok=False)
+    clock.now += 59
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(url)
+    clock.now += 2
+    breaker.before_request(url)
+    breaker.record(url, ok=True)
+    breaker.before_request(url)
+    breaker.before_request(url)
+
+
+def test_session_stops_requesting_a_failing_host():
+    with StubSupplierServer(throttle_rate=1.0, padding=0) as server:
+        session = server.session()
+        session.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_after=60)
+        try:
+            for _ in range(2):
+                with pytest.raises(CircuitOpenError):
+                    session.get(DATASHEET_URL)
+        finally:
+            session.close()
+        assert server.requests["throttled"] == 2
@@ -0,0 +1,55 @@
+from email.message import EmailMessage
+
+from fixtures import make_invoices
+import pytest  # type: ignore
+
+from inventorie import supplier
+from inventorie.invoice import InvoiceDocument
+from inventorie.supplier import SUPPLIER, detect_supplier_from_file
+
+
+def _forwarded_email(path):
+    """A Tayda invoice whose supplier is only found in its encoded body."""
+    message = EmailMessage()
+    message["From"] = "me@example.com"
+    message["Subject"] = "Fwd: my order"
+    message.set_content(
+        "<p>Thanks for shopping at Tayda Electronics</p>",
+        subtype="html",
+        cte="base64",
+    )
+    path.write_bytes(bytes(message))
+    return path
+
+
+def _fail(document):
+    raise AssertionError(f"{document.name} was fully parsed")
+
+
+def test_invoices_are_detected_without_full_parsing(tmp_path, monkeypatch):
+    monkeypatch.setattr(
+        supplier, "FALLBACK_DETECTORS", {".pdf": [_fail], ".eml": [_fail]}
+    )
+    files = make_invoices(tmp_path, invoices=1, items=2, products=4)
+    detected = {f.suffix: detect_supplier_from_file(InvoiceDocument(f)) for f in files}
+    assert detected == {".eml": SUPPLIER.TAYDA, ".pdf": SUPPLIER.JAMECO}
+
+
+def test_other_files_are_skipped_without_full_parsing(tmp_path, monkeypatch):
+    monkeypatch.setattr(supplier, "FALLBACK_DETECTORS", {".eml": [_fail]})
+    path = _forwarded_email(tmp_path / "forwarded.eml")
+    assert detect_supplier_from_file(InvoiceDocument(path)) is None
+
+
+def test_full_parsing_is_opt_in(tmp_path):
+    path = _forwarded_email(tmp_path / "forwarded.eml")
+    assert detect_supplier_from_file(InvoiceDocument(path)) is None
+    document = InvoiceDocument(path)
+    assert detect_supplier_from_file(document, fallback=True) == SUPPLIER.TAYDA
+
+
+def test_unknown_file_types_are_rejected(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("Tayda Electronics")
+    with pytest.raises(ValueError):
+        detect_supplier_from_file(path)